@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+from common import ROOT, benchmark
+
+
+@benchmark(memory=False)
+def bench_import(case):
+    """Imports the package in a new interpreter, so nothing is already loaded.
+    The time includes the start of the interpreter."""
+    subprocess.run(
+        [sys.executable, "-c", "import marketing_attribution_models"],
+        cwd=ROOT,
+        check=True,
+    )
@@ -0,0 +1,24 @@
+from common import MAM, benchmark
+
+
+@benchmark(setup=lambda case: case.journeys)
+def bench_init_journeys(journeys):
+    MAM(
+        journeys,
+        time_till_conv_colname="time_till_conv",
+        conversion_value="conversion_value",
+        channels_colname="channels",
+        journey_with_conv_colname="has_transaction",
+    )
+
+
+@benchmark(setup=lambda case: case.sessions)
+def bench_init_sessions(sessions):
+    MAM(
+        sessions,
+        channels_colname="channels",
+        journey_with_conv_colname="has_transaction",
+        group_channels=True,
+        group_channels_by_id_list=["user_id"],
+        group_timestamp_colname="visitStartTime",
+    )
@@ -0,0 +1,30 @@
+import numpy as np
+from common import benchmark
+
+from marketing_attribution_models.models import markov
+
+
+def transition_matrix(case):
+    """Sparse first order transition matrix of the journeys of case."""
+    att = case.mam()
+    journeys = att._journeys
+    states, histories = markov.history_states(journeys.codes, journeys.offsets)
+    orig, dest, count = markov.journey_transitions(
+        states,
+        journeys.offsets,
+        att.journey_with_conv,
+        np.asarray(att.conversion_value, dtype=float),
+        len(histories),
+        False,
+    )
+    return markov.transition_matrix(orig, dest, count, len(histories) + 3, sparse=True)
+
+
+@benchmark(setup=transition_matrix)
+def bench_markov_dense_solve(matrix):
+    markov.removal_effects(matrix.toarray())
+
+
+@benchmark(setup=transition_matrix)
+def bench_markov_sparse_solve(matrix):
+    markov.removal_effects(matrix, dense_states=0)
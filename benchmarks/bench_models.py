@@ -0,0 +1,65 @@
+from common import benchmark
+
+
+def mam(case):
+    return case.mam()
+
+
+@benchmark(setup=mam)
+def bench_attribution_last_click(att):
+    att.attribution_last_click()
+
+
+@benchmark(setup=mam)
+def bench_attribution_last_click_non(att):
+    att.attribution_last_click_non(but_not_this_channel="channel_0")
+
+
+@benchmark(setup=mam)
+def bench_attribution_first_click(att):
+    att.attribution_first_click()
+
+
+@benchmark(setup=mam)
+def bench_attribution_linear(att):
+    att.attribution_linear()
+
+
+@benchmark(setup=mam)
+def bench_attribution_position_based(att):
+    att.attribution_position_based()
+
+
+@benchmark(setup=mam)
+def bench_attribution_position_decay(att):
+    att.attribution_position_decay()
+
+
+@benchmark(setup=mam)
+def bench_attribution_time_decay(att):
+    att.attribution_time_decay()
+
+
+@benchmark(setup=mam)
+def bench_attribution_heuristics(att):
+    att.attribution_heuristics(last_click_non_but_not_this_channel="channel_0")
+
+
+@benchmark(setup=mam)
+def bench_attribution_markov(att):
+    att.attribution_markov()
+
+
+@benchmark(setup=mam)
+def bench_attribution_shapley(att):
+    att.attribution_shapley()
+
+
+@benchmark(setup=mam)
+def bench_journey_conversion_table(att):
+    att.journey_conversion_table()
+
+
+@benchmark(setup=mam)
+def bench_coalitions(att):
+    att.coalitions()
@@ -0,0 +1,13 @@
+from common import benchmark
+
+
+def mam_with_results(case):
+    att = case.mam()
+    att.attribution_heuristics(last_click_non_but_not_this_channel="channel_0")
+    att.attribution_markov()
+    return att
+
+
+@benchmark(setup=mam_with_results)
+def bench_as_pd_dataframe(att):
+    att.as_pd_dataframe()
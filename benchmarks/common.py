@@ -0,0 +1,79 @@
+import functools
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from marketing_attribution_models import MAM  # noqa: E402
+from marketing_attribution_models.data.random_data import JourneyGenerator  # noqa: E402
+
+# Benchmarks registered by the bench_*.py modules
+BENCHMARKS = []
+
+
+def benchmark(setup=None, memory=True):
+    """Registers a bench_<name> function taking the object returned by
+    setup(case), which runs before each timed call and is not timed. Without a
+    setup the function receives the Case itself. With memory=False its peak
+    memory is not measured, as for work done in another process."""
+
+    def register(function):
+        BENCHMARKS.append((function.__name__[len("bench_") :], setup, function, memory))
+        return function
+
+    return register
+
+
+class Case:
+    """Synthetic journeys of one benchmark size, generated once and shared by all
+    the benchmarks.
+
+    Parameters:
+    n_journeys =
+        Number of journeys;
+    n_channels =
+        Number of distinct channels, drawn with Zipf frequencies;
+    mean_length =
+        Mean number of touchpoints of a journey;
+    seed = 0 by default.
+    """
+
+    def __init__(self, n_journeys, n_channels, mean_length, seed=0):
+        self.n_journeys = n_journeys
+        self.n_channels = n_channels
+        self.mean_length = mean_length
+        self.seed = seed
+
+    def __str__(self):
+        return "journeys={},channels={},length={}".format(
+            self.n_journeys, self.n_channels, self.mean_length
+        )
+
+    @functools.cached_property
+    def _generator(self):
+        return JourneyGenerator(
+            n_channels=self.n_channels, mean_length=self.mean_length, seed=self.seed
+        )
+
+    @functools.cached_property
+    def journeys(self):
+        """DataFrame with one journey per row, as in group_channels=False."""
+        return pd.concat(self._generator.journey_chunks(self.n_journeys))
+
+    @functools.cached_property
+    def sessions(self):
+        """DataFrame with one session per row, as in group_channels=True."""
+        return pd.concat(self._generator.session_chunks(self.n_journeys))
+
+    def mam(self):
+        """New MAM object over the journeys."""
+        return MAM(
+            self.journeys,
+            time_till_conv_colname="time_till_conv",
+            conversion_value="conversion_value",
+            channels_colname="channels",
+            journey_with_conv_colname="has_transaction",
+        )
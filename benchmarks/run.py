@@ -0,0 +1,182 @@
+"""Benchmarks of the MAM models on synthetic journeys.
+
+Times every benchmark registered by the bench_*.py modules of this folder for each
+combination of number of journeys, channels and mean journey length, records the
+peak memory allocated by each call with tracemalloc and compares both against the
+baselines stored in baselines.json, exiting with status 1 on a regression.
+
+Usage, from the repository root:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --journeys 1e4 1e5 1e6 --channels 10 50 --length 3 8
+    python benchmarks/run.py --filter markov --repeat 5
+    python benchmarks/run.py --filter import   # import time in a new interpreter
+    python benchmarks/run.py --save    # stores the results as the new baselines
+
+The files are not named test_*.py, so pytest does not collect them.
+"""
+
+import argparse
+import gc
+import glob
+import importlib
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from common import BENCHMARKS, Case  # noqa: E402
+
+
+def load_benchmarks():
+    for path in sorted(glob.glob(os.path.join(HERE, "bench_*.py"))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+    return BENCHMARKS
+
+
+def measure(setup, function, case, repeat, memory=True):
+    """Seconds of each one of repeat calls of function and peak memory in bytes
+    allocated by one more call, setup running untimed before every call."""
+    times = []
+    for _ in range(repeat):
+        argument = case if setup is None else setup(case)
+        gc.collect()
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+        del argument
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        argument = case if setup is None else setup(case)
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function(argument)
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        del argument
+    return times, peak
+
+
+def compare(result, baseline, tolerance, memory_tolerance):
+    """Ratios of result to baseline and whether any exceeds its tolerance."""
+    if baseline is None:
+        return "", False
+    time_ratio = result["median"] / baseline["median"]
+    notes = ["time x{:.2f}".format(time_ratio)]
+    regression = time_ratio > tolerance
+    if result.get("peak_mb") is not None and baseline.get("peak_mb"):
+        memory_ratio = result["peak_mb"] / baseline["peak_mb"]
+        notes.append("memory x{:.2f}".format(memory_ratio))
+        regression = regression or memory_ratio > memory_tolerance
+    if regression:
+        notes.append("REGRESSION")
+    return ", ".join(notes), regression
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--journeys", nargs="+", type=float, default=[1e4, 1e5], help="Journeys"
+    )
+    parser.add_argument("--channels", nargs="+", type=int, default=[10])
+    parser.add_argument(
+        "--length", nargs="+", type=float, default=[4], help="Mean journey length"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", default=None, help="Regex on benchmark names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline", default=os.path.join(HERE, "baselines.json"), help="JSON file"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as baselines"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=1.5, help="Allowed time ratio"
+    )
+    parser.add_argument(
+        "--memory-tolerance", type=float, default=1.25, help="Allowed memory ratio"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc run"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    benchmarks = [
+        benchmark
+        for benchmark in load_benchmarks()
+        if args.filter is None or re.search(args.filter, benchmark[0])
+    ]
+    results = {}
+    regressions = []
+    for n_journeys in args.journeys:
+        for n_channels in args.channels:
+            for mean_length in args.length:
+                case = Case(int(n_journeys), n_channels, mean_length, args.seed)
+                for name, setup, function, memory in benchmarks:
+                    key = "{}[{}]".format(name, case)
+                    times, peak = measure(
+                        setup,
+                        function,
+                        case,
+                        args.repeat,
+                        memory and not args.no_memory,
+                    )
+                    result = {
+                        "min": min(times),
+                        "median": statistics.median(times),
+                        "peak_mb": None if peak is None else peak / 2**20,
+                    }
+                    results[key] = result
+                    notes, regression = compare(
+                        result,
+                        baselines.get(key),
+                        args.tolerance,
+                        args.memory_tolerance,
+                    )
+                    if regression:
+                        regressions.append(key)
+                    print(
+                        "{:<75} {:>10.4f}s {:>10} {}".format(
+                            key,
+                            result["median"],
+                            (
+                                ""
+                                if peak is None
+                                else "{:.1f}MB".format(result["peak_mb"])
+                            ),
+                            notes,
+                        ),
+                        flush=True,
+                    )
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+    if regressions:
+        print("{} regressions".format(len(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,25 @@
+import contextlib
 import itertools
-import math
 import re
 import warnings
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
 
 from .models import heuristic
+from .models import markov
+from .models import shapley
 from .data import random_data
 from .data_prep import journey
 from .data_prep import group_data
+from .data_prep import parquet
+from .data_prep.channel_results import ChannelResults
+from .data_prep.model_result import Deferred, ModelResult
+from .cache import ResultCache, cached_model, fingerprint
+from . import parallel
+from . import visualization
+from .profiling import StageProfiler, profiled
+from .data_prep.journey_store import JourneyStore
 
 
 class MAM:
@@ -52,6 +60,13 @@ class MAM:
     group_channels_by_id_list = Empty list by default.
     group_timestamp_colname = None by default.
     create_journey_id_based_on_conversion = False by default.
+        Splits the sessions of each id into journeys that end with a conversion.
+        The journeys are ordered by id and then by journey number, so 'id:1_J:2'
+        comes before 'id:1_J:10', not by the journey_id strings as before;
+    break_window = None by default.
+        Used with create_journey_id_based_on_conversion. Number of days without
+        sessions of the same id after which a new journey starts, even without a
+        conversion;
     path_separator = ' > ' by default.
         If using 'group_channels = True', this should match the separator being used on
         the inputed dataframe in the channels_colname;
@@ -59,6 +74,9 @@ class MAM:
         Internal parameter for printing while working with MAM;
     random_df = False by default.
         Will create a random dataframe with testing purpose;
+    profiler = None by default.
+        StageProfiler recording the time and memory of each stage, from the
+        creation of the object on, see self.enable_profiling;
 
     OBS: If your session is crashing, try setting the variable verbose True and some
     status and tips will be printed;
@@ -75,31 +93,20 @@ class MAM:
         group_channels_by_id_list=None,
         group_timestamp_colname=None,
         create_journey_id_based_on_conversion=False,
+        break_window=None,
         path_separator=" > ",
         verbose=False,
         random_df=False,
+        profiler=None,
     ):
         if not group_channels_by_id_list:
             group_channels_by_id_list = []
 
-        self.verbose = verbose
-        self.sep = path_separator
-        self.group_by_channels_models = None
-        # self.decode_channels = None
-
-        if group_channels_by_id_list is None:
-            group_channels_by_id_list = []
-
         ##########################################################
         ################## Instance attributes ###################
         ##########################################################
 
-        self._first_click = None
-        self._last_click = None
-        self._last_click_non = None
-        self._linear = None
-        self._position_based = None
-        self._time_decay = None
+        self._init_state(path_separator, verbose, profiler)
 
         #####################################################
         ##### Section 1: Creating object and attributes #####
@@ -124,7 +131,141 @@ class MAM:
 
         if group_channels:
 
-            # Copying, sorting and converting variables
+            (
+                self._journeys,
+                self.journey_id,
+                self.journey_with_conv,
+                self.conversion_value,
+            ) = self._group_sessions(
+                df,
+                conversion_value,
+                channels_colname,
+                journey_with_conv_colname,
+                group_channels_by_id_list,
+                group_timestamp_colname,
+                create_journey_id_based_on_conversion,
+                break_window,
+            )
+            self._index = pd.RangeIndex(len(self._journeys))
+
+        #################################
+        #### group_channels == False ####
+        #################################
+        else:
+            # df = df.reset_index().copy()
+            self.journey_id = df[group_channels_by_id_list]
+            self._print("Status_journey_id: Done")
+
+            self._index = df.index
+
+            ##########################################
+            ### self._journeys: channels and times ###
+            ##########################################
+
+            if time_till_conv_colname in (None, "skip_column"):
+                time_till_conv = None
+            else:
+                time_till_conv = df[time_till_conv_colname]
+
+            # converts channels str to the flat journey store
+            with self._stage("journey_building", rows=len(df)):
+                if isinstance(df[channels_colname].iloc[0], str):
+                    self._print("Status_journey_to_store: Working")
+                    self._journeys = JourneyStore.from_strings(
+                        df[channels_colname], self.sep, time_till_conv
+                    )
+                else:
+                    self._print("Status_journey_to_store: Working from lists")
+                    self._journeys = JourneyStore.from_lists(
+                        df[channels_colname], time_till_conv
+                    )
+            self._print("Status_journey_to_store: Done")
+
+            if time_till_conv_colname is None:
+                self._print(
+                    "If your session is crashing here, try setting the variable "
+                    + "time_till_conv_colname equal to skip_column"
+                )
+                self._set_default_times()
+            elif time_till_conv_colname == "skip_column":
+                print(
+                    "Skipping this column you will not be able to run all the "
+                    + "models in this class"
+                )
+            self._print("Status_time_till_conv: Done")
+
+            ##############################
+            ### self.journey_with_conv ###
+            ##############################
+            if journey_with_conv_colname is None:
+                self.journey_with_conv = pd.Series(True, index=self._index)
+            else:
+                self.journey_with_conv = df[journey_with_conv_colname]
+            self._print("Status_journey_with_conv: Done")
+
+            ########################
+            ### conversion_value ###
+            ########################
+
+            # conversion_value could be a single int value or a panda series
+            with self._stage("conversions", rows=len(df)):
+                if isinstance(conversion_value, int):
+                    self.conversion_value = self.journey_with_conv.apply(
+                        lambda valor: conversion_value if valor else 0
+                    )
+                else:
+                    self.conversion_value = df[conversion_value]
+
+        # if conversion_null_value is None:
+        #   self.conversion_null_value = None
+        # elif isinstance(conversion_value, str):
+        #   self.conversion_null_value = df[conversion_null_value]
+
+        #################
+        ### DataFrame ###
+        #################
+
+        self.data_frame = None
+        # self.as_pd_dataframe()
+
+    def _init_state(self, path_separator, verbose, profiler=None):
+        self.verbose = verbose
+        self.sep = path_separator
+        self.profiler = profiler
+        self.group_by_channels_models = None
+
+        self._first_click = None
+        self._last_click = None
+        self._last_click_non = None
+        self._linear = None
+        self._position_based = None
+        self._time_decay = None
+        self._characteristic_functions = {}
+        self._touchpoint_results = {}
+        self.data_frame = None
+        self._cache = None
+        self._cache_recording = False
+
+    def _group_sessions(
+        self,
+        df,
+        conversion_value,
+        channels_colname,
+        journey_with_conv_colname,
+        group_channels_by_id_list,
+        group_timestamp_colname,
+        create_journey_id_based_on_conversion,
+        break_window,
+    ):
+        """Groups a DataFrame of sessions into journeys.
+
+        Returns a tuple (journeys, journey_id, journey_with_conv, conversion_value)
+        with one entry per journey, sorted by group_channels_by_id_list and then,
+        with create_journey_id_based_on_conversion, by the integer journey number.
+        """
+
+        # Copying, sorting and converting variables
+        with self._stage("ingestion", rows=len(df)):
             df = (
                 df.copy()
                 .reset_index()
@@ -132,151 +273,369 @@ class MAM:
                 .sort_values(group_channels_by_id_list + ["timestamp"])
             )
 
-            if create_journey_id_based_on_conversion:
+        if create_journey_id_based_on_conversion:
 
+            # Integer journey number within each id, grouped together with the
+            # id columns and only turned into strings once per journey
+            with self._stage("journey_ids", rows=len(df)):
                 df = journey.journey_id_based_on_conversion(
                     df=df,
                     group_id=group_channels_by_id_list,
                     transaction_colname=journey_with_conv_colname,
+                    timestamp_colname="timestamp",
+                    break_window=break_window,
+                    as_string=False,
                 )
-                group_channels_by_id_list = ["journey_id"]
+            user_id_colname = group_channels_by_id_list[0]
+            group_channels_by_id_list = group_channels_by_id_list + ["journey_id"]
 
-            # Grouping channels based on group_channels_by_id_list
-            ######################################################
+        # Grouping channels based on group_channels_by_id_list
+        ######################################################
 
-            df_temp = group_data.group_channels(
+        with self._stage("grouping", rows=len(df)):
+            journey_keys, journeys = group_data.group_journeys(
                 df,
                 channels_colname,
-                group_timestamp_colname,
+                "timestamp",
                 group_channels_by_id_list,
                 print_log=False,
             )
+            index = pd.RangeIndex(len(journeys))
+            if create_journey_id_based_on_conversion:
+                journey_keys = pd.DataFrame(
+                    {
+                        "journey_id": journey.journey_id_to_string(
+                            journey_keys[user_id_colname], journey_keys["journey_id"]
+                        )
+                    }
+                )
+        self._print("Status: Done")
 
-            self.channels = df_temp["channel"].copy()
-            self.time_till_conv = df_temp["time_till_conv"].copy()
-            self._print("Status: Done")
-
+        with self._stage("conversions", rows=len(df)):
             if journey_with_conv_colname is None:
 
                 # If journey_with_conv_colname is None, we will assume that
                 # all journeys ended in a conversion
                 ###########################################################
-                self.journey_with_conv = self.channels.apply(lambda x: True)
-                self.journey_id = pd.Series(df[group_channels_by_id_list].unique())
+                journey_with_conv = pd.Series(True, index=index)
 
             else:
                 # Grouping unique journeys and whether the journey ended with a
                 # conversion
                 ##########################################################
                 self._print("Grouping journey_id and journey_with_conv...")
-                df_temp = df[group_channels_by_id_list + [journey_with_conv_colname]]
-                temp_journey_id_conv = (
-                    df_temp.groupby(group_channels_by_id_list)[
-                        journey_with_conv_colname
-                    ]
+                journey_with_conv = (
+                    df.groupby(group_channels_by_id_list)[journey_with_conv_colname]
                     .max()
-                    .reset_index()
+                    .reset_index(drop=True)
                 )
-                self.journey_id = temp_journey_id_conv[group_channels_by_id_list]
-                self._print("Status: Done")
-                self.journey_with_conv = temp_journey_id_conv[journey_with_conv_colname]
                 self._print("Status: Done")
 
             # conversion_value could be a single int value or a panda series
             if isinstance(conversion_value, int):
-                self.conversion_value = self.journey_with_conv.apply(
+                conversion_value = journey_with_conv.apply(
                     lambda valor: conversion_value if valor else 0
                 )
             else:
-                self.conversion_value = (
+                conversion_value = (
                     df.groupby(group_channels_by_id_list)[conversion_value]
                     .sum()
-                    .reset_index()[conversion_value]
+                    .reset_index(drop=True)
                 )
 
-        #################################
-        #### group_channels == False ####
-        #################################
+        return journeys, journey_keys, journey_with_conv, conversion_value
+
+    def _set_default_times(self):
+        # Each touchpoint is assumed to be one day apart from the next one
+        self._journeys.times = (
+            self._journeys.repeat(self._journeys.offsets[1:])
+            - np.arange(self._journeys.n_touchpoints)
+            - 1
+        ) * 24.0
+
+    @classmethod
+    def _from_journeys(
+        cls,
+        journeys,
+        journey_with_conv,
+        conversion_value,
+        index=None,
+        path_separator=" > ",
+        verbose=False,
+    ):
+        """MAM object over an already built JourneyStore, with the conversions and
+        conversion values of each journey and an empty journey_id."""
+        self = cls.__new__(cls)
+        self._init_state(path_separator, verbose)
+        self._journeys = journeys
+        self._index = pd.RangeIndex(len(journeys)) if index is None else index
+        self.journey_id = pd.DataFrame(index=self._index)
+        self.journey_with_conv = pd.Series(
+            np.asarray(journey_with_conv, dtype=bool), index=self._index
+        )
+        self.conversion_value = pd.Series(
+            np.asarray(conversion_value), index=self._index
+        )
+        return self
+
+    @classmethod
+    def from_chunks(
+        cls,
+        chunks,
+        channels_colname,
+        group_channels_by_id_list,
+        group_timestamp_colname,
+        conversion_value=1,
+        journey_with_conv_colname=None,
+        create_journey_id_based_on_conversion=False,
+        break_window=None,
+        path_separator=" > ",
+        verbose=False,
+        profiler=None,
+    ):
+        """Creates a MAM object from session rows (group_channels=True input) read in
+        chunks, for data that does not fit in memory at once.
+
+        The chunks must be partitioned by group_channels_by_id_list: all the rows of
+        an id are in one chunk or in consecutive chunks, as when reading a file
+        sorted by id. The rows of the last id of each chunk are carried over to the
+        next one, since its journeys may still be open, and every other id is
+        grouped into journeys as soon as its chunk is read. Only the columnar
+        journeys are kept, so the peak memory is bounded by the chunk size.
+
+        Parameters:
+        chunks =
+            Iterable of Pandas DataFrames with the session rows, e.g.
+            pd.read_csv(..., chunksize=...);
+        The other parameters are the same as in MAM().
+        """
+        self = cls.__new__(cls)
+        self._init_state(path_separator, verbose, profiler)
+        arguments = (
+            conversion_value,
+            channels_colname,
+            journey_with_conv_colname,
+            group_channels_by_id_list,
+            group_timestamp_colname,
+            create_journey_id_based_on_conversion,
+            break_window,
+        )
+
+        pieces = []
+        carry = None
+        for chunk in chunks:
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            if chunk.empty:
+                continue
+            ids = chunk[group_channels_by_id_list]
+            last_id = (ids == ids.iloc[-1]).all(axis=1).to_numpy()
+            carry = chunk[last_id]
+            if not last_id.all():
+                pieces.append(self._group_sessions(chunk[~last_id], *arguments))
+            self._print("Status: chunk of", len(chunk), "rows grouped")
+        if carry is not None and not carry.empty:
+            pieces.append(self._group_sessions(carry, *arguments))
+        if not pieces:
+            raise ValueError("from_chunks needs at least one non empty chunk")
+
+        self._journeys = JourneyStore.concat([piece[0] for piece in pieces])
+        self._index = pd.RangeIndex(len(self._journeys))
+        self.journey_id = pd.concat([piece[1] for piece in pieces], ignore_index=True)
+        self.journey_with_conv = pd.concat(
+            [piece[2] for piece in pieces], ignore_index=True
+        )
+        self.conversion_value = pd.concat(
+            [piece[3] for piece in pieces], ignore_index=True
+        )
+        return self
+
+    @classmethod
+    def read_parquet(
+        cls,
+        path,
+        channels_colname="channels",
+        time_till_conv_colname=None,
+        journey_with_conv_colname=None,
+        conversion_value=1,
+        journey_id_colnames=None,
+        batch_size=65536,
+        path_separator=" > ",
+        verbose=False,
+        profiler=None,
+    ):
+        """Creates a MAM object from a parquet file with one journey per row
+        (group_channels=False input), with the channels and the times till
+        conversion as list columns. Requires pyarrow.
+
+        Only the columns named in the parameters are read, batch_size rows at a
+        time, and the lists are loaded directly into the columnar journeys without
+        splitting strings. Dictionary encoded channel names are kept as codes.
+
+        Parameters:
+        journey_id_colnames = None by default.
+            List of columns identifying the journeys, kept on self.journey_id;
+        The other parameters are the same as in MAM().
+        """
+        journey_id_colnames = list(journey_id_colnames or [])
+        columns = list(journey_id_colnames)
+        if journey_with_conv_colname is not None:
+            columns.append(journey_with_conv_colname)
+        if not isinstance(conversion_value, int):
+            columns.append(conversion_value)
+
+        self = cls.__new__(cls)
+        self._init_state(path_separator, verbose, profiler)
+        with self._stage("ingestion") as stage:
+            self._journeys, frame = parquet.read_journeys(
+                path,
+                channels_colname,
+                time_till_conv_colname,
+                columns=list(dict.fromkeys(columns)),
+                batch_size=batch_size,
+            )
+            stage["rows"] = len(self._journeys)
+        self._index = pd.RangeIndex(len(self._journeys))
+        if time_till_conv_colname is None:
+            self._set_default_times()
+
+        self.journey_id = frame[journey_id_colnames]
+        if journey_with_conv_colname is None:
+            self.journey_with_conv = pd.Series(True, index=self._index)
         else:
-            # df = df.reset_index().copy()
-            self.journey_id = df[group_channels_by_id_list]
-            self._print("Status_journey_id: Done")
+            self.journey_with_conv = frame[journey_with_conv_colname]
+        if isinstance(conversion_value, int):
+            self.conversion_value = self.journey_with_conv.apply(
+                lambda valor: conversion_value if valor else 0
+            )
+        else:
+            self.conversion_value = frame[conversion_value]
+        return self
 
-            #####################
-            ### self.channels ###
-            #####################
+    @profiled
+    def to_parquet(self, path, models=None, row_group_size=None):
+        """Writes the journeys and the attribution of each touchpoint to a parquet
+        file with one journey per row. Requires pyarrow.
 
-            # converts channels str to list of channels
-            if isinstance(df[channels_colname][0], str):
-                self._print("Status_journey_to_list: Working")
-                self.channels = df[channels_colname].apply(lambda x: x.split(self.sep))
-                self._print("Status_journey_to_list: Done")
-            else:
-                self.channels = df[channels_colname]
-                self._print("Status_journey_to_list: Skipped")
+        The channels ("channels", dictionary encoded), the times till conversion
+        ("time_till_conv") and the results of each model are written as list
+        columns aligned with each other, next to the journey_id columns,
+        "converted_agg" and "conversion_value".
 
-            ###########################
-            ### self.time_till_conv ###
-            ###########################
-            if time_till_conv_colname is None:
-                self._print(
-                    "If your session is crashing here, try setting the variable "
-                    + "time_till_conv_colname equal to skip_column"
-                )
-                self.time_till_conv = self.channels.apply(
-                    lambda x: list(range(len(x)))[::-1]
-                )
-                self.time_till_conv = self.time_till_conv.apply(
-                    lambda x: list(np.asarray(x) * 24)
-                )
-            else:
-                if time_till_conv_colname == "skip_column":
-                    self.time_till_conv = None
-                    print(
-                        "Skipping this column you will not be able to run all the "
-                        + "models in this class"
-                    )
-                else:
-                    if isinstance(df[channels_colname][0], str):
-                        self.time_till_conv = df[time_till_conv_colname].apply(
-                            lambda x: [float(value) for value in x.split(self.sep)]
-                        )
-                    else:
-                        self.time_till_conv = df[time_till_conv_colname]
-            self._print("Status_time_till_conv: Done")
+        Parameters:
+        models = None by default.
+            List with the model column names to write, all the models that
+            attributed values to the touchpoints by default;
+        row_group_size = None by default.
+            Maximum number of journeys in each row group of the file.
+        """
+        if models is None:
+            models = list(self._touchpoint_results)
+        frame = (
+            self.journey_id.reset_index(drop=True)
+            if isinstance(self.journey_id, pd.DataFrame)
+            else pd.DataFrame({"journey_id": np.asarray(self.journey_id)})
+        )
+        frame = frame.assign(
+            converted_agg=np.asarray(self.journey_with_conv),
+            conversion_value=np.asarray(self.conversion_value),
+        )
+        parquet.write_journeys(
+            path,
+            self._journeys,
+            frame,
+            {model: self._touchpoint_results[model] for model in models},
+            row_group_size=row_group_size,
+        )
 
-            ##############################
-            ### self.journey_with_conv ###
-            ##############################
-            if journey_with_conv_colname is None:
-                self.journey_with_conv = self.channels.apply(lambda x: True)
-            else:
-                self.journey_with_conv = df[journey_with_conv_colname]
-            self._print("Status_journey_with_conv: Done")
+    def enable_cache(self, cache=None, maxsize=32, directory=None):
+        """Stores the results of the attribution methods and returns them, without
+        running the model again, when a method is called with the same parameters
+        on the same journeys.
 
-            ########################
-            ### conversion_value ###
-            ########################
+        The results are keyed by the method, its parameters and a hash of the
+        journeys, conversions and conversion values, so a cache can be shared by
+        several MAM objects and, with a directory, by other sessions. The hash is
+        computed on every call, so changes made in place are also taken into
+        account.
 
-            # conversion_value could be a single int value or a panda series
-            if isinstance(conversion_value, int):
-                self.conversion_value = self.journey_with_conv.apply(
-                    lambda valor: conversion_value if valor else 0
-                )
-            else:
-                self.conversion_value = df[conversion_value]
+        Parameters:
+        cache = None by default.
+            ResultCache to be used, a new one is created by default;
+        maxsize = 32 by default.
+            Number of results kept in memory, the least recently used are evicted;
+        directory = None by default.
+            Folder where the results are also stored on disk.
+
+        Returns the ResultCache.
+        """
+        if cache is None:
+            cache = ResultCache(maxsize=maxsize, directory=directory)
+        self._cache = cache
+        return cache
 
-        # if conversion_null_value is None:
-        #   self.conversion_null_value = None
-        # elif isinstance(conversion_value, str):
-        #   self.conversion_null_value = df[conversion_null_value]
+    def disable_cache(self):
+        self._cache = None
 
-        #################
-        ### DataFrame ###
-        #################
+    def enable_profiling(
+        self, profiler=None, trace_memory=False, logger=None, callback=None
+    ):
+        """Records the wall time, CPU time, peak memory and number of rows of each
+        stage run from now on: each attribution method, the aggregation of its
+        results by channel and the creation of the output DataFrames and files.
+        The stages of the creation of the object are only recorded when the
+        profiler is given to MAM().
 
-        self.data_frame = None
-        # self.as_pd_dataframe()
+        Parameters:
+        profiler = None by default.
+            StageProfiler to be used, a new one is created by default;
+        trace_memory = False by default.
+            Records the peak memory of each stage with tracemalloc, which slows
+            down the stages;
+        logger = None by default.
+            logging.Logger where each finished stage is logged;
+        callback = None by default.
+            Function called with the record of each finished stage.
+
+        Returns the StageProfiler, the records are also on self.profile.
+        """
+        if profiler is None:
+            profiler = StageProfiler(trace_memory, logger, callback)
+        self.profiler = profiler
+        return profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+
+    @property
+    def profile(self):
+        """Pandas DataFrame with one row per recorded stage, or None when the
+        profiling is not enabled."""
+        if self.profiler is None:
+            return None
+        return self.profiler.to_frame()
+
+    def _stage(self, name, rows=None):
+        """Context manager recording a stage on the profiler, if there is one."""
+        if self.profiler is None:
+            return contextlib.nullcontext({})
+        return self.profiler.stage(name, rows)
+
+    def _fingerprint(self):
+        """Content hash of the inputs of the models.
+
+        It is computed again on every call, so it also changes when the journeys
+        or the conversions are edited in place.
+        """
+        return fingerprint(
+            self._journeys.codes,
+            self._journeys.offsets,
+            self._journeys.vocabulary,
+            self._journeys.times,
+            np.asarray(self.journey_with_conv, dtype=bool),
+            np.asarray(self.conversion_value, dtype=float),
+            np.asarray([self.sep]),
+        )
 
     ######################################
     ##### Section 2: Output methods  #####
@@ -286,33 +645,123 @@ class MAM:
         if self.verbose:
             print(*args, **kwargs)
 
+    @property
+    def channels(self):
+        """Pandas Series with the list of channels of each journey, materialized
+        from the journey store."""
+        return pd.Series(self._journeys.channel_lists(), index=self._index)
+
+    @channels.setter
+    def channels(self, channels):
+        self._set_journeys(JourneyStore.from_lists(channels, self.time_till_conv))
+
+    def _set_journeys(self, journeys):
+        """Replaces the journeys, dropping the results computed on the old ones."""
+        self._journeys = journeys
+        self._characteristic_functions = {}
+        self._touchpoint_results = {}
+        self.data_frame = None
+
+    @property
+    def time_till_conv(self):
+        """Pandas Series with the list of times till conversion of each journey,
+        materialized from the journey store."""
+        if self._journeys.times is None:
+            return None
+        return pd.Series(self._journeys.time_lists(), index=self._index)
+
+    @time_till_conv.setter
+    def time_till_conv(self, time_till_conv):
+        if time_till_conv is None:
+            self._journeys.times = None
+        else:
+            self._journeys = JourneyStore.from_lists(
+                self._journeys.channel_lists(), time_till_conv
+            )
+
+    def _journey_conversion_values(self):
+        """Numpy array with the conversion value of each journey, zeroed for the
+        journeys that did not convert."""
+        return np.asarray(self.conversion_value, dtype=float) * np.asarray(
+            self.journey_with_conv, dtype=bool
+        )
+
+    @property
+    def group_by_channels_models(self):
+        """Pandas DataFrame with the value attributed to each channel by each model,
+        built from the results accumulator when it is asked for, or None before
+        the first model."""
+        if not len(self._channel_results):
+            return None
+        return self._channel_results.to_frame()
+
+    @group_by_channels_models.setter
+    def group_by_channels_models(self, frame):
+        if frame is None:
+            self._channel_results = ChannelResults()
+        else:
+            self._channel_results = ChannelResults.from_frame(frame)
+
+    @property
+    def data_frame(self):
+        """Pandas DataFrame with the journeys and the results of each model joined
+        by self.sep, built on demand by self.as_pd_dataframe()."""
+        return self.as_pd_dataframe()
+
+    @data_frame.setter
+    def data_frame(self, data_frame):
+        self._data_frame = data_frame
+        self._pending_results = []
+
+    @profiled
     def as_pd_dataframe(self):
         """Return inputed attributes as a Pandas Data Frame on
-        self.DataFrame."""
-        if not isinstance(self.data_frame, pd.DataFrame):
+        self.DataFrame.
+
+        The models keep their results as flat numeric arrays, so the string columns
+        are only built here, when the DataFrame is asked for, and cached until the
+        next model run.
+        """
+        if not isinstance(self._data_frame, pd.DataFrame):
+            channels_agg = pd.Series(
+                self._journeys.join(self._journeys.channel_names(), self.sep),
+                index=self._index,
+            )
             if isinstance(self.journey_id, pd.DataFrame):
-                self.data_frame = self.journey_id
-                self.data_frame["channels_agg"] = self.channels.apply(self.sep.join)
-                self.data_frame["converted_agg"] = self.journey_with_conv
-                self.data_frame["conversion_value"] = self.conversion_value
+                data_frame = self.journey_id.copy()
+                data_frame["channels_agg"] = channels_agg
+                data_frame["converted_agg"] = self.journey_with_conv
+                data_frame["conversion_value"] = self.conversion_value
             else:
-                self.data_frame = pd.DataFrame(
+                data_frame = pd.DataFrame(
                     {
                         "journey_id": self.journey_id,
-                        "channels_agg": self.channels.apply(self.sep.join),
+                        "channels_agg": channels_agg,
                         "converted_agg": self.journey_with_conv,
                         "conversion_value": self.conversion_value,
                     }
                 )
-            if self.time_till_conv is None:
-                self.data_frame["time_till_conv_agg"] = None
+            if self._journeys.times is None:
+                data_frame["time_till_conv_agg"] = None
             else:
-                self.data_frame["time_till_conv_agg"] = self.time_till_conv.apply(
-                    lambda x: self.sep.join([str(value) for value in x])
+                data_frame["time_till_conv_agg"] = pd.Series(
+                    self._journeys.join(self._journeys.times, self.sep),
+                    index=self._index,
                 )
+            self._data_frame = data_frame
+            self._pending_results = list(self._touchpoint_results)
+
+        # Joining only the results of the models that ran since the last call
+        for model_name in self._pending_results:
+            self._data_frame[model_name] = pd.Series(
+                self._journeys.join(self._touchpoint_results[model_name], self.sep),
+                index=self._index,
+            )
+        self._pending_results = []
 
-        return self.data_frame
+        return self._data_frame
 
+    @profiled
     def attribution_all_models(
         self,
         model_type="all",
@@ -324,6 +773,9 @@ class MAM:
         shapley_values_col="conv_rate",
         markov_transition_to_same_state=False,
         group_by_channels_models=True,
+        fused_heuristics=True,
+        n_jobs=1,
+        executor=None,
     ):
         """Runs all heuristic models on this class and returns a data frame.
 
@@ -337,6 +789,17 @@ class MAM:
         model_type = ['all',
                      'heuristic',
                      'algorithmic']
+        fused_heuristics = True by default.
+            Computes all the heuristic models in a single pass over the journeys
+            with self.attribution_heuristics, instead of calling each method.
+        n_jobs = 1 by default.
+            Number of processes running the models at the same time, -1 to use
+            all the CPUs. The journeys are shared with the processes through
+            shared memory and the results are added to group_by_channels_models
+            in the same order as when the models run one after the other;
+        executor = None by default.
+            concurrent.futures executor where the models are submitted instead
+            of a new pool of n_jobs processes.
         """
 
         if model_type == "all":
@@ -349,53 +812,177 @@ class MAM:
             heuristic = False
             algorithmic = True
 
-        if heuristic:
-            # Running attribution_last_click
-            self.attribution_last_click(
-                group_by_channels_models=group_by_channels_models
-            )
-
-            # Running attribution_last_click_non
-            self.attribution_last_click_non(
-                but_not_this_channel=last_click_non_but_not_this_channel
+        tasks = []
+        if heuristic and fused_heuristics:
+            # Running all heuristic models at once
+            tasks.append(
+                (
+                    "attribution_heuristics",
+                    dict(
+                        last_click_non_but_not_this_channel=last_click_non_but_not_this_channel,
+                        time_decay_decay_over_time=time_decay_decay_over_time,
+                        time_decay_frequency=time_decay_frequency,
+                        group_by_channels_models=group_by_channels_models,
+                    ),
+                )
             )
 
-            # Running attribution_first_click
-            self.attribution_first_click(
-                group_by_channels_models=group_by_channels_models
-            )
+        elif heuristic:
+            tasks += [
+                # Running attribution_last_click
+                (
+                    "attribution_last_click",
+                    dict(group_by_channels_models=group_by_channels_models),
+                ),
+                # Running attribution_last_click_non
+                (
+                    "attribution_last_click_non",
+                    dict(but_not_this_channel=last_click_non_but_not_this_channel),
+                ),
+                # Running attribution_first_click
+                (
+                    "attribution_first_click",
+                    dict(group_by_channels_models=group_by_channels_models),
+                ),
+                # Running attribution_linear
+                (
+                    "attribution_linear",
+                    dict(group_by_channels_models=group_by_channels_models),
+                ),
+                # Running attribution_position_based
+                (
+                    "attribution_position_based",
+                    dict(group_by_channels_models=group_by_channels_models),
+                ),
+                # Running attribution_time_decay
+                (
+                    "attribution_time_decay",
+                    dict(
+                        decay_over_time=time_decay_decay_over_time,
+                        frequency=time_decay_frequency,
+                        group_by_channels_models=group_by_channels_models,
+                    ),
+                ),
+            ]
 
-            # Running attribution_linear
-            self.attribution_linear(group_by_channels_models=group_by_channels_models)
+        if algorithmic:
+            tasks += [
+                # Running attribution_shapley
+                (
+                    "attribution_shapley",
+                    dict(
+                        size=shapley_size,
+                        order=shapley_order,
+                        group_by_channels_models=group_by_channels_models,
+                        values_col=shapley_values_col,
+                    ),
+                ),
+                # Running attribution_markov
+                (
+                    "attribution_markov",
+                    dict(transition_to_same_state=markov_transition_to_same_state),
+                ),
+            ]
 
-            # Running attribution_position_based
-            self.attribution_position_based(
-                group_by_channels_models=group_by_channels_models
-            )
+        if executor is not None or (n_jobs != 1 and len(tasks) > 1):
+            parallel.run_models(self, tasks, n_jobs=n_jobs, executor=executor)
+        else:
+            for method_name, kwargs in tasks:
+                getattr(self, method_name)(**kwargs)
 
-            # Running attribution_time_decay
-            self.attribution_time_decay(
-                decay_over_time=time_decay_decay_over_time,
-                frequency=time_decay_frequency,
-                group_by_channels_models=group_by_channels_models,
-            )
+        return self.group_by_channels_models
 
-        if algorithmic:
+    @profiled
+    def attribution_by_segment(
+        self,
+        segment_cols,
+        models=("attribution_heuristics", "attribution_shapley", "attribution_markov"),
+        n_jobs=1,
+        executor=None,
+    ):
+        """Runs the models separately on the journeys of each segment and returns
+        the results of all the segments in one data frame.
 
-            # Running attribution_shapley
-            self.attribution_shapley(
-                size=shapley_size,
-                order=shapley_order,
-                group_by_channels_models=group_by_channels_models,
-                values_col=shapley_values_col,
-            )
+        The journeys are partitioned once, from the journeys already built on this
+        object, instead of creating a MAM object from a filtered data frame per
+        segment.
 
-            # Running attribution_shapley
-            self.attribution_markov(
-                transition_to_same_state=markov_transition_to_same_state
-            )
+        Parameters:
+        segment_cols =
+            Column name, or list of column names, of self.journey_id defining the
+            segments, or a Pandas DataFrame or Series with one row per journey;
+        models = ('attribution_heuristics', 'attribution_shapley',
+                  'attribution_markov') by default.
+            Names of the attribution methods run on each segment, or tuples
+            (method name, dictionary with its parameters);
+        n_jobs = 1 by default.
+            Number of processes running the segments at the same time, -1 to use
+            all the CPUs;
+        executor = None by default.
+            concurrent.futures executor where the segments are submitted instead
+            of a new pool of n_jobs processes.
+
+        Returns a Pandas DataFrame indexed by the segment columns and the channel,
+        with one column per model.
+        """
+        if isinstance(segment_cols, (pd.DataFrame, pd.Series)):
+            segments = pd.DataFrame(segment_cols).reset_index(drop=True)
+        else:
+            if isinstance(segment_cols, str):
+                segment_cols = [segment_cols]
+            segments = pd.DataFrame(self.journey_id)[list(segment_cols)]
+            segments = segments.reset_index(drop=True)
+        if len(segments) != len(self._journeys):
+            raise ValueError("segment_cols must have one row per journey")
+
+        # Methods that run other models or do not register channel results
+        not_models = (
+            "attribution_all_models",
+            "attribution_by_segment",
+            "attribution_sweep",
+        )
+        tasks = []
+        for model in models:
+            method_name, kwargs = (model, {}) if isinstance(model, str) else model
+            if (
+                not method_name.startswith("attribution_")
+                or method_name in not_models
+                or not hasattr(self, method_name)
+            ):
+                raise ValueError(f"Unknown attribution method {method_name}")
+            if not kwargs.get("group_by_channels_models", True):
+                raise ValueError(
+                    "The segment results are grouped by channel, "
+                    "group_by_channels_models cannot be False"
+                )
+            tasks.append((method_name, dict(kwargs)))
+
+        # Sorting the journeys by segment, so each one is a contiguous range
+        grouped = segments.groupby(list(segments.columns), sort=True, dropna=False)
+        segment = grouped.ngroup().to_numpy()
+        order = np.argsort(segment, kind="stable")
+        offsets = np.zeros(grouped.ngroups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(segment, minlength=grouped.ngroups), out=offsets[1:])
+        journeys = MAM._from_journeys(
+            self._journeys.take(order),
+            np.asarray(self.journey_with_conv, dtype=bool)[order],
+            np.asarray(self.conversion_value)[order],
+            path_separator=self.sep,
+        )
 
-        return self.group_by_channels_models
+        results = parallel.run_segments(
+            journeys,
+            list(zip(offsets[:-1].tolist(), offsets[1:].tolist())),
+            tasks,
+            n_jobs=n_jobs,
+            executor=executor,
+        )
+        keys = grouped.size().index
+        return pd.concat(
+            [frame.set_index("channels") for frame in results],
+            keys=keys,
+            names=list(keys.names) + ["channels"],
+        )
 
     def plot(
         self,
@@ -408,7 +995,8 @@ class MAM:
     ):
 
         """Barplot of the results that were generated and stored on the
-        variable self.group_by_channels_models.
+        variable self.group_by_channels_models. Requires matplotlib and seaborn,
+        installed with the 'plot' extra.
 
         Parameters:
         model_type = ['all',
@@ -454,18 +1042,7 @@ class MAM:
         # Melting DF so the results are devided into 'channels', 'variable' and 'value'
         df_plot = pd.melt(df_plot, id_vars="channels")
 
-        # Plot Parameters
-        ax, _ = plt.subplots(figsize=(20, 7))
-        ax = sns.barplot(
-            data=df_plot, hue="variable", y="value", x="channels", *args, **kwargs
-        )
-        plt.xticks(rotation=15)
-        ax.legend(loc="upper left", frameon=True, fancybox=True)
-        ax.axhline(0, color="black", linestyle="-", alpha=1, lw=2)
-        ax.grid(color="gray", linestyle=":", linewidth=1, axis="y")
-        ax.set_frame_on(False)
-
-        return ax
+        return visualization.barplot(df_plot, *args, **kwargs)
 
     def channels_journey_time_based_overwrite(
         self, selected_channel="Direct", time_window=24, order=1, inplace=False
@@ -487,63 +1064,72 @@ class MAM:
               order 1 output: [Organic > Organic > Direct]
               order 2 output: [Organic > Organic > Organic]
         """
-        frame = self.channels.to_frame(name="channels")
-        frame["time_till_conv_window"] = self.time_till_conv.apply(
-            lambda time_till_conv: [time_window + 1]
-            + [
-                time - time_till_conv[i + 1]
-                for i, time in enumerate(time_till_conv)
-                if i < len(time_till_conv) - 1
-            ]
-        )
-        frame["time_till_conv_window"] = frame["time_till_conv_window"].apply(
-            lambda time_till_conv: np.absolute(np.asarray(time_till_conv)).tolist()
+        journeys = self._journeys
+        position = np.arange(journeys.n_touchpoints) - journeys.repeat(journeys.starts)
+
+        # Hours between each touchpoint and the previous one of its journey
+        gap = np.full(journeys.n_touchpoints, np.inf)
+        gap[1:] = np.absolute(journeys.times[:-1] - journeys.times[1:])
+        overwrite = (position > 0) & (gap < time_window)
+
+        selected = journeys.code_of(selected_channel)
+        codes = journeys.codes
+        for _ in range(order):
+            codes = np.where(overwrite & (codes == selected), np.roll(codes, 1), codes)
+
+        # Dropping the channels that were overwritten everywhere
+        present, codes = np.unique(codes, return_inverse=True)
+        journeys = JourneyStore(
+            codes, journeys.offsets, journeys.vocabulary[present], journeys.times
         )
-        loop_count = 0
-        while loop_count < order:
-            frame["channels"] = frame.apply(
-                lambda x: [
-                    x.channels[i - 1]
-                    if ((canal == selected_channel) & (time < time_window))
-                    else canal
-                    for i, (canal, time) in enumerate(
-                        zip(x.channels, x.time_till_conv_window)
-                    )
-                ],
-                axis=1,
-            )
-            loop_count += 1
 
         if inplace:
-            self.channels = frame["channels"].copy()
+            self._set_journeys(journeys)
             new_channels = None
         else:
-            new_channels = frame["channels"].copy()
+            new_channels = pd.Series(
+                journeys.channel_lists(), index=self._index, name="channels"
+            )
 
         return new_channels
 
+    def _model_result(self, values, *results):
+        """Tuple-like result of a model, with the flat attributed values as a Series
+        with a list of values for each journey, only built when it is accessed, and
+        the other results."""
+        return ModelResult(values, self._journeys.offsets, self._index, *results)
+
+    def _register_touchpoint_results(self, values, model_name):
+        """Keeps flat attributed values, aligned with the journey store
+        touchpoints, to be added to self.data_frame when it is asked for."""
+        self._touchpoint_results[model_name] = values
+        if model_name not in self._pending_results:
+            self._pending_results.append(model_name)
+
+    @profiled
     def group_by_results_function(self, channels_value, model_name):
         """Internal function to generate the group_by_channels_models.
 
-        A pandas DF containing the attributed values for each channel
+        A pandas DF containing the attributed values for each channel.
+        channels_value can be a flat array aligned with the journey store
+        touchpoints or a Series with a list of values for each journey.
         """
-        channels_list = []
-        self.channels.apply(channels_list.extend)
-        values_list = []
-        channels_value.apply(values_list.extend)
-
-        frame = pd.DataFrame({"channels": channels_list, "value": values_list})
-        frame = frame.groupby(["channels"])["value"].sum()
+        if isinstance(channels_value, np.ndarray):
+            values = channels_value
+        else:
+            values = np.fromiter(
+                itertools.chain.from_iterable(channels_value),
+                dtype=float,
+                count=self._journeys.n_touchpoints,
+            )
+        frame = self._journeys.channel_totals(values)
 
-        if isinstance(self.group_by_channels_models, pd.DataFrame):
+        if len(self._channel_results):
+            self._channel_results.set(model_name, frame)
             frame = frame.reset_index()
             frame.columns = ["channels", model_name]
-            self.group_by_channels_models = pd.merge(
-                self.group_by_channels_models, frame, how="outer", on=["channels"]
-            ).fillna(0)
         else:
-            self.group_by_channels_models = frame.reset_index()
-            self.group_by_channels_models.columns = ["channels", model_name]
+            self._channel_results.set(model_name, frame)
 
         return frame
 
@@ -691,6 +1277,8 @@ class MAM:
     ##### Section 3: Channel Attribution methods  #####
     ###################################################
 
+    @profiled
+    @cached_model
     def attribution_last_click(self, group_by_channels_models=True):
         """The last touchpoint receives all the credit.
 
@@ -702,54 +1290,27 @@ class MAM:
         model_name = "attribution_last_click_heuristic"
 
         # Results part 1: Column values
-        # Results in the same format as the DF
-        channels_value = self.channels.apply(heuristic.last_click)
-        # multiplying the results with the conversion value
-        channels_value = channels_value * self.conversion_value
-        # multiplying with the boolean column that indicates whether the conversion
-        # happened
-        channels_value = channels_value * self.journey_with_conv.apply(int)
-        channels_value = channels_value.apply(lambda values: values.tolist())
+        # Results in the same format as the DF, the conversion value of the journeys
+        # that converted is given to the last touchpoint
+        values = heuristic.last_click_batch(
+            self._journeys.offsets, self._journey_conversion_values()
+        )
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Results part 2: Results
         if group_by_channels_models:
-
-            # Selecting last channel from the series
-            channels_series = self.channels.apply(lambda x: x[-1])
-
-            # Creating a data_frame where we have the last channel and the
-            # conversion values
-            frame = channels_series.to_frame(name="channels")
-            # multiplying with the boolean column that indicates if the conversion
-            # happened
-            frame["value"] = self.conversion_value * self.journey_with_conv.apply(int)
-
-            # Grouping by channels and adding the values
-            frame = frame.groupby(["channels"])["value"].sum()
-
-            # Grouped Results
-            if isinstance(self.group_by_channels_models, pd.DataFrame):
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                self.group_by_channels_models = pd.merge(
-                    self.group_by_channels_models, frame, how="outer", on=["channels"]
-                ).fillna(0)
-            else:
-                self.group_by_channels_models = frame.reset_index()
-                self.group_by_channels_models.columns = ["channels", model_name]
+            frame = self.group_by_results_function(values, model_name)
         else:
             frame = "group_by_channels_models = False"
 
-        self._last_click = (channels_value, frame)
+        self._last_click = self._model_result(values, frame)
 
         return self._last_click
 
+    @profiled
+    @cached_model
     def attribution_last_click_non(
         self, but_not_this_channel="Direct", group_by_channels_models=True
     ):
@@ -767,68 +1328,30 @@ class MAM:
         model_name = "attribution_last_click_non_" + but_not_this_channel + "_heuristic"
 
         # Results part 1: Column values
-        # Results in the same format as the DF
-        channels_value = self.channels.apply(
-            lambda canais: heuristic.last_click_non(canais, but_not_this_channel)
+        # Results in the same format as the DF, the conversion value of the journeys
+        # that converted is given to the last touchpoint that is not the chosen one
+        values = heuristic.last_click_non_batch(
+            self._journeys.codes,
+            self._journeys.offsets,
+            self._journeys.code_of(but_not_this_channel),
+            self._journey_conversion_values(),
         )
-        # multiplying the results with the conversion value
-        channels_value = channels_value * self.conversion_value
-        # multiplying with the boolean column that indicates if the conversion
-        # happened
-        channels_value = channels_value * self.journey_with_conv.apply(int)
-        channels_value = channels_value.apply(lambda values: values.tolist())
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Results part 2: Results
         if group_by_channels_models:
+            frame = self.group_by_results_function(values, model_name)
+        else:
+            frame = "group_by_channels_models = False"
 
-            # Selecting the last channel that is not the one chosen
-            channels_series = self.channels.apply(
-                lambda canais: (
-                    canais[-1]
-                    if len([canal for canal in canais if canal != but_not_this_channel])
-                    == 0
-                    else canais[
-                        max(
-                            [
-                                i
-                                for i, canal in enumerate(canais)
-                                if canal != but_not_this_channel
-                            ]
-                        )
-                    ]
-                )
-            )
-
-            # Creating a data_frame where we have the last channel and the
-            # conversion values
-            frame = channels_series.to_frame(name="channels")
-            # multiplying with the boolean column that indicates whether the conversion
-            # happened
-            frame["value"] = self.conversion_value * self.journey_with_conv.apply(int)
-
-            # Grouping by channels and adding the values
-            frame = frame.groupby(["channels"])["value"].sum()
-
-            if isinstance(self.group_by_channels_models, pd.DataFrame):
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                self.group_by_channels_models = pd.merge(
-                    self.group_by_channels_models, frame, how="outer", on=["channels"]
-                ).fillna(0)
-            else:
-                self.group_by_channels_models = frame.reset_index()
-                self.group_by_channels_models.columns = ["channels", model_name]
-
-        self._last_click_non = (channels_value, frame)
+        self._last_click_non = self._model_result(values, frame)
 
         return self._last_click_non
 
+    @profiled
+    @cached_model
     def attribution_first_click(self, group_by_channels_models=True):
         """The first touchpoint recieves all the credit.
 
@@ -842,52 +1365,29 @@ class MAM:
         # Results part 1: Column values
         ###############################
 
-        # Results in the same format as the DF
-        channels_value = self.channels.apply(heuristic.first_click)
-        # multiplying the results with the conversion value
-        channels_value = channels_value * self.conversion_value
-        # multiplying with the boolean column that indicates if the conversion
-        # happened
-        channels_value = channels_value * self.journey_with_conv.apply(int)
-        channels_value = channels_value.apply(lambda values: values.tolist())
+        # Results in the same format as the DF, the conversion value of the journeys
+        # that converted is given to the first touchpoint
+        values = heuristic.first_click_batch(
+            self._journeys.offsets, self._journey_conversion_values()
+        )
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Results part 2: Grouped Results
         #################################
 
         if group_by_channels_models:
-            # Selecting first channel from the series
-            channels_series = self.channels.apply(lambda x: x[0])
-
-            # Creating a data_frame where we have the last channel and the
-            # conversion values
-            frame = channels_series.to_frame(name="channels")
-            # multiplying with the boolean column that indicates if the conversion
-            # happened
-            frame["value"] = self.conversion_value * self.journey_with_conv.apply(int)
-
-            # Grouping by channels and adding the values
-            frame = frame.groupby(["channels"])["value"].sum()
-
-            if isinstance(self.group_by_channels_models, pd.DataFrame):
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                self.group_by_channels_models = pd.merge(
-                    self.group_by_channels_models, frame, how="outer", on=["channels"]
-                ).fillna(0)
-            else:
-                self.group_by_channels_models = frame.reset_index()
-                self.group_by_channels_models.columns = ["channels", model_name]
+            frame = self.group_by_results_function(values, model_name)
+        else:
+            frame = "group_by_channels_models = False"
 
-        self._first_click = (channels_value, frame)
+        self._first_click = self._model_result(values, frame)
 
         return self._first_click
 
+    @profiled
+    @cached_model
     def attribution_linear(self, group_by_channels_models=True):
         """Each touchpoint in the conversion path has an equal value.
 
@@ -898,27 +1398,25 @@ class MAM:
         """
         model_name = "attribution_linear_heuristic"
 
-        channels_count = self.channels.apply(len)
-        channels_value = (
-            self.conversion_value * self.journey_with_conv.apply(int) / channels_count
-        ).apply(lambda x: [x]) * channels_count
+        values = heuristic.linear_batch(
+            self._journeys.offsets, self._journey_conversion_values()
+        )
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Grouping the attributed values for each channel
         if group_by_channels_models:
-            frame = self.group_by_results_function(channels_value, model_name)
+            frame = self.group_by_results_function(values, model_name)
         else:
             frame = "group_by_channels_models = False"
 
-        self._linear = (channels_value, frame)
+        self._linear = self._model_result(values, frame)
 
         return self._linear
 
+    @profiled
+    @cached_model
     def attribution_position_based(
         self,
         list_positions_first_middle_last=None,
@@ -948,35 +1446,28 @@ class MAM:
             + "_heuristic"
         )
 
-        # Selecting last channel from the series
-        channels_value = self.channels.apply(
-            lambda canais: heuristic.position_based(
-                canais, list_positions_first_middle_last
-            )
+        # Distributing the conversion value of the journeys that converted
+        values = heuristic.position_based_batch(
+            self._journeys.offsets,
+            list_positions_first_middle_last,
+            self._journey_conversion_values(),
         )
-        # multiplying the results with the conversion value
-        channels_value = channels_value * self.conversion_value
-        # multiplying with the boolean column that indicates if the conversion
-        # happened
-        channels_value = channels_value * self.journey_with_conv.apply(int)
-        channels_value = channels_value.apply(lambda values: values.tolist())
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Grouping the attributed values for each channel
         if group_by_channels_models:
-            frame = self.group_by_results_function(channels_value, model_name)
+            frame = self.group_by_results_function(values, model_name)
         else:
             frame = "group_by_channels_models = False"
 
-        self._position_based = (channels_value, frame)
+        self._position_based = self._model_result(values, frame)
 
         return self._position_based
 
+    @profiled
+    @cached_model
     def attribution_position_decay(self, group_by_channels_models=True):
         """Linear decay for each touchpoint further from conversion.
 
@@ -989,28 +1480,24 @@ class MAM:
         """
         model_name = "attribution_position_decay_heuristic"
 
-        channels_value = self.channels.apply(heuristic.position_decay)
-        # multiplying the results with the conversion value
-        channels_value = channels_value * self.conversion_value
-        # multiplying with the boolean column that indicates if the conversion
-        # happened
-        channels_value = channels_value * self.journey_with_conv.apply(int)
-        channels_value = channels_value.apply(lambda values: values.tolist())
+        # Distributing the conversion value of the journeys that converted
+        values = heuristic.position_decay_batch(
+            self._journeys.offsets, self._journey_conversion_values()
+        )
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Grouping the attributed values for each channel
         if group_by_channels_models:
-            frame = self.group_by_results_function(channels_value, model_name)
+            frame = self.group_by_results_function(values, model_name)
         else:
             frame = "group_by_channels_models = False"
 
-        return (channels_value, frame)
+        return self._model_result(values, frame)
 
+    @profiled
+    @cached_model
     def attribution_time_decay(
         self, decay_over_time=0.5, frequency=168, group_by_channels_models=True
     ):
@@ -1033,251 +1520,418 @@ class MAM:
             + "_heuristic"
         )
 
-        if self.time_till_conv is None:
+        if self._journeys.times is None:
             print("time_till_conv is None, attribution_time_decay model will not work")
 
         else:
-            # Removing zeros and dividing by the frequency
-            time_till_conv_window = self.time_till_conv.apply(
-                lambda time_till_conv: heuristic.time_decay(
-                    time_till_conv, decay_over_time, frequency
-                )
+            # Decaying by the time till conversion divided by the frequency and
+            # distributing the conversion value of the journeys that converted
+            values = heuristic.time_decay_batch(
+                self._journeys.times,
+                self._journeys.offsets,
+                decay_over_time,
+                frequency,
+                self._journey_conversion_values(),
             )
 
-            # multiplying the results with the conversion value
-            channels_value = time_till_conv_window * self.conversion_value
-            # multiplying with the boolean column that indicates if the conversion
-            # happened
-            channels_value = channels_value * self.journey_with_conv.apply(int)
-            channels_value = channels_value.apply(lambda values: values.tolist())
-
             # Adding the results to self.DataFrame
-            self.as_pd_dataframe()
-            self.data_frame[model_name] = channels_value.apply(
-                lambda x: self.sep.join([str(value) for value in x])
-            )
+            self._register_touchpoint_results(values, model_name)
 
             # Grouping the attributed values for each channel
             if group_by_channels_models:
-                frame = self.group_by_results_function(channels_value, model_name)
+                frame = self.group_by_results_function(values, model_name)
             else:
                 frame = "group_by_channels_models = False"
 
-        self._time_decay = (channels_value, frame)
+        self._time_decay = self._model_result(values, frame)
 
         return self._time_decay
 
+    @profiled
+    @cached_model
+    def attribution_heuristics(
+        self,
+        last_click_non_but_not_this_channel="Direct",
+        list_positions_first_middle_last=None,
+        time_decay_decay_over_time=0.5,
+        time_decay_frequency=128,
+        group_by_channels_models=True,
+    ):
+        """Runs attribution_last_click, attribution_last_click_non,
+        attribution_first_click, attribution_linear, attribution_position_based and
+        attribution_time_decay in a single pass over the journeys, with one channel
+        aggregation for all of them.
+
+        The results are the same as calling each method, and are also stored for the
+        *_journeys() and *_channels() methods.
+
+        Parameters:
+        last_click_non_but_not_this_channel =
+            Channel to be overwritten by attribution_last_click_non.
+        list_positions_first_middle_last =
+            List with percentages that will be given to each position by
+            attribution_position_based.
+        time_decay_decay_over_time =
+            Percentage that will be lost by time away from the conversion by
+            attribution_time_decay.
+        time_decay_frequency =
+            The frequency in hours that the decay will happen on
+            attribution_time_decay.
+        group_by_channels_models = True by default.
+            Will aggregate the attributed results by each channel on
+            self.group_by_channels_models.
+        """
+        if not list_positions_first_middle_last:
+            list_positions_first_middle_last = [0.4, 0.2, 0.4]
+
+        model_names = {
+            "last_click": "attribution_last_click_heuristic",
+            "last_click_non": "attribution_last_click_non_"
+            + last_click_non_but_not_this_channel
+            + "_heuristic",
+            "first_click": "attribution_first_click_heuristic",
+            "linear": "attribution_linear_heuristic",
+            "position_based": "attribution_position_based_"
+            + "_".join([str(value) for value in list_positions_first_middle_last])
+            + "_heuristic",
+            "time_decay": "attribution_time_decay"
+            + str(time_decay_decay_over_time)
+            + "_freq"
+            + str(time_decay_frequency)
+            + "_heuristic",
+        }
+
+        if self._journeys.times is None:
+            print("time_till_conv is None, attribution_time_decay model will not work")
+
+        # Results part 1: Column values
+        values = heuristic.all_heuristics_batch(
+            self._journeys.codes,
+            self._journeys.times,
+            self._journeys.offsets,
+            self._journeys.code_of(last_click_non_but_not_this_channel),
+            list_positions_first_middle_last,
+            time_decay_decay_over_time,
+            time_decay_frequency,
+            self._journey_conversion_values(),
+        )
+        for model, model_values in values.items():
+            self._register_touchpoint_results(model_values, model_names[model])
+
+        # Results part 2: Grouped Results
+        if group_by_channels_models:
+            with self._stage("group_by_results_function", rows=len(self._journeys)):
+                columns = [model_names[model] for model in values]
+                frame = self._journeys.channel_totals_wide(
+                    np.column_stack(list(values.values())), columns
+                )
+                self._channel_results.set_frame(frame)
+            frames = {
+                model: frame[model_names[model]].rename("value") for model in values
+            }
+        else:
+            frame = "group_by_channels_models = False"
+            frames = {model: frame for model in values}
+
+        for model in values:
+            setattr(self, "_" + model, self._model_result(values[model], frames[model]))
+
+        return frame
+
+    @profiled
+    def attribution_sweep(self, model, grid, chunk_size=8):
+        """Computes a heuristic model for every setting of a parameter grid at once
+        and returns the value attributed to each channel by each setting.
+
+        All the settings are broadcast against the flat journey arrays in one
+        vectorised computation, chunk_size settings at a time to bound the memory
+        (chunk_size x number of touchpoints floats), and summed by channel. Nothing
+        is stored on the object.
+
+        Parameters:
+        model =
+            'time_decay' or 'position_based'.
+        grid =
+            Dictionary with the parameters of the model method and a list of values
+            for each of them, every combination is computed:
+                time_decay: 'decay_over_time' and 'frequency';
+                position_based: 'list_positions_first_middle_last'.
+        chunk_size = 8 by default.
+            Number of settings computed together.
+
+        Returns a Pandas DataFrame with one row per setting, indexed by the
+        parameters, and one column per channel.
+        """
+        parameters = {
+            "time_decay": ["decay_over_time", "frequency"],
+            "position_based": ["list_positions_first_middle_last"],
+        }
+        if model not in parameters:
+            raise ValueError("model must be 'time_decay' or 'position_based'")
+        unknown = set(grid) - set(parameters[model])
+        if unknown:
+            raise ValueError("Unknown parameters for " + model + ": " + str(unknown))
+        empty = [name for name, values in grid.items() if not len(values)]
+        if empty:
+            raise ValueError("The grid has no values for " + str(empty))
+        if model == "time_decay" and self._journeys.times is None:
+            raise ValueError("time_decay needs the time till conversion")
+
+        defaults = {
+            "decay_over_time": [0.5],
+            "frequency": [128],
+            "list_positions_first_middle_last": [[0.4, 0.2, 0.4]],
+        }
+        settings = list(
+            itertools.product(
+                *[grid.get(name, defaults[name]) for name in parameters[model]]
+            )
+        )
+
+        value = self._journey_conversion_values()
+        totals = []
+        for start in range(0, len(settings), chunk_size):
+            chunk = settings[start : start + chunk_size]
+            if model == "time_decay":
+                decay_over_time, frequency = np.asarray(chunk, dtype=float).T
+                weights = heuristic.time_decay_sweep(
+                    self._journeys.times,
+                    self._journeys.offsets,
+                    decay_over_time,
+                    frequency,
+                    value,
+                )
+            else:
+                weights = heuristic.position_based_sweep(
+                    self._journeys.offsets,
+                    [setting[0] for setting in chunk],
+                    value,
+                )
+            chunk_totals, channels = self._journeys.channel_totals_rows(weights)
+            totals.append(chunk_totals)
+
+        if model == "position_based":
+            settings = [tuple(setting[0]) for setting in settings]
+            index = pd.Index(settings, name=parameters[model][0], tupleize_cols=False)
+        else:
+            index = pd.MultiIndex.from_tuples(settings, names=parameters[model])
+        return pd.DataFrame(
+            np.concatenate(totals),
+            index=index,
+            columns=pd.Index(channels, name="channels"),
+        )
+
+    @profiled
+    @cached_model
     def attribution_markov(
         self,
         transition_to_same_state=False,
         group_by_channels_models=True,
         conversion_value_as_frequency=True,
+        sparse=False,
+        order=1,
     ):
-        """Attribution using Markov."""
+        """Attribution using Markov.
+
+        Parameters:
+        transition_to_same_state = False by default.
+            Keeps the transitions from a state to itself on the transition matrix.
+        group_by_channels_models = True by default.
+            Will aggregate the attributed results by each channel on
+            self.group_by_channels_models.
+        conversion_value_as_frequency = True by default.
+            Uses the conversion values as the weight of each journey transition,
+            otherwise each journey counts once.
+        sparse = False by default.
+            Builds the transition matrix with scipy.sparse, which must be installed,
+            and returns it as a sparse Pandas DataFrame. Chains with up to
+            markov.DENSE_STATES (5000) states are still solved as dense matrices,
+            which was faster at every size measured (2000 channels and 2e5
+            journeys: 0.8s dense, 6.2s sparse), so it only saves memory for larger
+            chains, where the dense solve would need gigabytes.
+        order = 1 by default.
+            Order of the Markov chain, as in ChannelAttribution: each state is the
+            sequence of the last order channels of the journey, so the next
+            transition depends on them. The removal effect of a channel removes
+            every state that contains it.
+        """
         model_name = "attribution_markov"
         model_type = "_algorithmic"
+        if order > 1:
+            model_name = model_name + "_order" + str(order)
         if transition_to_same_state:
             model_name = model_name + "_same_state" + model_type
         else:
             model_name = model_name + model_type
 
-        def power_to_infinity(matrix):
-            """Raises a square matrix to an infinite power using eigendecomposition.
-
-            All matrix rows must add to 1.
-            M = Q*L*inv(Q), where L = eigenvalue diagonal values, Q = eigenvector matrix
-            M^N = Q*(L^N)*inv(Q)
-            """
-            eigen_value, eigen_vectors = np.linalg.eig(matrix)
-
-            # At infinity everything converges to 0 or 1, thus we use np.trunc()
-            diagonal = np.diag(np.trunc(eigen_value.real + 0.001))
-            try:
-                result = (eigen_vectors @ diagonal @ np.linalg.inv(eigen_vectors)).real
-            except np.linalg.LinAlgError as err:
-                if "Singular matrix" in str(err):
-                    warnings.warn(
-                        "Warning... Singular matrix error. Check for lines or cols "
-                        + "fully filled with zeros."
-                    )
-                    result = (
-                        eigen_vectors @ diagonal @ np.linalg.pinv(eigen_vectors)
-                    ).real
-                else:
-                    raise
-            return result
-
-        def normalize_rows(matrix):
-            size = matrix.shape[0]
-            mean = matrix.sum(axis=1).reshape((size, 1))
-            mean = np.where(mean == 0, 1, mean)
-            return matrix / mean
-
-        def calc_total_conversion(matrix):
-            normal_matrix = normalize_rows(matrix)
-            infinity_matrix = power_to_infinity(normal_matrix)
-            return infinity_matrix[0, -1]
-
-        def removal_effect(matrix):
-            size = matrix.shape[0]
-            conversions = np.zeros(size)
-            for column in range(1, size - 2):
-                temp = matrix.copy()
-                temp[:, -2] = temp[:, -2] + temp[:, column]
-                temp[:, column] = 0
-                conversions[column] = calc_total_conversion(temp)
-            conversion_orig = calc_total_conversion(matrix)
-            return 1 - (conversions / conversion_orig)
-
-        def path_to_matrix(paths):
-            channel_max = int(paths[:, 0:2].max()) + 1
-            matrix = np.zeros((channel_max, channel_max), dtype="float")
-            for x, y, val in paths:
-                matrix[int(x), int(y)] = val
-            matrix[-1, -1] = 1
-            matrix[-2, -2] = 1
-            return matrix
-
-        temp = self.channels.apply(
-            lambda x: ["(inicio)"] + x
-        ) + self.journey_with_conv.apply(lambda x: ["(conversion)" if x else "(null)"])
-
-        orig = []
-        dest = []
-        journey_length = []
-
-        def save_orig_dest(arr):
-            orig.extend(arr[:-1])
-            dest.extend(arr[1:])
-            journey_length.append(len(arr))
-
-        temp.apply(save_orig_dest)
-
-        # copying conversion_quantity to each new row
-        if type(self.conversion_value) in (int, float):
-            # we do not hava a frequency column yet so we are using
-            # self.conversion_value.apply(lambda x: 1) to count each line
-            conversion_quantity = self.conversion_value.apply(lambda x: 1)
+        journeys = self._journeys
 
-        else:
-            if conversion_value_as_frequency:
-                freq_values = self.conversion_value
-            else:
-                freq_values = self.conversion_value.apply(lambda x: 1)
-
-            conversion_quantity = []
-
-            for a, b in zip(freq_values, journey_length):
-                conversion_quantity.extend([a] * (b - 1))
-
-        temp = pd.DataFrame({"orig": orig, "dest": dest, "count": conversion_quantity})
-        temp = temp.groupby(["orig", "dest"], as_index=False).sum()
-        self._print(temp)
+        # Encoding the last order channels of each touchpoint as a state
+        states, histories = markov.history_states(
+            journeys.codes, journeys.offsets, order
+        )
 
-        if not transition_to_same_state:
-            temp = temp[temp.orig != temp.dest]
+        # copying conversion_quantity to the transitions of each journey
+        if conversion_value_as_frequency:
+            freq_values = np.asarray(self.conversion_value, dtype=float)
+        else:
+            freq_values = np.ones(len(journeys))
+
+        orig, dest, count = markov.journey_transitions(
+            states,
+            journeys.offsets,
+            self.journey_with_conv,
+            freq_values,
+            len(histories),
+            transition_to_same_state,
+        )
 
-        # Converting channels_names to index and pass a numpy array foward
-        channels_names = (
+        states_names = (
             ["(inicio)"]
-            + list(
-                (set(temp.orig) - set(["(inicio)"]))
-                | (set(temp.dest) - set(["(conversion)", "(null)"]))
-            )
+            + [
+                self.sep.join(journeys.vocabulary[history[history >= 0]])
+                for history in histories
+            ]
             + ["(null)", "(conversion)"]
         )
-        temp["orig"] = temp.orig.apply(channels_names.index)
-        temp["dest"] = temp.dest.apply(channels_names.index)
-        matrix = path_to_matrix(temp[["orig", "dest", "count"]].values)
-        removal_effect_result = removal_effect(matrix)[1:-2]
+        if self.verbose:
+            names = np.asarray(states_names, dtype=object)
+            self._print(
+                pd.DataFrame({"orig": names[orig], "dest": names[dest], "count": count})
+            )
+
+        matrix = markov.transition_matrix(
+            orig, dest, count, len(states_names), sparse=sparse
+        )
+
+        # Removal effects of every channel from a single factorisation of the
+        # absorbing chain, the start state is dropped
+        if order == 1:
+            channels_codes = histories[:, -1]
+            removal_effect_result = markov.removal_effects(matrix)[1:]
+        else:
+            channels_codes = np.unique(journeys.codes)
+            removal_effect_result = markov.removal_effects(
+                matrix,
+                [
+                    np.flatnonzero((histories == code).any(axis=1)) + 1
+                    for code in channels_codes
+                ],
+            )
         results = removal_effect_result / removal_effect_result.sum(axis=0)
+        channels_names = journeys.vocabulary[channels_codes]
 
         # Channels weights
-        frame = pd.DataFrame({"value": results}, index=channels_names[1:-2])
+        frame = pd.DataFrame({"value": results}, index=channels_names)
         removal_effect_result = pd.DataFrame(
-            {"removal_effect": removal_effect_result}, index=channels_names[1:-2]
+            {"removal_effect": removal_effect_result}, index=channels_names
         )
 
-        # Transition matrix
-        matrix = normalize_rows(matrix)
-        matrix = pd.DataFrame(matrix, columns=channels_names, index=channels_names)
+        # Transition matrix, labelled only when it is accessed on the result
+        matrix = Deferred(
+            markov.transition_frame, markov.normalize_rows(matrix), states_names
+        )
 
         # Apply weights back to each journey
-        chmap = {a: b[0] for a, b in zip(frame.index.values, frame.values)}
-        channels_value = self.channels.apply(lambda y: [chmap[x] for x in y])
-        channels_value = channels_value.apply(lambda x: list(np.array(x) / sum(x)))
+        channels_weights = np.zeros(len(journeys.vocabulary))
+        channels_weights[channels_codes] = results
+        values = channels_weights[journeys.codes]
+        values = values / journeys.repeat(np.add.reduceat(values, journeys.starts))
 
         # Adding the results to self.DataFrame
-        self.as_pd_dataframe()
-        self.data_frame[model_name] = channels_value.apply(
-            lambda x: self.sep.join([str(value) for value in x])
-        )
+        self._register_touchpoint_results(values, model_name)
 
         # Grouping the attributed values for each channel
         total_conv_value = self.journey_with_conv * self.conversion_value
         if group_by_channels_models:
-            if isinstance(self.group_by_channels_models, pd.DataFrame):
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                frame[model_name] = frame[model_name] * total_conv_value.sum()
-                self.group_by_channels_models = pd.merge(
-                    self.group_by_channels_models, frame, how="outer", on=["channels"]
-                ).fillna(0)
-            else:
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                frame[model_name] = frame[model_name] * total_conv_value.sum()
-                self.group_by_channels_models = frame
+            with self._stage("group_by_results_function", rows=len(self._journeys)):
+                frame = frame["value"] * total_conv_value.sum()
+                self._channel_results.set(model_name, frame)
+                frame = frame.rename_axis("channels").reset_index(name=model_name)
         else:
             frame = "group_by_channels_models = False"
 
-        return (channels_value, frame, matrix, removal_effect_result)
+        return self._model_result(values, frame, matrix, removal_effect_result)
 
+    @profiled
     def journey_conversion_table(self, order=False, size=None):
         """Transforms journey channels in boolean columns, count the number of
         conversions and journeys and compute the conversion rate of the channel
         combination.
         """
-        # Creating Channels DF
-        df_temp = self.journey_id.copy()
-
-        if order:
-            df_temp["combinations"] = self.channels.apply(
-                lambda channels: sorted(list(set(channels)), key=channels.index)
-            ).copy()
-        else:
-            df_temp["combinations"] = self.channels.apply(
-                lambda channels: sorted(list(set(channels)))
-            ).copy()
-
-        if size is not None:
-            df_temp["combinations"] = df_temp["combinations"].apply(
-                lambda channels: self.sep.join(channels[size * -1 :])
-            )
-        else:
-            df_temp["combinations"] = df_temp["combinations"].apply(self.sep.join)
-
-        # Adding journey_with_conv column
-        df_temp["journey_with_conv"] = self.journey_with_conv.apply(int)
-        df_temp["conversion_value"] = self.conversion_value
-
-        # Grouping journey_with_conv
-        conv_val = (
-            df_temp.groupby(["combinations"])["conversion_value"]
-            .sum()
-            .reset_index()["conversion_value"]
+        ids, combinations, _ = self._journey_combinations(order, size)
+        df_temp = pd.DataFrame(
+            {
+                "journey_with_conv": np.asarray(self.journey_with_conv, dtype=int),
+                "conversion_value": np.asarray(self.conversion_value),
+            }
         )
-        df_temp = (
-            df_temp.groupby(["combinations"])["journey_with_conv"]
-            .agg([("conversions", "sum"), ("total_sequences", "count")])
-            .reset_index()
+
+        # Grouping by the integer id of the combination, numbered in the order of
+        # the combination names
+        df_temp = df_temp.groupby(ids).agg(
+            conversions=("journey_with_conv", "sum"),
+            total_sequences=("journey_with_conv", "count"),
+            conversion_value=("conversion_value", "sum"),
         )
-        df_temp["conversion_value"] = conv_val
+        df_temp.insert(0, "combinations", combinations[df_temp.index])
+        df_temp = df_temp.reset_index(drop=True)
         # Calculating the conversion rate
         df_temp["conv_rate"] = df_temp["conversions"] / df_temp["total_sequences"]
 
         return df_temp
 
+    def _journey_combinations(self, order=False, size=None):
+        """Distinct channels of each journey, as in journey_conversion_table,
+        computed on the channel codes.
+
+        Returns a tuple (ids, combinations, players): the combination id of each
+        journey, and for each id the sep joined channel names and the array of
+        channel codes. The ids follow the sorted combination names.
+        """
+        journeys = self._journeys
+        n_channels = len(journeys.vocabulary)
+
+        # First touchpoint of each channel on each journey
+        journey = journeys.journey_index()
+        codes = journeys.codes.astype(np.int64)
+        first = ~pd.Series(journey * n_channels + codes).duplicated().to_numpy()
+        journey, codes = journey[first], codes[first]
+        if not order:
+            rank = np.argsort(np.argsort(journeys.vocabulary))
+            sort = np.argsort(journey * n_channels + rank[codes])
+            journey, codes = journey[sort], codes[sort]
+
+        counts = np.bincount(journey, minlength=len(journeys))
+        column = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+        if size:
+            # Keeping the last size channels of each journey
+            dropped = np.repeat(np.maximum(counts - size, 0), counts)
+            keep = column >= dropped
+            column = column[keep] - dropped[keep]
+            journey, codes = journey[keep], codes[keep]
+            counts = np.minimum(counts, size)
+
+        # One row per journey padded with -1, numbered one column at a time
+        matrix = np.full((len(journeys), counts.max(initial=0)), -1, dtype=np.int64)
+        matrix[journey, column] = codes
+        inverse = np.zeros(len(journeys), dtype=np.int64)
+        for values in matrix.T:
+            inverse = pd.factorize(inverse * (n_channels + 1) + values + 1)[0]
+        first_row = np.zeros(inverse.max(initial=-1) + 1, dtype=np.int64)
+        first_row[inverse[::-1]] = np.arange(len(inverse))[::-1]
+        rows = matrix[first_row]
+
+        players = [row[row >= 0] for row in rows]
+        names = np.asarray(
+            [self.sep.join(journeys.vocabulary[row]) for row in players], dtype=object
+        )
+        combinations, ids = np.unique(names, return_inverse=True)
+        first_name = np.zeros(len(combinations), dtype=np.int64)
+        first_name[ids[::-1]] = np.arange(len(ids))[::-1]
+        players = [players[row] for row in first_name]
+        return ids[inverse], combinations, players
+
     def coalitions(self, size=4, unique_channels=None, order=False):
         """This function gives all the coalitions of different channels in a matrix.
         Most of the extra parameters are used when calculating Shapley's value with
@@ -1293,7 +1947,7 @@ class MAM:
             Boolean that indicates if the order of channels matters during the process.
         """
         if unique_channels is None:
-            unique_channels = list(set(sum(self.channels.values, [])))
+            unique_channels = list(self._journeys.vocabulary)
         channels_combination = []
 
         # Creating a list with all the permutations if order is True
@@ -1315,6 +1969,8 @@ class MAM:
 
         return df_temp
 
+    @profiled
+    @cached_model
     def attribution_shapley(
         self,
         size=4,
@@ -1322,6 +1978,10 @@ class MAM:
         values_col="conv_rate",
         merge_custom_values=None,
         group_by_channels_models=True,
+        method="exact",
+        n_samples=1000,
+        random_state=None,
+        n_jobs=1,
     ):
         """Defined by Wikipedia: The Shapley value is a solution concept in Cooperative
         Game Theory.
@@ -1337,7 +1997,8 @@ class MAM:
             Limits max size of unique channels in a single journey. If there is a
             journey that has more channels than the defined limit, the last N channels
             will be considered. It's also important to accentuate that increasing the
-            number of channels, increases the number calculations exponentially.
+            number of channels, increases the number calculations exponentially. With
+            method="permutation" it can be None to keep every channel.
         order =
             Boolean that indicates if the order of channels matters during the process.
         values_col =
@@ -1352,8 +2013,23 @@ class MAM:
         group_by_channels_models = True by default.
             Will aggregate the attributed results by each channel on
             self.group_by_channels_models.
+        method = "exact" by default.
+            "exact" evaluates every coalition of the journey channels, "permutation"
+            estimates the Shapley values averaging the marginal contributions over
+            n_samples random orderings of the channels, in linear time, and adds the
+            standard error of each channel in a "_std_error" column.
+        n_samples = 1000 by default.
+            Number of orderings sampled per journey with method="permutation".
+        random_state = None by default.
+            Seed of the orderings sampled with method="permutation".
+        n_jobs = 1 by default.
+            Number of processes the channel combinations are split across, -1 to use
+            all the CPUs. The results are the same for any number of processes.
         """
 
+        if method not in ("exact", "permutation"):
+            raise ValueError('method must be "exact" or "permutation"')
+
         # Creating conv_table that will contain the aggregated results based on the journeys
         conv_table = self.journey_conversion_table(order=order, size=size)
 
@@ -1374,77 +2050,63 @@ class MAM:
 
         # Removing all jouneys that have not converted
         conv_table = conv_table[conv_table.conversions > 0]
-        channels_shapley = conv_table.combinations.apply(
-            lambda x: x.split(self.sep)
-        ).copy()
-        results = []
-
-        for journey in channels_shapley:
-            n = len(journey)
-
-            coalitions = self.coalitions(n, journey, order=order)
-            coalitions.combinations = coalitions.combinations.apply(self.sep.join)
-            coa = (
-                coalitions[1:]
-                .drop("combinations", axis=1)
-                .astype(int)
-                .astype(float)
-                .reset_index(drop=True)
-            )
-
-            # Merging the coalitions table with the grouped results on conv_table
-            valores = (
-                pd.merge(coalitions, conv_table, on="combinations", how="left")[
-                    values_col
-                ]
-                .fillna(0)
-                .values
+        _, combinations, codes = self._journey_combinations(order, size)
+        combination_codes = dict(zip(combinations, codes))
+        players = [
+            combination_codes[combination].tolist()
+            for combination in conv_table.combinations
+        ]
+
+        # Characteristic function v(S) built once from the conversion table and
+        # shared by all the journeys. Without custom values it is kept with its
+        # cached Shapley values for the next calls, as long as the conversion
+        # table they were computed from does not change
+        function_key = (order, size, values_col)
+        table_key = fingerprint(
+            conv_table.combinations.to_numpy(), conv_table[values_col].to_numpy()
+        )
+        stored = self._characteristic_functions.get(function_key)
+        if merge_custom_values is None and stored and stored[0] == table_key:
+            function = stored[1]
+        else:
+            function = shapley.CharacteristicFunction(
+                players, conv_table[values_col].values, order=order
             )
+            if merge_custom_values is None:
+                self._characteristic_functions[function_key] = (table_key, function)
 
-            v = valores[1:]
-            coaux = coa.copy()
-
-            for line in list(range(0, ((2 ** n) - 1))):
-
-                for channel in coa.columns:
-                    s = len(coaux.iloc[line, :][coaux.iloc[line, :] != 0])
-                    if coa[channel][line] == 0:
-                        a = (
-                            -(math.factorial(s) * math.factorial(n - s - 1))
-                            / math.factorial(n)
-                            * v[line]
-                        )
-                        coa[channel][line] = a
-                    else:
-                        b = (
-                            (math.factorial(s - 1) * math.factorial(n - s))
-                            / math.factorial(n)
-                            * v[line]
-                        )
-                        coa[channel][line] = b
-
-            results.append(list(coa.sum()))
+        results, std_errors = shapley.journeys_shapley(
+            function, players, method, n_samples, random_state, n_jobs
+        )
 
         # Model col_name
         model_name = "attribution_shapley_size" + str(size) + "_" + values_col
         model_type = "_algorithmic"
+        if method == "permutation":
+            model_name = model_name + "_permutation"
         if order:
             model_name = model_name + "_order" + model_type
         else:
             model_name = model_name + model_type
 
         if (values_col == "conv_rate") or (values_col == "custom_value"):
-            conv_table[model_name] = results
-            conv_table[model_name] = (
-                conv_table[model_name].apply(np.asarray) * conv_table["total_sequences"]
-            )
-            conv_table[model_name] = (
-                conv_table[model_name].apply(lambda x: x / x.sum())
-                * conv_table["conversion_value"]
-            )
-            conv_table[model_name] = conv_table[model_name].apply(lambda x: x.tolist())
-        else:
-            conv_table[model_name] = results
+            # The values of each journey are rescaled to add up to its conversion
+            # value, and so are their standard errors
+            scale = [
+                value / values.sum()
+                for values, value in zip(results, conv_table["conversion_value"])
+            ]
+            results = [values * factor for values, factor in zip(results, scale)]
+            if std_errors is not None:
+                std_errors = [
+                    np.abs(errors * factor) for errors, factor in zip(std_errors, scale)
+                ]
+
+        conv_table[model_name] = [values.tolist() for values in results]
+        if std_errors is not None:
+            conv_table[model_name + "_std_error"] = [
+                errors.tolist() for errors in std_errors
+            ]
 
         ##########################
         # group_by_channels_models#
@@ -1452,20 +2114,28 @@ class MAM:
 
         # Aggregating the results by unique channel
         if group_by_channels_models:
-            channels_list = sum(channels_shapley, [])
-            values_list = sum(conv_table[model_name].values, [])
-            frame = pd.DataFrame({"channels": channels_list, "value": values_list})
-            frame = frame.groupby(["channels"])["value"].sum()
+            with self._stage("group_by_results_function", rows=len(self._journeys)):
+                codes = np.fromiter(
+                    itertools.chain.from_iterable(players), dtype=np.int64
+                )
+                totals = np.bincount(
+                    codes,
+                    weights=np.concatenate(results) if results else None,
+                    minlength=len(self._journeys.vocabulary),
+                )
+                present = np.bincount(codes, minlength=len(totals)) > 0
+                frame = pd.Series(
+                    totals[present],
+                    index=pd.Index(self._journeys.vocabulary[present], name="channels"),
+                    name="value",
+                )
 
-            if isinstance(self.group_by_channels_models, pd.DataFrame):
-                frame = frame.reset_index()
-                frame.columns = ["channels", model_name]
-                self.group_by_channels_models = pd.merge(
-                    self.group_by_channels_models, frame, how="outer", on=["channels"]
-                ).fillna(0)
-            else:
-                self.group_by_channels_models = frame.reset_index()
-                self.group_by_channels_models.columns = ["channels", model_name]
+                if len(self._channel_results):
+                    self._channel_results.set(model_name, frame)
+                    frame = frame.reset_index()
+                    frame.columns = ["channels", model_name]
+                else:
+                    self._channel_results.set(model_name, frame)
         else:
             frame = "group_by_channels_models=False"
 
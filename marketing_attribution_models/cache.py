@@ -0,0 +1,207 @@
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Prefix of the files of the cache entries on disk
+FILE_PREFIX = "mam_result_"
+
+
+class ResultCache:
+    """Cache of model results with LRU eviction, optionally persisted on disk.
+
+    The entries are kept in memory up to maxsize, evicting the least recently used
+    one, and, when directory is given, also pickled to one file per key so other
+    processes and later sessions find them. The files are named
+    mam_result_<key>.pkl, and clear only removes those, so the directory can be
+    shared with other files.
+
+    Parameters:
+    maxsize = 32 by default.
+        Number of results kept in memory;
+    directory = None by default.
+        Folder where the results are also stored on disk.
+    """
+
+    def __init__(self, maxsize=32, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, FILE_PREFIX + key + ".pkl")
+
+    def get(self, key):
+        """Stored value of key, or None."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as file:
+                value = pickle.load(file)
+            self._store(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._store(key, value)
+        if self.directory is not None:
+            with open(self._path(key), "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes the entries from memory and from disk."""
+        self._entries.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.startswith(FILE_PREFIX) and name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def fingerprint(*arrays):
+    """Content hash of the arrays: their dtypes, shapes and bytes."""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        if array is None:
+            digest.update(b"None")
+            continue
+        array = np.asarray(array)
+        if array.dtype == object:
+            array = np.asarray([str(value) for value in array.ravel()])
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+# Attributes where the models keep their last results, replayed on a cache hit
+RESULT_ATTRIBUTES = (
+    "_first_click",
+    "_last_click",
+    "_last_click_non",
+    "_linear",
+    "_position_based",
+    "_time_decay",
+)
+
+
+def model_key(mam, method, args, kwargs):
+    """Cache key of running method (undecorated) with args and kwargs on mam: a
+    hash of the method name, its bound arguments and the journeys fingerprint."""
+    bound = inspect.signature(method).bind(mam, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = {
+        name: _argument_key(value)
+        for name, value in bound.arguments.items()
+        if name != "self"
+    }
+    return hashlib.blake2b(
+        repr((method.__name__, arguments, mam._fingerprint())).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def record_model(mam, method, args=(), kwargs=None):
+    """Runs method (undecorated) on mam and returns a dictionary with its returned
+    value ("result") and the results it registered on the object: touchpoint
+    values, channel totals and result attributes."""
+    kwargs = kwargs or {}
+    touchpoint_results = dict(mam._touchpoint_results)
+    attributes = {name: getattr(mam, name) for name in RESULT_ATTRIBUTES}
+    channel_results = mam._channel_results
+    channel_results.log = []
+
+    mam._cache_recording = True
+    try:
+        result = method(mam, *args, **kwargs)
+    finally:
+        mam._cache_recording = False
+        written, channel_results.log = channel_results.log, None
+
+    return {
+        "result": result,
+        "touchpoint_results": {
+            name: values
+            for name, values in mam._touchpoint_results.items()
+            if touchpoint_results.get(name) is not values
+        },
+        "channel_results": {
+            name: channel_results.to_frame().set_index("channels")[name]
+            for name in written
+        },
+        "attributes": {
+            name: getattr(mam, name)
+            for name in RESULT_ATTRIBUTES
+            if getattr(mam, name) is not attributes[name]
+        },
+    }
+
+
+def replay_model(mam, entry):
+    """Registers on mam the results recorded by record_model, as if the method had
+    run, and returns its returned value."""
+    for name, values in entry["touchpoint_results"].items():
+        mam._register_touchpoint_results(values, name)
+    for name, values in entry["channel_results"].items():
+        mam._channel_results.set(name, values)
+    for name, value in entry["attributes"].items():
+        setattr(mam, name, value)
+    return entry["result"]
+
+
+def cached_model(method):
+    """Decorator of the MAM attribution methods that returns their stored results
+    when the object has a cache enabled.
+
+    The key combines the method name, its bound arguments and the fingerprint of
+    the journeys. Besides the returned value, the results the method registered on
+    the object (touchpoint values, channel totals and result attributes) are
+    stored and registered again on a hit, as if the method had run.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._cache is None or self._cache_recording:
+            return method(self, *args, **kwargs)
+
+        key = model_key(self, method, args, kwargs)
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = record_model(self, method, args, kwargs)
+            self._cache.put(key, copy.deepcopy(entry))
+            return entry["result"]
+        return replay_model(self, copy.deepcopy(entry))
+
+    return wrapper
+
+
+def _argument_key(value):
+    """Hashable description of an argument, using the content of arrays and
+    DataFrames instead of their truncated repr."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        return fingerprint(
+            frame.index.to_numpy(),
+            frame.columns.to_numpy(),
+            *[frame[col].to_numpy() for col in frame.columns]
+        )
+    if isinstance(value, np.ndarray):
+        return fingerprint(value)
+    return repr(value)
@@ -1,44 +1,260 @@
+import numpy as np
 import pandas as pd
-import random
-
-
-def data_frame(user_id=300, k=50000, conv_rate=0.4):
-    """ """
-    channels = [
-        "Direct",
-        "Direct",
-        "Facebook",
-        "Facebook",
-        "Facebook",
-        "Google Search",
-        "Google Search",
-        "Google Search",
-        "Google Search",
-        "Google Display",
-        "Organic",
-        "Organic",
-        "Organic",
-        "Organic",
-        "Organic",
-        "Organic",
-        "Email Marketing",
-        "Youtube",
-        "Instagram",
-    ]
-    has_transaction = ([True] * int(conv_rate * 100)) + (
-        [False] * int((1 - conv_rate) * 100)
+
+from ..data_prep.journey_store import JourneyStore
+
+# Channels of data_frame and their relative frequencies
+CHANNELS = {
+    "Direct": 2,
+    "Facebook": 3,
+    "Google Search": 4,
+    "Google Display": 1,
+    "Organic": 6,
+    "Email Marketing": 1,
+    "Youtube": 1,
+    "Instagram": 1,
+}
+
+
+def data_frame(user_id=300, k=50000, conv_rate=0.4, seed=None):
+    """Random DataFrame of k sessions with the columns channels, has_transaction,
+    user_id (between 0 and user_id - 1) and visitStartTime (a day of 2020), with
+    a conversion on a conv_rate share of the sessions."""
+    rng = np.random.default_rng(seed)
+    weights = np.asarray(list(CHANNELS.values()), dtype=float)
+    days = rng.integers(0, 366, k).astype("timedelta64[D]")
+    return pd.DataFrame(
+        {
+            "channels": np.asarray(list(CHANNELS), dtype=object)[
+                rng.choice(len(CHANNELS), k, p=weights / weights.sum())
+            ],
+            "has_transaction": rng.random(k) < conv_rate,
+            "user_id": rng.integers(0, user_id, k),
+            "visitStartTime": np.datetime_as_string(
+                np.datetime64("2020-01-01") + days
+            ).astype(object),
+        }
     )
-    user_id = list(range(0, 700))
-    day = [str(i) if len(str(i)) != 1 else "0" + str(i) for i in range(1, 30)]
-    month = [str(i) if len(str(i)) != 1 else "0" + str(i) for i in range(1, 12)]
-    visitStartTime = ["2020-" + month + "-" + day for month, day in zip(month, day)]
 
-    res = {}
-    colnames = ["channels", "has_transaction", "user_id", "visitStartTime"]
-    for i, name in zip([channels, has_transaction, user_id, visitStartTime], colnames):
-        res[name] = random.choices(population=i, k=k)
 
-    return pd.DataFrame(res)
+class JourneyGenerator:
+    """Generator of synthetic journeys with known attribution.
+
+    The channels of each touchpoint are drawn with Zipf popularity, the number of
+    touchpoints from a length distribution and the hours between touchpoints
+    from an exponential distribution. A journey converts with the probability
+
+        1 - (1 - base_rate) * prod over its distinct channels c of (1 - effect_c)
+
+    so the contribution of each channel is known and ground_truth gives the
+    removal effect of each channel the attribution models should recover.
+
+    The journeys are generated in chunks of chunk_size journeys, each one from
+    its own seed spawned from seed, so any number of journeys can be generated
+    in bounded memory and the same seed and chunk_size give the same data.
+
+    Parameters:
+    n_channels = 10 by default.
+        Number of channels, named channel_0 (the most popular) to channel_n;
+    zipf_exponent = 1.0 by default.
+        Popularity of the channel of rank r is proportional to r ** -zipf_exponent;
+    mean_length = 4 by default.
+        Mean number of touchpoints of a journey;
+    length_distribution = 'geometric' by default.
+        'geometric', 'poisson' (1 plus a Poisson with mean mean_length - 1) or a
+        sequence with the probabilities of the lengths 1, 2, ...;
+    base_rate = 0.05 by default.
+        Conversion probability of a journey without the effect of any channel;
+    channel_effects = None by default.
+        Sequence with the effect on the conversion probability of each channel,
+        from 0 to less than 1, drawn uniformly between 0.01 and 0.2 by default;
+    mean_gap_hours = 24 by default.
+        Mean number of hours between two touchpoints of a journey;
+    mean_value = 1 by default.
+        Mean (lognormal) value of a conversion;
+    start, end = '2020-01-01', '2021-01-01' by default.
+        Period where the journeys end;
+    seed = None by default.
+    """
+
+    def __init__(
+        self,
+        n_channels=10,
+        zipf_exponent=1.0,
+        mean_length=4,
+        length_distribution="geometric",
+        base_rate=0.05,
+        channel_effects=None,
+        mean_gap_hours=24.0,
+        mean_value=1.0,
+        start="2020-01-01",
+        end="2021-01-01",
+        seed=None,
+    ):
+        self._seed = np.random.SeedSequence(seed)
+        rng = np.random.default_rng(self._seed)
+
+        self.channels = np.asarray(
+            ["channel_{}".format(i) for i in range(n_channels)], dtype=object
+        )
+        popularity = np.arange(1, n_channels + 1, dtype=float) ** -zipf_exponent
+        self.popularity = popularity / popularity.sum()
+        if channel_effects is None:
+            channel_effects = rng.uniform(0.01, 0.2, n_channels)
+        self.channel_effects = np.asarray(channel_effects, dtype=float)
+        if len(self.channel_effects) != n_channels:
+            raise ValueError("channel_effects must have one value per channel")
+        if ((self.channel_effects < 0) | (self.channel_effects >= 1)).any():
+            raise ValueError("channel_effects must be at least 0 and less than 1")
+
+        self.mean_length = mean_length
+        self.length_distribution = length_distribution
+        self.base_rate = base_rate
+        self.mean_gap_hours = mean_gap_hours
+        self.mean_value = mean_value
+        self.start = np.datetime64(start, "s")
+        self.end = np.datetime64(end, "s")
+
+    def _lengths(self, rng, n):
+        if isinstance(self.length_distribution, str):
+            if self.length_distribution == "geometric":
+                return rng.geometric(1 / self.mean_length, n)
+            if self.length_distribution == "poisson":
+                return 1 + rng.poisson(self.mean_length - 1, n)
+            raise ValueError(
+                "Unknown length_distribution {}".format(self.length_distribution)
+            )
+        probabilities = np.asarray(self.length_distribution, dtype=float)
+        return 1 + rng.choice(
+            len(probabilities), n, p=probabilities / probabilities.sum()
+        )
+
+    def _chunks(self, n_journeys, chunk_size):
+        """Yields (first journey number, codes, offsets, hours till conversion,
+        conversion probability, converted, conversion value) for each chunk."""
+        for i, first in enumerate(range(0, n_journeys, chunk_size)):
+            n = min(chunk_size, n_journeys - first)
+            rng = np.random.default_rng(
+                np.random.SeedSequence(self._seed.entropy, spawn_key=(i,))
+            )
+            lengths = self._lengths(rng, n)
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            codes = rng.choice(len(self.channels), offsets[-1], p=self.popularity)
+
+            # Hours till conversion: the gaps after each touchpoint of its journey
+            gaps = np.cumsum(rng.exponential(self.mean_gap_hours, offsets[-1]))
+            hours = np.repeat(gaps[offsets[1:] - 1], lengths) - gaps
+
+            probability = self._conversion_probability(codes, offsets)
+            converted = rng.random(n) < probability
+            sigma = 0.5
+            value = rng.lognormal(np.log(self.mean_value) - sigma**2 / 2, sigma, n)
+            yield first, codes, offsets, hours, probability, converted, value * converted
+
+    def _channel_pairs(self, codes, offsets):
+        """Journey and channel of each distinct channel of each journey."""
+        journey = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        pairs = np.unique(journey * len(self.channels) + codes)
+        return pairs // len(self.channels), pairs % len(self.channels)
+
+    def _conversion_probability(self, codes, offsets):
+        journey, channel = self._channel_pairs(codes, offsets)
+        log_no_effect = np.bincount(
+            journey,
+            weights=np.log1p(-self.channel_effects[channel]),
+            minlength=len(offsets) - 1,
+        )
+        return 1 - (1 - self.base_rate) * np.exp(log_no_effect)
+
+    def journey_chunks(self, n_journeys, chunk_size=1_000_000, sep=" > "):
+        """Yields DataFrames of at most chunk_size journeys, one per row, with the
+        columns user_id, channels and time_till_conv (joined by sep),
+        has_transaction and conversion_value, as expected by MAM with
+        group_channels=False."""
+        for first, codes, offsets, hours, _, converted, value in self._chunks(
+            n_journeys, chunk_size
+        ):
+            journeys = JourneyStore(codes, offsets, self.channels)
+            yield pd.DataFrame(
+                {
+                    "user_id": np.arange(first, first + len(converted)),
+                    "channels": journeys.join(self.channels[codes], sep),
+                    "time_till_conv": journeys.join(np.round(hours, 2), sep),
+                    "has_transaction": converted,
+                    "conversion_value": value,
+                },
+                index=pd.RangeIndex(first, first + len(converted)),
+            )
+
+    def session_chunks(self, n_journeys, chunk_size=1_000_000):
+        """Yields DataFrames with the sessions of at most chunk_size journeys, one
+        session per row, with the columns user_id, channels, visitStartTime,
+        has_transaction and conversion_value (set on the last session of the
+        journeys that converted), as expected by MAM with group_channels=True
+        and by MAM.from_chunks. There are about n_journeys * mean_length rows."""
+        seconds = int((self.end - self.start) / np.timedelta64(1, "s"))
+        rows = 0
+        for first, codes, offsets, hours, _, converted, value in self._chunks(
+            n_journeys, chunk_size
+        ):
+            rng = np.random.default_rng(
+                np.random.SeedSequence(self._seed.entropy, spawn_key=(first, 1))
+            )
+            lengths = np.diff(offsets)
+            journey_end = self.start + rng.integers(0, seconds, len(lengths)).astype(
+                "timedelta64[s]"
+            )
+            last = np.zeros(offsets[-1], dtype=bool)
+            last[offsets[1:] - 1] = True
+            index = pd.RangeIndex(rows, rows + offsets[-1])
+            rows += offsets[-1]
+            yield pd.DataFrame(
+                {
+                    "user_id": np.repeat(
+                        np.arange(first, first + len(lengths)), lengths
+                    ),
+                    "channels": self.channels[codes],
+                    "visitStartTime": np.repeat(journey_end, lengths)
+                    - (hours * 3600).astype("timedelta64[s]"),
+                    "has_transaction": last & np.repeat(converted, lengths),
+                    "conversion_value": np.where(last, np.repeat(value, lengths), 0.0),
+                },
+                index=index,
+            )
+
+    def ground_truth(self, n_journeys, chunk_size=1_000_000):
+        """Pandas DataFrame indexed by channel with the popularity and the effect
+        of each channel, and its removal effect on the n_journeys generated with
+        chunk_size: the expected share of the conversions lost when the channel
+        is removed from the journeys. The 'attribution_share' column normalises
+        the removal effects to add up to 1, as the Markov model does."""
+        conversions = 0.0
+        lost = np.zeros(len(self.channels))
+        for _, codes, offsets, _, probability, _, _ in self._chunks(
+            n_journeys, chunk_size
+        ):
+            journey, channel = self._channel_pairs(codes, offsets)
+            without = 1 - (1 - probability[journey]) / (
+                1 - self.channel_effects[channel]
+            )
+            lost += np.bincount(
+                channel,
+                weights=probability[journey] - without,
+                minlength=len(self.channels),
+            )
+            conversions += probability.sum()
+
+        removal_effect = lost / conversions
+        return pd.DataFrame(
+            {
+                "popularity": self.popularity,
+                "effect": self.channel_effects,
+                "removal_effect": removal_effect,
+                "attribution_share": removal_effect / removal_effect.sum(),
+            },
+            index=pd.Index(self.channels, name="channels"),
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+class ChannelResults:
+    """Accumulator of the value attributed to each channel by each model.
+
+    The results live in one preallocated 2-D array with a row per registered model
+    and a column per channel of a sorted channel vocabulary, so adding the results
+    of a model writes one row instead of merging a new column into a DataFrame.
+    The DataFrame with one row per channel and one column per model is only built
+    when it is asked for, and cached until the next write.
+
+    Parameters:
+    vocabulary = Empty by default.
+        Array with the channel names, new channels are added as they appear;
+    capacity = 16 by default.
+        Number of models preallocated, doubled when it is reached.
+    """
+
+    def __init__(self, vocabulary=(), capacity=16):
+        self.vocabulary = np.unique(np.asarray(vocabulary, dtype=object))
+        self._values = np.zeros((capacity, len(self.vocabulary)))
+        self._present = np.zeros(len(self.vocabulary), dtype=bool)
+        self._columns = {}
+        self._frame = None
+        # List with the names of the models written while it is not None
+        self.log = None
+
+    def __len__(self):
+        return len(self._columns)
+
+    @property
+    def columns(self):
+        """Names of the registered models, in registration order."""
+        return list(self._columns)
+
+    def _extend_vocabulary(self, channels):
+        """Adds the channels that are not on the vocabulary yet, keeping it
+        sorted, and moves the stored columns to their new positions."""
+        new = np.setdiff1d(channels, self.vocabulary)
+        if not len(new):
+            return
+        vocabulary = np.union1d(self.vocabulary, new)
+        positions = np.searchsorted(vocabulary, self.vocabulary)
+        values = np.zeros((len(self._values), len(vocabulary)))
+        values[:, positions] = self._values
+        present = np.zeros(len(vocabulary), dtype=bool)
+        present[positions] = self._present
+        self.vocabulary, self._values, self._present = vocabulary, values, present
+
+    def _register(self, model_name):
+        """Row of model_name, registering it when it is new."""
+        if model_name not in self._columns:
+            if len(self._columns) == len(self._values):
+                self._values = np.concatenate(
+                    [self._values, np.zeros_like(self._values)]
+                )
+            self._columns[model_name] = len(self._columns)
+        return self._columns[model_name]
+
+    def set(self, model_name, values):
+        """Stores the results of a model from a Series indexed by channel name.
+
+        Channels missing from values are 0 for this model, and running a model
+        again overwrites its previous results.
+        """
+        channels = np.asarray(values.index, dtype=object)
+        self._extend_vocabulary(channels)
+        row = self._register(model_name)
+        positions = np.searchsorted(self.vocabulary, channels)
+        self._values[row] = 0
+        self._values[row, positions] = np.asarray(values, dtype=float)
+        self._present[positions] = True
+        self._frame = None
+        if self.log is not None and model_name not in self.log:
+            self.log.append(model_name)
+
+    def set_frame(self, frame):
+        """Stores the results of several models from a DataFrame indexed by
+        channel name with one column per model."""
+        for model_name in frame.columns:
+            self.set(model_name, frame[model_name])
+
+    def to_frame(self):
+        """DataFrame with a "channels" column and one column per model, with the
+        channels that received results from any model."""
+        if self._frame is None:
+            rows = list(self._columns.values())
+            frame = pd.DataFrame(
+                self._values[rows][:, self._present].T, columns=list(self._columns)
+            )
+            frame.insert(0, "channels", self.vocabulary[self._present])
+            self._frame = frame
+        return self._frame
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Accumulator with the results of a DataFrame with a "channels" column and
+        one column per model, as returned by to_frame."""
+        results = cls(capacity=max(16, len(frame.columns)))
+        results.set_frame(frame.set_index("channels"))
+        return results
@@ -1,54 +1,91 @@
+import numpy as np
 import pandas as pd
 
+from .journey_store import JourneyStore
 
-def group_channels(
+# Nanoseconds in one hour, the unit of the time till conversion
+HOUR = np.int64(3_600_000_000_000)
+
+
+def group_journeys(
     df,
     channels_colname,
     group_timestamp_colname,
     group_channels_by_id_list,
     print_log=True,
 ):
+    """Groups the touchpoints of df into journeys in the columnar layout.
 
-    # Grouping channels based on group_channels_by_id_list
-    ######################################################
-    if print_log:
-        print("group_channels == True")
-        print("Grouping channels...")
-    temp_channels = (
-        df.groupby(group_channels_by_id_list)[channels_colname]
-        .apply(list)
-        .reset_index()
-    )
-    if print_log:
-        print("Status: Done")
+    The rows are sorted once by journey key and timestamp, the journey boundaries
+    are the positions where the key changes, and the time till conversion of each
+    touchpoint is the last timestamp of its journey (np.maximum.reduceat) minus its
+    own timestamp, in whole hours. No per journey Python list is created.
 
-    # Grouping timestamp based on group_channels_by_id_list
-    ####################################################
+    Returns a tuple (keys, journeys): a DataFrame with the group_channels_by_id_list
+    columns of each journey, sorted by them, and the JourneyStore of the journeys in
+    the same order. The journeys are in the order of their keys, as in a groupby,
+    not in the order they first appear in df; when the keys include an integer
+    journey number the journeys of an id are in numeric order.
+    """
     if print_log:
-        print("Grouping timestamp...")
-    df_temp = df[group_channels_by_id_list + [group_timestamp_colname]]
-    df_temp = df_temp.merge(
-        df.groupby(group_channels_by_id_list)[group_timestamp_colname].max(),
-        on=group_channels_by_id_list,
+        print("Grouping channels and timestamp...")
+
+    # Integer key of each journey, in the sorted order of the id columns
+    group = df.groupby(group_channels_by_id_list, sort=True).ngroup().to_numpy()
+    timestamp = (
+        pd.to_datetime(df[group_timestamp_colname])
+        .to_numpy(dtype="datetime64[ns]")
+        .view(np.int64)
     )
 
-    # calculating the time till conversion
-    ######################################
-    df_temp["time_till_conv"] = (
-        df_temp[group_timestamp_colname + "_y"]
-        - df_temp[group_timestamp_colname + "_x"]
-    ).astype("timedelta64[h]")
-
-    df_temp = (
-        df_temp.groupby(group_channels_by_id_list)["time_till_conv"]
-        .apply(list)
-        .reset_index()
-        .assign(channel=temp_channels[channels_colname])
+    # Rows without a journey key are left out, as in a groupby
+    rows = np.flatnonzero(group >= 0)
+    rows = rows[np.lexsort((timestamp[rows], group[rows]))]
+    group = group[rows]
+    timestamp = timestamp[rows]
+
+    offsets = np.concatenate(
+        ([0], np.flatnonzero(np.diff(group)) + 1, [len(rows)])
+    ).astype(np.int64)
+    starts = offsets[:-1]
+    if len(rows):
+        last = np.maximum.reduceat(timestamp, starts)
+    else:
+        last = timestamp
+    times = ((np.repeat(last, np.diff(offsets)) - timestamp) // HOUR).astype(float)
+
+    journeys = JourneyStore.from_flat(
+        df[channels_colname].to_numpy()[rows], np.diff(offsets), times
     )
+    keys = df[group_channels_by_id_list].iloc[rows[starts]].reset_index(drop=True)
+
     if print_log:
         print("Status: Done")
+    return keys, journeys
+
 
-    return df_temp
+def group_channels(
+    df,
+    channels_colname,
+    group_timestamp_colname,
+    group_channels_by_id_list,
+    print_log=True,
+):
+    """Groups the touchpoints of df into one row per journey with the list of its
+    channels ("channel") and of its times till conversion ("time_till_conv").
+
+    Built on group_journeys; prefer it when the lists are not needed.
+    """
+    keys, journeys = group_journeys(
+        df,
+        channels_colname,
+        group_timestamp_colname,
+        group_channels_by_id_list,
+        print_log=print_log,
+    )
+    return keys.assign(
+        time_till_conv=journeys.time_lists(), channel=journeys.channel_lists()
+    )
 
 
 if __name__ == "__main__":
@@ -1,71 +1,54 @@
+import numpy as np
 import pandas as pd
 
 
 def journey_id_based_on_conversion(
-    df, group_id, transaction_colname, timestamp_colname=None, break_window=None
+    df,
+    group_id,
+    transaction_colname,
+    timestamp_colname=None,
+    break_window=None,
+    as_string=True,
 ):
     """
     Internal function that creates a journey_id column into a DF containing a User ID and Boolean column
     that indicates if there has been a conversion on that instance
     group_id = List of columns to be used as a ID
-    """
-
-    def list_dif(list_dates):
-        max_value = len(list_dates)
-
-        last_value = None
-        results = []
-        for i in list_dates:
-            if last_value is None:
-                results.append(0)
-            else:
-                value_dif = i - last_value
-                results.append(value_dif.days)
-                last_value = i
-        return results
+    timestamp_colname, break_window = A new journey also starts when more than
+    break_window days passed since the previous row of the same ID
+    as_string = If False, journey_id is the integer number of the journey within its
+    ID instead of the string 'id:<ID>_J:<number>'
 
+    The rows are expected to be sorted by ID and timestamp. Everything is computed
+    with grouped cumulative sums and differences, without Python loops.
+    """
     df_temp = df.copy()
+    keys = [df_temp[col] for col in group_id]
 
-    for i in group_id:
-        df[i] = df[i].apply(str)
-
-    df_temp = (
-        df.copy()
-        # Converting bool column to int
-        .assign(
-            journey_id=df[transaction_colname].map(lambda x: 0 if x == False else 1)
-        )
-    )
-
-    # Cumsum for each transaction to expand the value for the rows that did not have a transaction
-    df_temp["journey_id"] = df_temp.groupby(group_id)["journey_id"].cumsum()
+    # Each transaction starts a new journey from the next row on, so the journey
+    # number is the count of the previous transactions of the ID
+    transaction = df_temp[transaction_colname].ne(False).astype(np.int64)
+    journey_id = transaction.groupby(keys, sort=False).cumsum() - transaction
 
     # Timestamp break window
-    if timestamp_colname is not None:
-        df_time = df.groupby(group_id)[timestamp_colname].apply(list).reset_index()
-        df_time.columns = group_id + ["date_id"]
-        df_time["date_id"] = df_time["date_id"].apply(list_dif)
-        df_time["date_id"] = df_time["date_id"].apply(
-            lambda x: [0 if value_d <= break_window else 1 for value_d in x]
-        )
+    if timestamp_colname is not None and break_window is not None:
+        gap = df_temp.groupby(group_id, sort=False)[timestamp_colname].diff()
+        breaks = (gap.dt.days > break_window).astype(np.int64)
+        journey_id = journey_id + breaks.groupby(keys, sort=False).cumsum()
 
-        df_time = df_time.explode("date_id", ignore_index=True)
-        df_time["date_id"] = df_time["date_id"].apply(int)
-        df_time["date_id"] = df_time.groupby(group_id)["date_id"].cumsum()
-        df_temp["journey_id"] = df_temp["journey_id"] + df_time["date_id"]
-        # print(df_temp['journey_id'])
+    df_temp["journey_id"] = journey_id.to_numpy(dtype=np.int64)
+    if as_string:
+        df_temp["journey_id"] = journey_id_to_string(
+            df_temp[group_id[0]], df_temp["journey_id"]
+        )
+    return df_temp
 
-    # Subtracting 1 only for the row that had a transaction
-    t = df_temp["journey_id"] - 1
-    df_temp["journey_id"] = (
-        df_temp["journey_id"]
-        .where((df_temp[transaction_colname] == False), t)
-        .apply(str)
-    )
-    df_temp["journey_id"] = "id:" + df_temp[group_id[0]] + "_J:" + df_temp["journey_id"]
 
-    del t
-    return df_temp
+def journey_id_to_string(ids, journey_id):
+    """String view 'id:<ID>_J:<number>' of integer journey ids."""
+    ids = pd.Series(ids).astype(str).to_numpy(dtype=object)
+    journey_id = pd.Series(journey_id).astype(str).to_numpy(dtype=object)
+    return "id:" + ids + "_J:" + journey_id
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def code_dtype(n_channels):
+    """Smallest unsigned integer dtype holding the codes of n_channels channels."""
+    if n_channels <= 2**16:
+        return np.dtype(np.uint16)
+    if n_channels <= 2**32:
+        return np.dtype(np.uint32)
+    return np.dtype(np.int64)
+
+
+def split(values, offsets):
+    """Splits a flat array into one list per journey of the offsets."""
+    flat = np.asarray(values).tolist()
+    bounds = np.asarray(offsets).tolist()
+    return [flat[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class JourneyStore:
+    """Columnar storage of customer journeys.
+
+    The journeys are kept as a ragged array (CSR layout): every touchpoint of every
+    journey lives in one flat array and ``offsets`` marks where each journey starts
+    and ends, so the touchpoints of journey ``i`` are
+    ``codes[offsets[i]:offsets[i + 1]]``.
+
+    Parameters:
+    codes =
+        Flat integer array with the channel of each touchpoint, encoded as the
+        position of the channel name on vocabulary. It is stored with the smallest
+        unsigned dtype for the size of the vocabulary (uint16 up to 65536
+        channels), so cast it before arithmetic that may overflow;
+    offsets =
+        Integer array with len(journeys) + 1 elements, starting at 0 and ending at
+        len(codes);
+    vocabulary =
+        Array with the channel names, indexed by code;
+    times = None by default.
+        Flat float array with the time in hours till the conversion of each
+        touchpoint, aligned with codes.
+    """
+
+    def __init__(self, codes, offsets, vocabulary, times=None):
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.codes = np.asarray(codes).astype(
+            code_dtype(len(self.vocabulary)), copy=False
+        )
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.times = None if times is None else np.asarray(times, dtype=float)
+
+        if self.offsets[0] != 0 or self.offsets[-1] != len(self.codes):
+            raise ValueError("offsets must start at 0 and end at len(codes)")
+        if self.times is not None and len(self.times) != len(self.codes):
+            raise ValueError("times must have the same length as codes")
+
+    ######################
+    #### Constructors ####
+    ######################
+
+    @classmethod
+    def from_flat(cls, channels, lengths, times=None):
+        """Creates the store from a flat sequence of channel names and the length
+        of each journey."""
+        codes, vocabulary = pd.factorize(np.asarray(channels, dtype=object), sort=True)
+        if (codes < 0).any():
+            raise ValueError("channels cannot be null")
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(codes, offsets, np.asarray(vocabulary, dtype=object), times)
+
+    @classmethod
+    def from_lists(cls, channels, times=None):
+        """Creates the store from an iterable of channel lists, and optionally an
+        iterable of time till conversion lists with the same shape."""
+        channels = list(channels)
+        lengths = np.fromiter((len(x) for x in channels), dtype=np.int64)
+        flat = list(itertools.chain.from_iterable(channels))
+        if times is not None:
+            times = np.fromiter(
+                itertools.chain.from_iterable(times), dtype=float, count=len(flat)
+            )
+        return cls.from_flat(flat, lengths, times)
+
+    @classmethod
+    def from_strings(cls, channels, sep, times=None):
+        """Creates the store from a Series of sep joined channels and, optionally,
+        a Series of sep joined times till conversion.
+
+        The strings are joined and split only once instead of once per journey.
+        """
+        channels = pd.Series(channels).astype(str)
+        lengths = channels.str.count(re.escape(sep)).to_numpy(dtype=np.int64) + 1
+        flat = sep.join(channels.tolist()).split(sep)
+        if times is not None:
+            times = np.asarray(
+                sep.join(pd.Series(times).astype(str).tolist()).split(sep),
+                dtype=float,
+            )
+        return cls.from_flat(flat, lengths, times)
+
+    @classmethod
+    def concat(cls, stores):
+        """Concatenates the journeys of several stores, merging their vocabularies."""
+        stores = list(stores)
+        vocabulary = np.unique(np.concatenate([store.vocabulary for store in stores]))
+        codes = [
+            np.searchsorted(vocabulary, store.vocabulary)[store.codes]
+            for store in stores
+        ]
+        lengths = np.concatenate([store.lengths for store in stores])
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        times = None
+        if all(store.times is not None for store in stores):
+            times = np.concatenate([store.times for store in stores])
+        return cls(np.concatenate(codes), offsets, vocabulary, times)
+
+    def take(self, rows):
+        """Store with the journeys at the positions rows, in that order, and only
+        the channels they contain on its vocabulary."""
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.lengths[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Flat position of each selected touchpoint on the original arrays
+        flat = np.repeat(self.starts[rows] - offsets[:-1], lengths) + np.arange(
+            offsets[-1]
+        )
+        present, codes = np.unique(self.codes[flat], return_inverse=True)
+        times = None if self.times is None else self.times[flat]
+        return JourneyStore(codes, offsets, self.vocabulary[present], times)
+
+    ##################
+    #### Geometry ####
+    ##################
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_touchpoints(self):
+        return len(self.codes)
+
+    @property
+    def lengths(self):
+        """Number of touchpoints of each journey."""
+        return np.diff(self.offsets)
+
+    @property
+    def starts(self):
+        """Flat position of the first touchpoint of each journey."""
+        return self.offsets[:-1]
+
+    @property
+    def ends(self):
+        """Flat position of the last touchpoint of each journey."""
+        return self.offsets[1:] - 1
+
+    def journey_index(self):
+        """Journey number of each touchpoint."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def repeat(self, values):
+        """Broadcasts one value per journey to each one of its touchpoints."""
+        return np.repeat(np.asarray(values), self.lengths)
+
+    #################
+    #### Outputs ####
+    #################
+
+    def code_of(self, channel):
+        """Code of a channel name, or -1 when it is not on the vocabulary."""
+        position = np.flatnonzero(self.vocabulary == channel)
+        return int(position[0]) if len(position) else -1
+
+    def channel_names(self):
+        """Flat array with the channel name of each touchpoint."""
+        return self.vocabulary[self.codes]
+
+    def split(self, values):
+        """Splits a flat array aligned with the touchpoints into one list per
+        journey."""
+        return split(values, self.offsets)
+
+    def channel_lists(self):
+        return self.split(self.channel_names())
+
+    def time_lists(self):
+        if self.times is None:
+            return None
+        return self.split(self.times)
+
+    def join(self, values, sep):
+        """Returns one sep joined string per journey from a flat array aligned
+        with the touchpoints."""
+        flat = [str(value) for value in np.asarray(values).tolist()]
+        bounds = self.offsets.tolist()
+        return [
+            sep.join(flat[start:end]) for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def channel_totals(self, values, positions=None):
+        """Sums values by channel.
+
+        values is a flat array aligned with the touchpoints or, when positions is
+        given, one value per journey that is credited to the touchpoint at the flat
+        position positions[i]. Returns a Series indexed by the channel names present
+        on the journeys.
+        """
+        codes = self.codes if positions is None else self.codes[positions]
+        size = len(self.vocabulary)
+        totals = np.bincount(codes, weights=values, minlength=size)
+        present = np.bincount(self.codes, minlength=size) > 0
+        return pd.Series(
+            totals[present],
+            index=pd.Index(self.vocabulary[present], name="channels"),
+            name="value",
+        )
+
+    def channel_totals_wide(self, values, columns):
+        """Sums several flat arrays aligned with the touchpoints by channel at once.
+
+        values is a 2-D array with one row per touchpoint and one column per entry
+        of columns. Returns a DataFrame indexed by the channel names present on the
+        journeys.
+        """
+        values = np.asarray(values, dtype=float)
+        size = len(self.vocabulary)
+        width = values.shape[1]
+        # One bincount over (channel, column) pairs instead of one per column
+        index = self.codes[:, None].astype(np.int64) * width + np.arange(width)
+        totals = np.bincount(
+            index.ravel(), weights=values.ravel(), minlength=size * width
+        ).reshape(size, width)
+        present = np.bincount(self.codes, minlength=size) > 0
+        return pd.DataFrame(
+            totals[present],
+            index=pd.Index(self.vocabulary[present], name="channels"),
+            columns=columns,
+        )
+
+    def channel_totals_rows(self, values):
+        """Sums each row of a 2-D array, with one column per touchpoint, by
+        channel.
+
+        Returns a tuple (totals, channels) with one row per row of values and one
+        column per channel present on the journeys.
+        """
+        size = len(self.vocabulary)
+        totals = np.stack(
+            [np.bincount(self.codes, weights=row, minlength=size) for row in values]
+        )
+        present = np.bincount(self.codes, minlength=size) > 0
+        return totals[:, present], self.vocabulary[present]
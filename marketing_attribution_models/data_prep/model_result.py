@@ -0,0 +1,86 @@
+from collections.abc import Sequence
+
+import pandas as pd
+
+from .journey_store import split
+
+
+class Deferred:
+    """Item of a ModelResult built by function(*args) when it is first accessed,
+    as the labelled transition matrix of the Markov model. Only function and args
+    are pickled."""
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self._value = None
+        self._built = False
+
+    def resolve(self):
+        if not self._built:
+            self._value = self.function(*self.args)
+            self._built = True
+        return self._value
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_value"], state["_built"] = None, False
+        return state
+
+
+class ModelResult(Sequence):
+    """Result returned by the attribution models, used as the tuple
+    (journey values, *results).
+
+    The journey values, a Series with the list of values attributed to each
+    journey, are kept as one flat array aligned with the touchpoints and only split
+    into lists when they are accessed, so running a model does not create a Python
+    object per touchpoint. Only the flat array is pickled.
+
+    Parameters:
+    values =
+        Flat array with the value attributed to each touchpoint;
+    offsets =
+        Journey boundaries on values, as in JourneyStore;
+    index =
+        Index of the journeys;
+    *results =
+        The other items of the result, such as the values grouped by channel, or
+        Deferred items built when they are accessed.
+    """
+
+    def __init__(self, values, offsets, index, *results):
+        self.values = values
+        self.offsets = offsets
+        self.index = index
+        self.results = results
+        self._journey_values = None
+
+    @property
+    def journey_values(self):
+        if self._journey_values is None:
+            self._journey_values = pd.Series(
+                split(self.values, self.offsets), index=self.index
+            )
+        return self._journey_values
+
+    def __len__(self):
+        return 1 + len(self.results)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return tuple(self)[item]
+        if item in (0, -len(self)):
+            return self.journey_values
+        result = self.results[item - 1 if item > 0 else item]
+        if isinstance(result, Deferred):
+            return result.resolve()
+        return result
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_journey_values"] = None
+        return state
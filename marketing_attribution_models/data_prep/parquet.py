@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from .journey_store import JourneyStore
+
+
+def _import_pyarrow():
+    """pyarrow is only needed to read and write parquet files."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as err:
+        raise ImportError(
+            "Reading and writing parquet files requires pyarrow, install it with "
+            + "'pip install pyarrow'"
+        ) from err
+    return pyarrow
+
+
+def _list_parts(column):
+    """Offsets (starting at 0) and flat values of an Arrow list array."""
+    offsets = np.asarray(column.offsets, dtype=np.int64)
+    return offsets - offsets[0], column.flatten()
+
+
+def _channel_codes(pa, values):
+    """Integer codes and vocabulary of an Arrow array of channel names, using its
+    dictionary when it is already dictionary encoded."""
+    if not pa.types.is_dictionary(values.type):
+        values = pa.compute.dictionary_encode(values)
+    if values.null_count or values.dictionary.null_count:
+        raise ValueError("channels cannot be null")
+    codes = np.asarray(values.indices)
+    vocabulary = np.asarray(values.dictionary.to_pylist(), dtype=object)
+    return codes, vocabulary
+
+
+def read_journeys(
+    path, channels_colname, time_till_conv_colname=None, columns=None, batch_size=65536
+):
+    """Reads journeys stored as Arrow list columns from a parquet file.
+
+    Only channels_colname, time_till_conv_colname and the other columns are read,
+    streaming batch_size rows at a time, and the list columns go straight to the
+    columnar layout without any string splitting.
+
+    Returns a tuple (journeys, frame): the JourneyStore and a DataFrame with the
+    other columns, one row per journey.
+    """
+    pa = _import_pyarrow()
+    columns = list(columns or [])
+    read_columns = [channels_colname] + columns
+    if time_till_conv_colname is not None:
+        read_columns.append(time_till_conv_colname)
+
+    stores = []
+    frames = []
+    parquet_file = pa.parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=read_columns):
+        offsets, values = _list_parts(batch.column(channels_colname))
+        codes, vocabulary = _channel_codes(pa, values)
+        times = None
+        if time_till_conv_colname is not None:
+            _, times = _list_parts(batch.column(time_till_conv_colname))
+            times = np.asarray(times.fill_null(np.nan), dtype=float)
+        stores.append(JourneyStore(codes, offsets, vocabulary, times))
+        frames.append(batch.select(columns).to_pandas())
+
+    if not stores:
+        stores.append(JourneyStore([], [0], []))
+        frames.append(pd.DataFrame(columns=columns))
+    return JourneyStore.concat(stores), pd.concat(frames, ignore_index=True)
+
+
+def write_journeys(path, journeys, frame=None, values=None, row_group_size=None):
+    """Writes journeys to a parquet file with one row per journey.
+
+    The channels are written as a list of dictionary encoded names ("channels"),
+    the times till conversion ("time_till_conv") and each entry of values, flat
+    arrays aligned with the touchpoints, as lists of doubles. The columns of frame
+    are written as they are.
+    """
+    pa = _import_pyarrow()
+    list_type = pa.LargeListArray if journeys.n_touchpoints >= 2**31 else pa.ListArray
+    offsets = pa.array(
+        journeys.offsets,
+        type=pa.int64() if list_type is pa.LargeListArray else pa.int32(),
+    )
+
+    def to_list(flat):
+        return list_type.from_arrays(offsets, flat)
+
+    arrays = {}
+    if frame is not None:
+        for col in frame.columns:
+            arrays[str(col)] = pa.array(frame[col].to_numpy(), from_pandas=True)
+    arrays["channels"] = to_list(
+        pa.DictionaryArray.from_arrays(
+            pa.array(journeys.codes, type=pa.int32()),
+            pa.array(journeys.vocabulary.tolist(), type=pa.string()),
+        )
+    )
+    if journeys.times is not None:
+        arrays["time_till_conv"] = to_list(pa.array(journeys.times, type=pa.float64()))
+    for name, flat in (values or {}).items():
+        arrays[name] = to_list(pa.array(np.asarray(flat, dtype=float)))
+
+    pa.parquet.write_table(pa.table(arrays), path, row_group_size=row_group_size)
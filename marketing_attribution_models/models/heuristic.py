@@ -150,6 +150,366 @@ def time_decay(decay_list, decay_over_time=0.5, frequency=168, value=1):
         return np.exp(v1 * v2) / sum(np.exp(v1 * v2))
 
 
+#####################################################
+##### Batched versions over flat journey arrays #####
+#####################################################
+
+# The functions below work on the columnar journey layout (see
+# data_prep.journey_store.JourneyStore): the touchpoints of every journey are
+# concatenated into flat arrays and offsets marks where each journey starts, so the
+# touchpoints of journey i are flat[offsets[i]:offsets[i + 1]]. They return one flat
+# array of weights aligned with the touchpoints, already multiplied by value.
+
+
+def _segments(offsets):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    Returns
+    -------
+    tuple : (lengths, starts, ends, position)
+        Number of touchpoints, first and last flat position of each journey and
+        the position of each touchpoint inside its journey.
+    """
+    offsets = np.asarray(offsets)
+    lengths = np.diff(offsets)
+    starts = offsets[:-1]
+    ends = offsets[1:] - 1
+    position = np.arange(offsets[-1]) - np.repeat(starts, lengths)
+    return lengths, starts, ends, position
+
+
+def _expand(value, lengths):
+    """Broadcasts a scalar or one value per journey to each touchpoint."""
+    value = np.asarray(value, dtype=float)
+    if value.ndim == 0:
+        return np.full(lengths.sum(), float(value))
+    return np.repeat(value, lengths)
+
+
+def _normalize_segments(weights, starts, lengths):
+    """Divides the weights by the sum of the weights of their journey."""
+    return weights / np.repeat(np.add.reduceat(weights, starts), lengths)
+
+
+def _credit_positions(offsets, flat_positions, value):
+    weights = np.zeros(offsets[-1])
+    weights[flat_positions] = np.asarray(value, dtype=float)
+    return weights
+
+
+def _check_distribution(distribution_list):
+    if distribution_list is None:
+        distribution_list = [0.4, 0.2, 0.4]
+
+    if len(distribution_list) > 3:
+        raise ValueError("distribution_list length cannot be greater than 3")
+    return distribution_list
+
+
+def _last_click_non_positions(channels, starts, lengths, non_value):
+    """Flat position of the last touchpoint of each journey that is not
+    non_value, or of its first touchpoint if there is none."""
+    flat_position = np.where(
+        np.asarray(channels) != non_value,
+        np.arange(len(channels)),
+        np.repeat(starts, lengths),
+    )
+    return np.maximum.reduceat(flat_position, starts)
+
+
+def _position_based_weights(position, length, first, middle, last):
+    """Share of the first, middle and last touchpoints, or a linear share for
+    journeys with up to 2 touchpoints. The shares can be arrays broadcast
+    against the touchpoints."""
+    weights = np.where(
+        position == 0,
+        first,
+        np.where(position == length - 1, last, middle / np.maximum(length - 2, 1)),
+    )
+    return np.where(length <= 2, 1 / length, weights)
+
+
+def _time_decay_weights(decay_list, starts, lengths, decay_over_time, frequency):
+    """Decayed weights of the touchpoints, normalized by journey."""
+    weights = np.exp(
+        math.log(decay_over_time) * np.floor(np.asarray(decay_list) / frequency)
+    )
+    return _normalize_segments(weights, starts, lengths)
+
+
+def last_click_batch(offsets, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    offsets = np.asarray(offsets)
+    return _credit_positions(offsets, offsets[1:] - 1, value)
+
+
+def last_click_non_batch(channels, offsets, non_value, value=1):
+    """
+    Parameters
+    ----------
+    channels : np.ndarray
+        Flat array of channels, as names or integer codes.
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    non_value :
+        Channel (name or code) to be ignored, unless the journey has only this
+        channel.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    lengths, starts, _, _ = _segments(offsets)
+    positions = _last_click_non_positions(channels, starts, lengths, non_value)
+    return _credit_positions(offsets, positions, value)
+
+
+def first_click_batch(offsets, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    offsets = np.asarray(offsets)
+    return _credit_positions(offsets, offsets[:-1], value)
+
+
+def linear_batch(offsets, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    lengths = np.diff(offsets)
+    return _expand(value, lengths) / np.repeat(lengths, lengths)
+
+
+def position_based_batch(offsets, distribution_list=None, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    distribution_list : list
+        List with values to be distributed to the first, middle and last
+        touchpoints. Journeys with up to 2 touchpoints are distributed linearly.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    first, middle, last = _check_distribution(distribution_list)
+    lengths, _, _, position = _segments(offsets)
+    length = np.repeat(lengths, lengths)
+    weights = _position_based_weights(position, length, first, middle, last)
+    return weights * _expand(value, lengths)
+
+
+def position_decay_batch(offsets, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    lengths, _, _, position = _segments(offsets)
+    length = np.repeat(lengths, lengths)
+    # sum(1..n) = n * (n + 1) / 2
+    weights = (position + 1) / (length * (length + 1) / 2)
+    return weights * _expand(value, lengths)
+
+
+def time_decay_batch(decay_list, offsets, decay_over_time=0.5, frequency=168, value=1):
+    """
+    Parameters
+    ----------
+    decay_list : np.ndarray
+        Flat array of times till conversion.
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    decay_over_time: float
+        Value of the decay.
+    frequency: float
+        Frequency value of the decay
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Flat array with values distributed
+    """
+    lengths, starts, _, _ = _segments(offsets)
+    weights = _time_decay_weights(
+        decay_list, starts, lengths, decay_over_time, frequency
+    )
+    return weights * _expand(value, lengths)
+
+
+def all_heuristics_batch(
+    channels,
+    decay_list,
+    offsets,
+    non_value="Direct",
+    distribution_list=None,
+    decay_over_time=0.5,
+    frequency=168,
+    value=1,
+):
+    """
+    Computes the weights of every heuristic model in a single pass, sharing the
+    journey geometry (lengths, boundaries and positions) between them.
+
+    Parameters
+    ----------
+    channels : np.ndarray
+        Flat array of channels, as names or integer codes.
+    decay_list : np.ndarray
+        Flat array of times till conversion, or None to skip time_decay.
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    non_value :
+        Channel (name or code) to be ignored by last_click_non.
+    distribution_list : list
+        List with values to be distributed by position_based.
+    decay_over_time: float
+        Value of the decay of time_decay.
+    frequency: float
+        Frequency value of the decay of time_decay.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : dict
+        Flat array with values distributed for each model, in the order
+        last_click, last_click_non, first_click, linear, position_based and
+        time_decay.
+    """
+    first, middle, last = _check_distribution(distribution_list)
+
+    offsets = np.asarray(offsets)
+    lengths, starts, _, position = _segments(offsets)
+    length = np.repeat(lengths, lengths)
+    journey_value = value
+    value = _expand(value, lengths)
+
+    results = {}
+    results["last_click"] = last_click_batch(offsets, journey_value)
+    results["last_click_non"] = _credit_positions(
+        offsets,
+        _last_click_non_positions(channels, starts, lengths, non_value),
+        value[starts],
+    )
+    results["first_click"] = first_click_batch(offsets, journey_value)
+    results["linear"] = value / length
+    results["position_based"] = (
+        _position_based_weights(position, length, first, middle, last) * value
+    )
+    if decay_list is not None:
+        results["time_decay"] = (
+            _time_decay_weights(decay_list, starts, lengths, decay_over_time, frequency)
+            * value
+        )
+
+    return results
+
+
+# The sweep functions compute one model for several settings at once: the settings
+# are broadcast against the flat arrays and the result is a 2-D array with one row
+# per setting and one column per touchpoint.
+
+
+def time_decay_sweep(decay_list, offsets, decay_over_time, frequency, value=1):
+    """
+    Parameters
+    ----------
+    decay_list : np.ndarray
+        Flat array of times till conversion.
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    decay_over_time: np.ndarray
+        Value of the decay of each setting.
+    frequency: np.ndarray
+        Frequency value of the decay of each setting.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Values distributed with shape (settings, touchpoints)
+    """
+    lengths, starts, _, _ = _segments(offsets)
+    log_decay = np.log(np.asarray(decay_over_time, dtype=float))[:, None]
+    frequency = np.asarray(frequency, dtype=float)[:, None]
+    weights = np.exp(log_decay * np.floor(np.asarray(decay_list)[None, :] / frequency))
+    totals = np.repeat(np.add.reduceat(weights, starts, axis=1), lengths, axis=1)
+    return weights / totals * _expand(value, lengths)
+
+
+def position_based_sweep(offsets, distribution_lists, value=1):
+    """
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Journey boundaries on the flat arrays.
+    distribution_lists : np.ndarray
+        Values to be distributed to the first, middle and last touchpoints, one
+        row per setting.
+    value : float or np.ndarray
+        Value to be distributed, or one value per journey.
+    Returns
+    -------
+    weights : np.ndarray
+        Values distributed with shape (settings, touchpoints)
+    """
+    distribution_lists = np.asarray(distribution_lists, dtype=float)
+    if distribution_lists.ndim != 2 or distribution_lists.shape[1] != 3:
+        raise ValueError("distribution_lists must have 3 values per setting")
+
+    first, middle, last = distribution_lists.T[:, :, None]
+    lengths, _, _, position = _segments(offsets)
+    length = np.repeat(lengths, lengths)
+    weights = _position_based_weights(position, length, first, middle, last)
+    return weights * _expand(value, lengths)
+
+
 if __name__ == "__main__":
     channels = pd.Series([["x", "y", "z"], ["x", "y", "z", "y", "z"], ["z"]])
     print(channels.apply(last_click))
@@ -160,3 +520,8 @@ if __name__ == "__main__":
     print(channels.apply(position_decay))
     dacay = pd.Series([[1680, 168, 0], [168, 0]])
     print(dacay.apply(time_decay))
+
+    offsets = np.asarray([0, 3, 8, 9])
+    print(last_click_batch(offsets))
+    print(position_based_batch(offsets))
+    print(time_decay_batch(np.asarray([1680, 168, 0, 336, 168, 168, 0, 0, 0]), offsets))
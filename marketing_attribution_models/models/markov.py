@@ -0,0 +1,413 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Largest number of transient states solved with dense matrices, even when the
+# transition matrix is sparse. A dense solve was faster at every size measured up
+# to it (benchmarks/bench_markov.py), as the LU of the sparse chains fills in;
+# above it the dense solve needs about 4 * 8 * states ** 2 bytes (800 MB at 5000
+# states), so the sparse solver is used.
+DENSE_STATES = 5000
+
+
+def _import_sparse():
+    """scipy is only needed for the sparse transition matrices."""
+    try:
+        import scipy.sparse
+        import scipy.sparse.linalg
+    except ImportError as err:
+        raise ImportError(
+            "Sparse Markov matrices require scipy, install it with "
+            + "'pip install scipy'"
+        ) from err
+    return scipy.sparse
+
+
+def issparse(matrix):
+    """Checks if matrix is a scipy sparse matrix without importing scipy."""
+    return hasattr(matrix, "tocsc") and hasattr(matrix, "nnz")
+
+
+def transition_matrix(orig, dest, counts, size, sparse=False):
+    """
+    Parameters
+    ----------
+    orig : np.ndarray
+        State index of the origin of each transition.
+    dest : np.ndarray
+        State index of the destination of each transition.
+    counts : np.ndarray
+        Count of each transition, repeated pairs are added.
+    size : int
+        Number of states, the last two being the absorbing ones.
+    sparse : bool
+        Returns a scipy.sparse CSR matrix instead of a dense one.
+    Returns
+    -------
+    matrix : np.ndarray or scipy.sparse.csr_matrix
+        Square matrix of transition counts, with the absorbing states looping to
+        themselves
+    """
+    # Appending the loops of the absorbing states
+    orig = np.concatenate([np.asarray(orig, dtype=np.int64), [size - 2, size - 1]])
+    dest = np.concatenate([np.asarray(dest, dtype=np.int64), [size - 2, size - 1]])
+    counts = np.concatenate([np.asarray(counts, dtype=float), [1.0, 1.0]])
+
+    if sparse:
+        sp = _import_sparse()
+        return sp.coo_matrix((counts, (orig, dest)), shape=(size, size)).tocsr()
+
+    matrix = np.zeros((size, size), dtype=float)
+    np.add.at(matrix, (orig, dest), counts)
+    return matrix
+
+
+# The transition matrices used here follow the layout built by MAM.attribution_markov:
+# the first state is the start of the journeys, the last two states are the
+# absorbing states (null) and (conversion), and every state in between is transient.
+
+
+def transition_frame(matrix, states_names):
+    """
+    Parameters
+    ----------
+    matrix : np.ndarray or scipy.sparse matrix
+        Square transition probability matrix.
+    states_names : list
+        Name of each state.
+    Returns
+    -------
+    frame : pd.DataFrame
+        matrix labelled by the states names, with sparse columns for a sparse
+        matrix
+    """
+    if issparse(matrix):
+        return pd.DataFrame.sparse.from_spmatrix(
+            matrix, columns=states_names, index=states_names
+        )
+    return pd.DataFrame(matrix, columns=states_names, index=states_names)
+
+
+def history_states(channels, offsets, order=1):
+    """
+    Encodes the last order channels seen at each touchpoint (its history) as an
+    integer state. Histories are cut at the start of the journey, so the first
+    touchpoints of a journey have shorter histories.
+
+    Parameters
+    ----------
+    channels : np.ndarray
+        Flat array of integer channel codes, from 0 to the number of channels - 1.
+    offsets : np.ndarray
+        Journey boundaries on the flat array.
+    order : int
+        Number of channels in each history.
+    Returns
+    -------
+    tuple : (states, histories)
+        Flat array with the transient state of each touchpoint, from 1 to the
+        number of states, and an array with the channel codes of each state, one
+        row per state starting at state 1, padded on the left with -1.
+    """
+    channels = np.asarray(channels, dtype=np.int64)
+    offsets = np.asarray(offsets)
+    lengths = np.diff(offsets)
+    position = np.arange(len(channels)) - np.repeat(offsets[:-1], lengths)
+
+    # n-grams over the flat array: column order - 1 - lag holds the channel seen lag
+    # touchpoints before, or -1 when it belongs to the previous journey
+    histories = np.full((len(channels), order), -1, dtype=np.int64)
+    for lag in range(order):
+        histories[lag:, order - 1 - lag] = channels[: len(channels) - lag]
+        histories[position < lag, order - 1 - lag] = -1
+
+    # Compact state index: a mixed radix key when it fits in an int64, the unique
+    # rows otherwise
+    radix = int(channels.max()) + 2 if len(channels) else 1
+    if order * np.log2(radix) < 62:
+        keys = (histories + 1) @ (radix ** np.arange(order - 1, -1, -1))
+        _, first, states = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        _, first, states = np.unique(
+            histories, axis=0, return_index=True, return_inverse=True
+        )
+    return states.ravel() + 1, histories[first]
+
+
+def journey_transitions(
+    states, offsets, converted, weights, n_states, transition_to_same_state=False
+):
+    """
+    Counts the transitions between states of every journey, from the start state
+    (0) to the absorbing states (null, n_states + 1) and (conversion, n_states + 2).
+
+    Parameters
+    ----------
+    states : np.ndarray
+        Flat array with the transient state of each touchpoint.
+    offsets : np.ndarray
+        Journey boundaries on the flat array.
+    converted : np.ndarray
+        Boolean array indicating which journeys converted.
+    weights : np.ndarray
+        Weight of the transitions of each journey.
+    n_states : int
+        Number of transient states, the start state excluded.
+    transition_to_same_state : bool
+        Keeps the transitions from a state to itself.
+    Returns
+    -------
+    tuple : (orig, dest, counts)
+        Unique transitions and their total weight
+    """
+    states = np.asarray(states, dtype=np.int64)
+    offsets = np.asarray(offsets)
+    lengths = np.diff(offsets)
+    weights = np.asarray(weights, dtype=float)
+    inside = np.ones(len(states), dtype=bool)
+    inside[offsets[1:] - 1] = False
+    inside = np.flatnonzero(inside[:-1])
+
+    orig = np.concatenate(
+        [np.zeros(len(lengths), np.int64), states[inside], states[offsets[1:] - 1]]
+    )
+    dest = np.concatenate(
+        [
+            states[offsets[:-1]],
+            states[inside + 1],
+            np.where(np.asarray(converted, dtype=bool), n_states + 2, n_states + 1),
+        ]
+    )
+    counts = np.concatenate([weights, np.repeat(weights, lengths)[inside], weights])
+
+    if not transition_to_same_state:
+        different = orig != dest
+        orig, dest, counts = orig[different], dest[different], counts[different]
+
+    size = n_states + 3
+    keys, inverse = np.unique(orig * size + dest, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(keys))
+    return keys // size, keys % size, counts
+
+
+def normalize_rows(matrix):
+    """
+    Parameters
+    ----------
+    matrix : np.ndarray
+        Square matrix of transition counts.
+    Returns
+    -------
+    matrix : np.ndarray
+        Matrix with every non empty row adding to 1
+    """
+    if issparse(matrix):
+        sp = _import_sparse()
+        total = np.asarray(matrix.sum(axis=1)).ravel()
+        total = np.where(total == 0, 1, total)
+        return (sp.diags(1 / total) @ matrix).tocsr()
+
+    size = matrix.shape[0]
+    total = matrix.sum(axis=1).reshape((size, 1))
+    total = np.where(total == 0, 1, total)
+    return matrix / total
+
+
+def fundamental_matrix(matrix):
+    """
+    Parameters
+    ----------
+    matrix : np.ndarray
+        Square transition probability matrix, with the absorbing states as the last
+        two rows and columns.
+    Returns
+    -------
+    matrix : np.ndarray
+        Fundamental matrix N = inv(I - Q) of the absorbing chain, where Q is the
+        transient part of the matrix. N[i, j] is the expected number of visits to
+        j starting from i.
+    """
+    transient = matrix[:-2, :-2]
+    system = np.eye(transient.shape[0]) - transient
+    try:
+        # One LU factorisation solving for every column of the identity
+        return np.linalg.solve(system, np.eye(transient.shape[0]))
+    except np.linalg.LinAlgError as err:
+        if "Singular matrix" in str(err):
+            warnings.warn(
+                "Warning... Singular matrix error. Check for lines or cols "
+                + "fully filled with zeros."
+            )
+            return np.linalg.pinv(system)
+        raise
+
+
+def conversion_probabilities(matrix, fundamental=None):
+    """
+    Parameters
+    ----------
+    matrix : np.ndarray
+        Square transition probability matrix, with (conversion) as the last state.
+    fundamental : np.ndarray
+        Fundamental matrix of the chain, computed when None.
+    Returns
+    -------
+    probabilities : np.ndarray
+        Probability of being absorbed by (conversion) from each transient state
+    """
+    if fundamental is None:
+        fundamental = fundamental_matrix(matrix)
+    return fundamental @ matrix[:-2, -1]
+
+
+def removal_effects(matrix, groups=None, dense_states=DENSE_STATES):
+    """
+    Removal effect of every transient state, or of every group of transient states,
+    computed from a single factorisation.
+
+    Removing state j sends every transition into j to (null), which zeroes column j
+    of Q. That is a rank-one update of I - Q, so by Sherman-Morrison the conversion
+    probability from the start without j is x[0] - N[0, j] * x[j] / N[j, j], where
+    x are the conversion probabilities and N the fundamental matrix of the full
+    chain: N[0, j] / N[j, j] is the probability of ever visiting j, and x[j] the
+    probability of converting after it.
+
+    Removing a group of states S (all the states of a higher order chain that
+    contain a channel) is a rank |S| update, and by Woodbury the conversion without
+    S is x[0] - N[0, S] @ inv(N[S, S]) @ x[S].
+
+    Parameters
+    ----------
+    matrix : np.ndarray
+        Square matrix of transition counts or probabilities.
+    groups : list
+        List of arrays of transient states to be removed together. By default each
+        transient state is removed on its own.
+    dense_states : int
+        Sparse matrices with up to this number of transient states are solved as
+        dense ones, which is faster while they fit in memory.
+    Returns
+    -------
+    removal_effect : np.ndarray
+        1 - conversion without the state / conversion, for every transient state
+        (the start state included, as 0) or for every group.
+    """
+    matrix = normalize_rows(matrix)
+    if issparse(matrix) and matrix.shape[0] - 2 <= dense_states:
+        matrix = matrix.toarray()
+    if issparse(matrix):
+        if groups is None:
+            return _sparse_removal_effects(matrix)
+        return _sparse_group_removal_effects(matrix, groups)
+
+    fundamental = fundamental_matrix(matrix)
+    conversion = conversion_probabilities(matrix, fundamental)
+
+    if groups is not None:
+        conversion_removed = np.empty(len(groups))
+        for i, group in enumerate(groups):
+            group = np.asarray(group, dtype=np.int64)
+            conversion_removed[i] = conversion[0] - fundamental[0, group] @ (
+                np.linalg.solve(fundamental[np.ix_(group, group)], conversion[group])
+            )
+        if conversion[0] == 0:
+            return np.zeros(len(groups))
+        return 1 - (conversion_removed / conversion[0])
+
+    diagonal = np.diagonal(fundamental)
+    diagonal = np.where(diagonal == 0, 1, diagonal)
+    conversion_removed = conversion[0] - fundamental[0] * conversion / diagonal
+    conversion_removed[0] = conversion[0]
+
+    if conversion[0] == 0:
+        return np.zeros(len(conversion))
+    return 1 - (conversion_removed / conversion[0])
+
+
+def _sparse_removal_effects(matrix, block_size=256):
+    """
+    Same as removal_effects for a normalized scipy.sparse matrix, without ever
+    building a dense state x state matrix.
+
+    I - Q is factorised once with a sparse LU. The conversion probabilities and the
+    first row of the fundamental matrix come from one solve each, and its diagonal
+    from solves over blocks of identity columns that reuse the same factorisation.
+    """
+    sp = _import_sparse()
+    size = matrix.shape[0] - 2
+    transient = matrix[:size, :size]
+    system = (sp.identity(size, format="csc") - transient).tocsc()
+    try:
+        factor = sp.linalg.splu(system)
+    except RuntimeError as err:
+        if "singular" not in str(err).lower():
+            raise
+        warnings.warn(
+            "Warning... Singular matrix error. Check for lines or cols "
+            + "fully filled with zeros."
+        )
+        return removal_effects(matrix.toarray())
+
+    conversion = factor.solve(np.asarray(matrix[:size, -1].toarray()).ravel())
+    start = np.zeros(size)
+    start[0] = 1
+    first_row = factor.solve(start, trans="T")
+
+    # Only the states that are reachable from the start and can convert afterwards
+    # have a removal effect, the diagonal is not needed for the others
+    needed = np.flatnonzero(first_row * conversion)
+    diagonal = np.ones(size)
+    for block_start in range(0, len(needed), block_size):
+        states = needed[block_start : block_start + block_size]
+        identity = np.zeros((size, len(states)))
+        identity[states, np.arange(len(states))] = 1
+        diagonal[states] = factor.solve(identity)[states, np.arange(len(states))]
+
+    diagonal = np.where(diagonal == 0, 1, diagonal)
+    conversion_removed = conversion[0] - first_row * conversion / diagonal
+    conversion_removed[0] = conversion[0]
+
+    if conversion[0] == 0:
+        return np.zeros(size)
+    return 1 - (conversion_removed / conversion[0])
+
+
+def _sparse_group_removal_effects(matrix, groups):
+    """
+    Same as removal_effects with groups for a normalized scipy.sparse matrix. Each
+    group is removed by zeroing its columns of Q and factorising I - Q again.
+    """
+    sp = _import_sparse()
+    size = matrix.shape[0] - 2
+    transient = matrix[:size, :size]
+    absorption = np.asarray(matrix[:size, -1].toarray()).ravel()
+    identity = sp.identity(size, format="csc")
+
+    def conversion_from_start(system):
+        return sp.linalg.splu(system.tocsc()).solve(absorption)[0]
+
+    conversion = conversion_from_start(identity - transient)
+    if conversion == 0:
+        return np.zeros(len(groups))
+
+    results = np.empty(len(groups))
+    for i, group in enumerate(groups):
+        keep = np.ones(size)
+        keep[np.asarray(group, dtype=np.int64)] = 0
+        results[i] = conversion_from_start(identity - transient @ sp.diags(keep))
+    return 1 - (results / conversion)
+
+
+if __name__ == "__main__":
+    counts = np.asarray(
+        [
+            [0, 3, 2, 0, 0],
+            [0, 0, 1, 1, 2],
+            [0, 1, 0, 2, 1],
+            [0, 0, 0, 1, 0],
+            [0, 0, 0, 0, 1],
+        ],
+        dtype=float,
+    )
+    print(removal_effects(counts))
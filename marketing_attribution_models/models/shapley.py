@@ -0,0 +1,325 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Coalitions of the n players (channels) of a journey are represented as integer
+# bitmasks: bit i of the mask is set when the i-th channel of the journey is in the
+# coalition, so the 2 ** n coalitions are the integers 0 to 2 ** n - 1 and the
+# characteristic function v(S) is a dense array indexed by the mask.
+
+
+def coalition_masks(n):
+    """
+    Parameters
+    ----------
+    n : int
+        Number of players.
+    Returns
+    -------
+    tuple : (masks, members, sizes)
+        All the 2 ** n coalition masks, a boolean matrix with one row per mask and
+        one column per player indicating its members, and the size of each
+        coalition
+    """
+    masks = np.arange(2**n, dtype=np.int64)
+    members = ((masks[:, None] >> np.arange(n)) & 1).astype(bool)
+    return masks, members, members.sum(axis=1)
+
+
+def factorial_weights(n):
+    """
+    Parameters
+    ----------
+    n : int
+        Number of players.
+    Returns
+    -------
+    tuple : (weight_in, weight_out)
+        Shapley weights indexed by the coalition size s: (s - 1)! (n - s)! / n! for
+        the players in the coalition and s! (n - s - 1)! / n! for the players out
+        of it
+    """
+    factorial = np.asarray([math.factorial(i) for i in range(n + 1)], dtype=float)
+    sizes = np.arange(n + 1)
+    weight_in = np.zeros(n + 1)
+    weight_in[1:] = factorial[sizes[1:] - 1] * factorial[n - sizes[1:]]
+    weight_out = np.zeros(n + 1)
+    weight_out[:-1] = factorial[sizes[:-1]] * factorial[n - sizes[:-1] - 1]
+    return weight_in / factorial[n], weight_out / factorial[n]
+
+
+def shapley_values(values):
+    """
+    Exact Shapley values of every player from the characteristic function.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Characteristic function v(S) of the 2 ** n coalitions, indexed by mask.
+    Returns
+    -------
+    shapley : np.ndarray
+        Shapley value of each of the n players
+    """
+    values = np.asarray(values, dtype=float)
+    n = int(np.log2(len(values)))
+    _, members, sizes = coalition_masks(n)
+    weight_in, weight_out = factorial_weights(n)
+
+    # phi_i = sum over S with i of w_in(|S|) v(S) - sum over S without i of
+    # w_out(|S|) v(S)
+    return members.T @ (weight_in[sizes] * values) - (~members).T @ (
+        weight_out[sizes] * values
+    )
+
+
+class CharacteristicFunction:
+    """Memoised characteristic function v(S) shared by all the journeys.
+
+    It is built once from the value of every channel combination of the conversion
+    table, keyed by the bitmask of the channel codes of the combination (or by the
+    tuple of codes when the order of the channels matters), so the coalitions of
+    every journey are looked up in the same map instead of being merged with the
+    conversion table journey by journey. The Shapley values of each combination of
+    players are cached as well.
+
+    Parameters:
+    combinations =
+        Iterable with the channel codes of each combination;
+    values =
+        Iterable with the value of each combination;
+    order = False by default.
+        Boolean that indicates if the order of channels matters.
+    """
+
+    def __init__(self, combinations, values, order=False):
+        self.order = order
+        self._values = {
+            self.key(combination): float(value)
+            for combination, value in zip(combinations, values)
+        }
+        self._shapley = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def key(self, channels):
+        """Key of a coalition from the codes of its channels."""
+        if self.order:
+            return tuple(int(channel) for channel in channels)
+        mask = 0
+        for channel in channels:
+            mask |= 1 << int(channel)
+        return mask
+
+    def coalition_values(self, players):
+        """
+        Parameters
+        ----------
+        players : list
+            Channel codes of the players of a journey.
+        Returns
+        -------
+        values : np.ndarray
+            v(S) of the 2 ** n coalitions of the players, indexed by mask
+        """
+        players = [int(player) for player in players]
+        size = 2 ** len(players)
+        if self.order:
+            _, members, _ = coalition_masks(len(players))
+            keys = [
+                tuple(player for player, member in zip(players, row) if member)
+                for row in members
+            ]
+        else:
+            # The key of each mask is the key of the mask without its lowest bit
+            # plus the channel of that bit
+            keys = [0] * size
+            for mask in range(1, size):
+                lowest = mask & -mask
+                keys[mask] = keys[mask ^ lowest] | (
+                    1 << players[lowest.bit_length() - 1]
+                )
+        values = np.fromiter(
+            (self._values.get(key, 0.0) for key in keys), dtype=float, count=size
+        )
+        values[0] = 0
+        return values
+
+    def mask_values(self, players, masks):
+        """
+        Parameters
+        ----------
+        players : list
+            Channel codes of the players of a journey.
+        masks : np.ndarray
+            Coalition masks over the players, of any shape.
+        Returns
+        -------
+        values : np.ndarray
+            v(S) of each mask, with the same shape as masks
+        """
+        players = [int(player) for player in players]
+        unique, inverse = np.unique(masks, return_inverse=True)
+        if not self.order and max(players, default=0) < 63:
+            # Global keys of all the masks at once from the bits of the players
+            members = (unique[:, None] >> np.arange(len(players))) & 1
+            keys = (members * np.left_shift(1, players)).sum(axis=1).tolist()
+        else:
+            keys = [
+                self.key(
+                    [player for j, player in enumerate(players) if (mask >> j) & 1]
+                )
+                for mask in unique.tolist()
+            ]
+        values = np.fromiter(
+            (self._values.get(key, 0.0) for key in keys), dtype=float, count=len(keys)
+        )
+        values[unique == 0] = 0
+        return values[inverse].reshape(np.shape(masks))
+
+    def shapley(self, players):
+        """Shapley values of the players of a journey, cached by combination."""
+        players = tuple(int(player) for player in players)
+        if players not in self._shapley:
+            self._shapley[players] = shapley_values(self.coalition_values(players))
+        return self._shapley[players]
+
+
+def permutation_shapley(function, players, n_samples=1000, rng=None):
+    """
+    Shapley values estimated by sampling orderings of the players, in time linear
+    in the number of samples instead of exponential in the number of players.
+
+    Parameters
+    ----------
+    function : CharacteristicFunction
+        Characteristic function shared by the journeys.
+    players : list
+        Channel codes of the players of a journey, at most 62.
+    n_samples : int
+        Number of sampled orderings.
+    rng : np.random.Generator, int or None
+        Random generator or seed used to sample the orderings.
+    Returns
+    -------
+    tuple : (shapley, std_error)
+        Estimated Shapley value of each player and its standard error
+    """
+    n = len(players)
+    if n > 62:
+        # The coalitions are int64 bit masks over the players of the journey
+        raise ValueError(
+            "permutation_shapley supports at most 62 players per journey, "
+            "got {}".format(n)
+        )
+    rng = np.random.default_rng(rng)
+    orderings = rng.permuted(np.tile(np.arange(n), (n_samples, 1)), axis=1)
+
+    # Coalition of the first k players of each ordering, as a mask over the
+    # players of the journey, and the marginal contribution of the k-th player
+    prefixes = np.bitwise_or.accumulate(np.left_shift(1, orderings), axis=1)
+    values = function.mask_values(players, prefixes)
+    marginals = np.diff(values, axis=1, prepend=0)
+
+    contributions = np.zeros((n_samples, n))
+    np.put_along_axis(contributions, orderings, marginals, axis=1)
+    # A single player always gets the value of the whole journey, exactly
+    std_error = np.zeros(n)
+    if n_samples > 1 and n > 1:
+        std_error = contributions.std(axis=0, ddof=1) / np.sqrt(n_samples)
+    return contributions.mean(axis=0), std_error
+
+
+# Characteristic function of the worker processes, set once by _init_worker so it
+# is not pickled with every chunk of journeys
+_worker_function = None
+
+
+def _init_worker(function):
+    global _worker_function
+    _worker_function = function
+
+
+def _shapley_chunk(chunk, function=None):
+    function = _worker_function if function is None else function
+    players, method, n_samples, seeds = chunk
+    if method == "exact":
+        return [(function.shapley(journey), None) for journey in players]
+    return [
+        permutation_shapley(function, journey, n_samples, np.random.default_rng(seed))
+        for journey, seed in zip(players, seeds)
+    ]
+
+
+def journeys_shapley(
+    function, players, method="exact", n_samples=1000, random_state=None, n_jobs=1
+):
+    """
+    Shapley values of the players of every journey, optionally split across a
+    pool of processes.
+
+    Parameters
+    ----------
+    function : CharacteristicFunction
+        Characteristic function shared by the journeys.
+    players : list
+        Channel codes of the players of each journey.
+    method : str
+        "exact" or "permutation".
+    n_samples : int
+        Number of sampled orderings per journey with method="permutation".
+    random_state : int or None
+        Seed of the sampled orderings. Each journey gets its own stream spawned
+        from it, so the results do not depend on n_jobs.
+    n_jobs : int
+        Number of processes, -1 to use all the CPUs.
+    Returns
+    -------
+    tuple : (results, std_errors)
+        Shapley values of each journey and, with method="permutation", their
+        standard errors (None otherwise)
+    """
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    seeds = [None] * len(players)
+    if method == "permutation":
+        seeds = np.random.SeedSequence(random_state).spawn(len(players))
+
+    # Contiguous chunks, a few per process to balance the load, mapped in order
+    n_chunks = min(len(players), n_jobs * 4) if n_jobs > 1 else 1
+    bounds = np.linspace(0, len(players), n_chunks + 1).astype(int)
+    chunks = [
+        (players[start:end], method, n_samples, seeds[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(function,)
+        ) as executor:
+            outputs = [
+                output
+                for chunk in executor.map(_shapley_chunk, chunks)
+                for output in chunk
+            ]
+        if method == "exact":
+            # Keeping the values computed by the workers in the shared cache
+            for journey, (values, _) in zip(players, outputs):
+                function._shapley[tuple(int(player) for player in journey)] = values
+    else:
+        outputs = [
+            output for chunk in chunks for output in _shapley_chunk(chunk, function)
+        ]
+
+    results = [values for values, _ in outputs]
+    if method == "exact":
+        return results, None
+    return results, [std_error for _, std_error in outputs]
+
+
+if __name__ == "__main__":
+    # Organic Search > Facebook > Direct
+    print(shapley_values([0, 7, 6, 15, 4, 7, 9, 19]))
@@ -0,0 +1,271 @@
+import contextlib
+import copy
+import inspect
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .cache import model_key, record_model, replay_model
+from .data_prep.journey_store import JourneyStore
+from .data_prep.model_result import ModelResult
+
+# The journey arrays are copied once into shared memory blocks and the worker
+# processes map them instead of receiving a pickled copy with every model. A spec
+# with the names, dtypes and shapes of the blocks is all a task carries.
+
+
+def _share(blocks, array):
+    """Copies array into a new shared memory block appended to blocks and returns
+    its (name, dtype, shape)."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block.name, array.dtype.str, array.shape
+
+
+def share_journeys(mam):
+    """Copies the journeys of a MAM object to shared memory.
+
+    Returns a tuple (spec, blocks): the picklable description of the shared
+    arrays used by the workers and the SharedMemory blocks, to be closed and
+    unlinked by the caller once the workers are done.
+    """
+    blocks = []
+    journeys = mam._journeys
+    arrays = {
+        "codes": journeys.codes,
+        "offsets": journeys.offsets,
+        "journey_with_conv": np.asarray(mam.journey_with_conv, dtype=bool),
+        "conversion_value": np.asarray(mam.conversion_value, dtype=float),
+    }
+    if journeys.times is not None:
+        arrays["times"] = journeys.times
+    index = mam._index
+    if not isinstance(index, pd.RangeIndex) and index.dtype != object:
+        arrays["index"] = index.to_numpy()
+        index = None
+
+    try:
+        shared = {name: _share(blocks, array) for name, array in arrays.items()}
+    except BaseException:
+        release(blocks)
+        raise
+    spec = {
+        "arrays": shared,
+        "vocabulary": journeys.vocabulary,
+        "index": index,
+        "sep": mam.sep,
+    }
+    return spec, blocks
+
+
+def release(blocks):
+    """Closes and unlinks shared memory blocks."""
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+@contextlib.contextmanager
+def _shared(mam):
+    """Spec of the journeys of mam copied to shared memory, released on exit."""
+    spec, blocks = share_journeys(mam)
+    try:
+        yield spec
+    finally:
+        release(blocks)
+
+
+@contextlib.contextmanager
+def _pool(n_jobs, n_tasks, executor=None):
+    """executor, or a new ProcessPoolExecutor with n_jobs processes (at most
+    n_tasks) shut down on exit."""
+    if executor is not None:
+        yield executor
+        return
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(n_jobs, n_tasks)) as pool:
+        yield pool
+
+
+# Blocks and arrays the worker process attached from the last spec, so the models
+# of the same run reuse them. Only the read-only arrays are kept: every task builds
+# its own MAM object over them, as the models set attributes on it and the tasks of
+# a thread pool run at the same time.
+_worker_lock = threading.Lock()
+_worker_blocks = []
+_worker_spec = None
+_worker_arrays = None
+
+
+def _attach(spec):
+    """Arrays of the shared journeys of spec, attached once per worker."""
+    global _worker_blocks, _worker_spec, _worker_arrays
+    with _worker_lock:
+        if _worker_spec == spec["arrays"]:
+            return _worker_arrays
+
+        for block in _worker_blocks:
+            block.close()
+        _worker_blocks, arrays = [], {}
+        for name, (block_name, dtype, shape) in spec["arrays"].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            _worker_blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+
+        _worker_spec, _worker_arrays = spec["arrays"], arrays
+        return arrays
+
+
+def _journeys_mam(spec):
+    """New MAM object over the shared journeys of spec."""
+    from .MAM import MAM
+
+    arrays = _attach(spec)
+    index = spec["index"]
+    return MAM._from_journeys(
+        JourneyStore(
+            arrays["codes"], arrays["offsets"], spec["vocabulary"], arrays.get("times")
+        ),
+        arrays["journey_with_conv"],
+        arrays["conversion_value"],
+        pd.Index(arrays["index"]) if index is None else index,
+        path_separator=spec["sep"],
+    )
+
+
+def _model_results(entry):
+    """ModelResult objects of an entry recorded by record_model."""
+    values = [entry["result"], *entry["attributes"].values()]
+    return [value for value in values if isinstance(value, ModelResult)]
+
+
+def _run_model(spec, method_name, kwargs):
+    """Runs a MAM method on the shared journeys and returns its recorded
+    results.
+
+    The model results keep only their flat arrays: the journey offsets and index
+    are dropped, so they are not pickled back, and set again by the parent.
+    """
+    from .MAM import MAM
+
+    mam = _journeys_mam(spec)
+    method = inspect.unwrap(getattr(MAM, method_name))
+    entry = record_model(mam, method, kwargs=kwargs)
+    for result in _model_results(entry):
+        result.offsets = result.index = None
+    return entry
+
+
+def _restore_results(mam, entry):
+    """Sets the journey offsets and index of mam on the model results of an
+    entry returned by _run_model."""
+    for result in _model_results(entry):
+        result.offsets, result.index = mam._journeys.offsets, mam._index
+    return entry
+
+
+def run_models(mam, tasks, n_jobs=-1, executor=None):
+    """Runs independent MAM methods in a pool of processes.
+
+    The results of each method are registered on mam in the order of tasks, as
+    if the methods had run one after the other, so group_by_channels_models does
+    not depend on which worker finishes first. Methods with a result on the cache
+    of mam are not submitted.
+
+    Parameters:
+    mam =
+        MAM object with the journeys;
+    tasks =
+        List of tuples (method_name, kwargs);
+    n_jobs = -1 by default.
+        Number of processes of the pool, -1 to use all the CPUs;
+    executor = None by default.
+        concurrent.futures executor used instead of a new ProcessPoolExecutor.
+
+    Returns the list with the value returned by each method.
+    """
+    from .MAM import MAM
+
+    keys = [None] * len(tasks)
+    entries = [None] * len(tasks)
+    if mam._cache is not None:
+        for i, (method_name, kwargs) in enumerate(tasks):
+            method = inspect.unwrap(getattr(MAM, method_name))
+            keys[i] = model_key(mam, method, (), kwargs)
+            entries[i] = mam._cache.get(keys[i])
+    pending = [i for i, entry in enumerate(entries) if entry is None]
+
+    if pending:
+        with _pool(n_jobs, len(pending), executor) as pool, _shared(mam) as spec:
+            futures = {i: pool.submit(_run_model, spec, *tasks[i]) for i in pending}
+            for i, future in futures.items():
+                entries[i] = _restore_results(mam, future.result())
+        if mam._cache is not None:
+            for i in pending:
+                mam._cache.put(keys[i], entries[i])
+
+    if mam._cache is not None:
+        # The cache keeps its own copy of the entries
+        entries = [copy.deepcopy(entry) for entry in entries]
+    return [replay_model(mam, entry) for entry in entries]
+
+
+def segment_results(mam, start, end, tasks):
+    """Runs the MAM methods of tasks on the journeys start to end of mam and
+    returns their group_by_channels_models."""
+    segment = type(mam)._from_journeys(
+        mam._journeys.take(np.arange(start, end)),
+        mam.journey_with_conv.to_numpy()[start:end],
+        mam.conversion_value.to_numpy()[start:end],
+        path_separator=mam.sep,
+    )
+    for method_name, kwargs in tasks:
+        getattr(segment, method_name)(**kwargs)
+    return segment.group_by_channels_models
+
+
+def _run_segments(spec, bounds, tasks):
+    mam = _journeys_mam(spec)
+    return [segment_results(mam, start, end, tasks) for start, end in bounds]
+
+
+def run_segments(mam, bounds, tasks, n_jobs=1, executor=None):
+    """Runs independent MAM methods on contiguous segments of the journeys.
+
+    The journeys of mam are shared once with the pool of processes and each task
+    carries the bounds of a few segments, so a worker builds the segments from
+    the shared arrays instead of receiving them.
+
+    Parameters:
+    mam =
+        MAM object with the journeys sorted by segment;
+    bounds =
+        List of tuples (start, end) with the journeys of each segment;
+    tasks =
+        List of tuples (method_name, kwargs) run on every segment;
+    n_jobs = 1 by default.
+        Number of processes of the pool, -1 to use all the CPUs;
+    executor = None by default.
+        concurrent.futures executor used instead of a new ProcessPoolExecutor.
+
+    Returns the list with the group_by_channels_models of each segment.
+    """
+    if executor is None and n_jobs == 1:
+        return [segment_results(mam, start, end, tasks) for start, end in bounds]
+
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    # Contiguous chunks of segments, a few per process to balance the load
+    n_chunks = min(len(bounds), n_jobs * 4)
+    splits = np.linspace(0, len(bounds), n_chunks + 1).astype(int)
+    chunks = [bounds[start:end] for start, end in zip(splits[:-1], splits[1:])]
+    with _pool(n_jobs, len(chunks), executor) as pool, _shared(mam) as spec:
+        futures = [pool.submit(_run_segments, spec, chunk, tasks) for chunk in chunks]
+        return [frame for future in futures for frame in future.result()]
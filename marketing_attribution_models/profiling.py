@@ -0,0 +1,124 @@
+import contextlib
+import functools
+import time
+import tracemalloc
+
+import pandas as pd
+
+
+class StageProfiler:
+    """Records the wall time, CPU time, peak memory and row count of each stage of
+    the pipeline (ingestion, grouping, journey building, each model, aggregation
+    and serialisation).
+
+    Stages can be nested, as the models called by attribution_all_models, and are
+    recorded when they finish, with the name of the stage they ran in.
+
+    Parameters:
+    trace_memory = False by default.
+        Records the peak memory allocated by each stage with tracemalloc, which
+        slows down the stages;
+    logger = None by default.
+        logging.Logger where each finished stage is logged at INFO level;
+    callback = None by default.
+        Function called with the record of each finished stage.
+    """
+
+    def __init__(self, trace_memory=False, logger=None, callback=None):
+        self.trace_memory = trace_memory
+        self.logger = logger
+        self.callback = callback
+        self.records = []
+        self._open = []
+        self._started_tracing = False
+
+    def clear(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """Context manager recording a stage. It yields the record of the stage, a
+        dictionary where rows can be set once they are known."""
+        record = {
+            "stage": name,
+            "parent": self._open[-1]["stage"] if self._open else None,
+            "depth": len(self._open),
+            "rows": rows,
+        }
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for this stage, so the open ones keep theirs
+            for parent in self._open:
+                parent["_peak"] = max(parent["_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_start_memory"] = record["_peak"] = current
+
+        self._open.append(record)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - start_wall
+            record["cpu_time"] = time.process_time() - start_cpu
+            self._open.pop()
+            record["peak_memory_mb"] = None
+            if self.trace_memory:
+                peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                record["peak_memory_mb"] = (peak - record.pop("_start_memory")) / 2**20
+                if self._open:
+                    self._open[-1]["_peak"] = max(self._open[-1]["_peak"], peak)
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            self._finish(record)
+
+    def _finish(self, record):
+        self.records.append(record)
+        if self.logger is not None:
+            self.logger.info(
+                "%s: %.4fs wall, %.4fs cpu, peak %s MB, %s rows",
+                record["stage"],
+                record["wall_time"],
+                record["cpu_time"],
+                (
+                    "-"
+                    if record["peak_memory_mb"] is None
+                    else "{:.1f}".format(record["peak_memory_mb"])
+                ),
+                "-" if record["rows"] is None else record["rows"],
+            )
+        if self.callback is not None:
+            self.callback(record)
+
+    def to_frame(self):
+        """Pandas DataFrame with one row per recorded stage, in the order they
+        finished."""
+        return pd.DataFrame(
+            self.records,
+            columns=[
+                "stage",
+                "parent",
+                "depth",
+                "rows",
+                "wall_time",
+                "cpu_time",
+                "peak_memory_mb",
+            ],
+        )
+
+
+def profiled(method):
+    """Decorator of the MAM methods recording them as a stage, named after the
+    method, when the object has a profiler."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.stage(method.__name__, rows=len(self._journeys)):
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,34 @@
+def _import_plotting():
+    """matplotlib and seaborn are only needed to plot the results, so they are
+    imported when a plot is made instead of when the package is imported."""
+    try:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+    except ImportError as err:
+        raise ImportError(
+            "Plotting requires matplotlib and seaborn, install them with "
+            + "'pip install marketing_attribution_models[plot]'"
+        ) from err
+    return plt, sns
+
+
+def barplot(df_plot, *args, **kwargs):
+    """Barplot of the value of each channel by model from a melted DataFrame with
+    'channels', 'variable' and 'value' columns.
+
+    Returns the matplotlib Axes.
+    """
+    plt, sns = _import_plotting()
+
+    # Plot Parameters
+    ax, _ = plt.subplots(figsize=(20, 7))
+    ax = sns.barplot(
+        data=df_plot, hue="variable", y="value", x="channels", *args, **kwargs
+    )
+    plt.xticks(rotation=15)
+    ax.legend(loc="upper left", frameon=True, fancybox=True)
+    ax.axhline(0, color="black", linestyle="-", alpha=1, lw=2)
+    ax.grid(color="gray", linestyle=":", linewidth=1, axis="y")
+    ax.set_frame_on(False)
+
+    return ax
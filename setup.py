@@ -23,9 +23,12 @@ setup(
     install_requires=[
         "numpy",
         "pandas",
-        "matplotlib",
-        "seaborn",
     ],
+    extras_require={
+        "sparse": ["scipy"],
+        "parquet": ["pyarrow"],
+        "plot": ["matplotlib", "seaborn"],
+    },
     license="Apache License 2.0",
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,23 @@
+import pandas as pd
+from marketing_attribution_models.data_prep.channel_results import ChannelResults
+
+
+def test_channel_results():
+    """
+    Test function that will check if the results of each model are
+    aligned by channel, filled with 0 for the missing channels and
+    overwritten when a model runs again.
+    """
+
+    results = ChannelResults(["B", "A"], capacity=1)
+    results.set("first", pd.Series({"A": 1.0, "B": 2.0}))
+    results.set("second", pd.Series({"C": 3.0, "A": 4.0}))
+    results.set("first", pd.Series({"B": 5.0}))
+
+    frame = results.to_frame()
+    assert frame.columns.tolist() == ["channels", "first", "second"]
+    assert frame["channels"].tolist() == ["A", "B", "C"]
+    assert frame["first"].tolist() == [0.0, 5.0, 0.0]
+    assert frame["second"].tolist() == [4.0, 0.0, 3.0]
+
+    assert ChannelResults.from_frame(frame).to_frame().equals(frame)
@@ -1,6 +1,62 @@
+import numpy as np
+import pandas as pd
+from marketing_attribution_models import MAM
 from marketing_attribution_models.data import random_data
 
 
 def test_random_df():
     df = random_data.data_frame(user_id=300, k=50000, conv_rate=0.4)
     assert df.shape == (50000, 4)
+
+
+def test_random_df_columns():
+    df = random_data.data_frame(user_id=300, k=50000, conv_rate=0.4, seed=0)
+    assert df["user_id"].between(0, 299).all()
+    assert df["user_id"].nunique() == 300
+    assert df["visitStartTime"].nunique() > 300
+    assert df.equals(random_data.data_frame(user_id=300, k=50000, seed=0))
+
+
+def test_journey_generator_chunks():
+    """
+    Test function that will check if the generator is reproducible
+    and if its sessions group into the same journeys it generates.
+    """
+
+    generator = random_data.JourneyGenerator(n_channels=5, seed=3)
+    journeys = pd.concat(generator.journey_chunks(500, chunk_size=200))
+    assert journeys["user_id"].tolist() == list(range(500))
+    assert journeys.equals(pd.concat(generator.journey_chunks(500, chunk_size=200)))
+
+    sessions = pd.concat(generator.session_chunks(500, chunk_size=200))
+    att = MAM(
+        sessions,
+        channels_colname="channels",
+        journey_with_conv_colname="has_transaction",
+        group_channels=True,
+        group_channels_by_id_list=["user_id"],
+        group_timestamp_colname="visitStartTime",
+    )
+    assert att.data_frame["channels_agg"].tolist() == journeys["channels"].tolist()
+    assert (
+        att.data_frame["converted_agg"].tolist() == journeys["has_transaction"].tolist()
+    )
+
+
+def test_journey_generator_ground_truth():
+    """
+    Test function that will check if the removal effects of the
+    ground truth follow the channel effects.
+    """
+
+    generator = random_data.JourneyGenerator(
+        n_channels=3, base_rate=0, channel_effects=[0, 0.5, 0.99], seed=0
+    )
+    truth = generator.ground_truth(1000, chunk_size=300)
+    assert truth.loc["channel_0", "removal_effect"] == 0
+    assert truth.loc["channel_2", "removal_effect"] > 0.5
+    assert np.isclose(truth["attribution_share"].sum(), 1)
+
+    journeys = pd.concat(generator.journey_chunks(1000, chunk_size=300))
+    converted = journeys["has_transaction"]
+    assert not converted[journeys["channels"].str.fullmatch("(channel_0( > )?)+")].any()
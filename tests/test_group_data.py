@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from marketing_attribution_models.data_prep import group_data
+
+
+def test_group_journeys():
+    """
+    Test function that will check if the rows are grouped by id in
+    timestamp order, with the hours till the last touchpoint of each
+    journey.
+    """
+
+    df = pd.DataFrame(
+        {
+            "id": ["B", "A", "B", "A", "B"],
+            "date": [
+                "2020-10-03 00:00",
+                "2020-10-02 00:00",
+                "2020-10-01 00:00",
+                "2020-10-01 00:00",
+                "2020-10-01 12:00",
+            ],
+            "channel": ["x", "y", "z", "x", "y"],
+        }
+    )
+    keys, journeys = group_data.group_journeys(
+        df, "channel", "date", ["id"], print_log=False
+    )
+
+    assert keys["id"].tolist() == ["A", "B"]
+    assert journeys.channel_lists() == [["x", "y"], ["z", "y", "x"]]
+    assert journeys.time_lists() == [[24.0, 0.0], [48.0, 36.0, 0.0]]
+
+    grouped = group_data.group_channels(df, "channel", "date", ["id"], False)
+    assert grouped["channel"].tolist() == journeys.channel_lists()
+
+
+def test_group_journeys_null_channel():
+    """
+    Test function that will check if a touchpoint without channel is
+    rejected instead of being given another channel.
+    """
+
+    df = pd.DataFrame(
+        {
+            "id": ["A", "A", "B"],
+            "date": ["2020-10-01", "2020-10-02", "2020-10-01"],
+            "channel": ["x", None, "y"],
+        }
+    )
+    with pytest.raises(ValueError):
+        group_data.group_journeys(df, "channel", "date", ["id"], print_log=False)
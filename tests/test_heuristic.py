@@ -0,0 +1,100 @@
+import numpy as np
+from marketing_attribution_models.models import heuristic
+
+#####################
+## Setup Variables ##
+#####################
+
+JOURNEYS = [["x", "y", "z"], ["x", "y", "z", "y", "z"], ["z"], ["z", "x"]]
+TIMES = [[1680, 168, 0], [504, 336, 168, 168, 0], [0], [168, 0]]
+OFFSETS = np.cumsum([0] + [len(journey) for journey in JOURNEYS])
+FLAT_CHANNELS = np.asarray(sum(JOURNEYS, []))
+FLAT_TIMES = np.asarray(sum(TIMES, []))
+
+
+###########
+## Tests ##
+###########
+
+
+def test_batch_matches_journey_functions():
+    """
+    Test function that will check if the batched heuristics over
+    flat arrays give the same weights as the per journey functions.
+    """
+
+    pairs = [
+        (heuristic.last_click, heuristic.last_click_batch(OFFSETS)),
+        (heuristic.first_click, heuristic.first_click_batch(OFFSETS)),
+        (heuristic.linear, heuristic.linear_batch(OFFSETS)),
+        (heuristic.position_based, heuristic.position_based_batch(OFFSETS)),
+        (heuristic.position_decay, heuristic.position_decay_batch(OFFSETS)),
+        (
+            lambda x: heuristic.last_click_non(x, "z"),
+            heuristic.last_click_non_batch(FLAT_CHANNELS, OFFSETS, "z"),
+        ),
+    ]
+    for function, batch in pairs:
+        expected = np.concatenate([function(journey) for journey in JOURNEYS])
+        assert np.allclose(expected, batch)
+
+    expected = np.concatenate([heuristic.time_decay(times) for times in TIMES])
+    assert np.allclose(expected, heuristic.time_decay_batch(FLAT_TIMES, OFFSETS))
+
+
+def test_batch_value_per_journey():
+    """
+    Test function that will check if one value per journey is
+    distributed only among its own touchpoints.
+    """
+
+    values = np.asarray([1.0, 2.0, 3.0, 0.0])
+    weights = heuristic.time_decay_batch(FLAT_TIMES, OFFSETS, value=values)
+    assert np.allclose(np.add.reduceat(weights, OFFSETS[:-1]), values)
+
+
+def test_sweep_matches_batch():
+    """
+    Test function that will check if every setting of a sweep gives
+    the same weights as the batched model with that setting.
+    """
+
+    decays = [0.5, 0.2, 0.9]
+    frequencies = [1, 168, 500]
+    weights = heuristic.time_decay_sweep(FLAT_TIMES, OFFSETS, decays, frequencies)
+    for row, decay, frequency in zip(weights, decays, frequencies):
+        expected = heuristic.time_decay_batch(FLAT_TIMES, OFFSETS, decay, frequency)
+        assert np.allclose(row, expected)
+
+    distributions = [[0.4, 0.2, 0.4], [0.1, 0.3, 0.6]]
+    weights = heuristic.position_based_sweep(OFFSETS, distributions)
+    for row, distribution in zip(weights, distributions):
+        expected = heuristic.position_based_batch(OFFSETS, distribution)
+        assert np.allclose(row, expected)
+
+
+def test_all_heuristics_matches_batch():
+    """
+    Test function that will check if computing every heuristic at once
+    gives the same weights as each batched model.
+    """
+
+    values = np.asarray([1.0, 2.0, 3.0, 0.0])
+    weights = heuristic.all_heuristics_batch(
+        FLAT_CHANNELS, FLAT_TIMES, OFFSETS, "z", [0.3, 0.3, 0.4], 0.6, 100, values
+    )
+    expected = {
+        "last_click": heuristic.last_click_batch(OFFSETS, values),
+        "last_click_non": heuristic.last_click_non_batch(
+            FLAT_CHANNELS, OFFSETS, "z", values
+        ),
+        "first_click": heuristic.first_click_batch(OFFSETS, values),
+        "linear": heuristic.linear_batch(OFFSETS, values),
+        "position_based": heuristic.position_based_batch(
+            OFFSETS, [0.3, 0.3, 0.4], values
+        ),
+        "time_decay": heuristic.time_decay_batch(FLAT_TIMES, OFFSETS, 0.6, 100, values),
+    }
+    assert list(weights) == list(expected)
+    for model, batch in expected.items():
+        assert np.allclose(weights[model], batch)
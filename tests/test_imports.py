@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules only needed by optional features, that importing the package must not
+# load so worker processes start with just NumPy and pandas (pyarrow is left out
+# since pandas may import it by itself)
+OPTIONAL_MODULES = ["matplotlib", "seaborn", "scipy"]
+
+
+def test_import_does_not_load_optional_modules():
+    """
+    Test function that will check if importing the package in a new
+    interpreter leaves the plotting stack and the other optional
+    dependencies unimported.
+    """
+
+    code = (
+        "import sys, marketing_attribution_models; "
+        + "print(' '.join(name for name in %r if name in sys.modules))"
+        % OPTIONAL_MODULES
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert output.stdout.split() == []
+
+
+def test_plot():
+    """
+    Test function that will check if the plotting stack is loaded
+    when a plot is made.
+    """
+
+    pytest.importorskip("seaborn")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from marketing_attribution_models import MAM
+    import pandas as pd
+
+    att = MAM(
+        pd.DataFrame({"channels": ["A > B", "B", "C > A"]}), channels_colname="channels"
+    )
+    att.attribution_linear()
+    assert att.plot() is not None
@@ -0,0 +1,33 @@
+import pandas as pd
+from marketing_attribution_models.data_prep import journey
+
+
+def test_journey_id_based_on_conversion():
+    """
+    Test function that will check if a new journey starts after each
+    conversion and after each gap longer than the break window.
+    """
+
+    df = pd.DataFrame(
+        {
+            "id": ["A", "A", "A", "A", "B", "B"],
+            "date": pd.to_datetime(
+                [
+                    "2020-10-01",
+                    "2020-10-02",
+                    "2020-10-03",
+                    "2020-11-01",
+                    "2020-10-01",
+                    "2020-10-20",
+                ]
+            ),
+            "converted": [False, True, False, True, False, False],
+        }
+    )
+    df = journey.journey_id_based_on_conversion(
+        df, ["id"], "converted", "date", break_window=7, as_string=False
+    )
+    assert df["journey_id"].tolist() == [0, 0, 1, 2, 0, 1]
+
+    df["journey_id"] = journey.journey_id_to_string(df["id"], df["journey_id"])
+    assert df["journey_id"].iloc[3] == "id:A_J:2"
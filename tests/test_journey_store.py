@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from marketing_attribution_models.data_prep.journey_store import JourneyStore
+
+
+def test_from_strings_matches_from_lists():
+    """
+    Test function that will check if building the store from
+    separator joined strings gives the same ragged arrays as
+    building it from lists.
+    """
+
+    channels = pd.Series(["A > B > C", "B", "C > A"])
+    times = pd.Series(["48 > 24 > 0", "0", "24 > 0"])
+    from_strings = JourneyStore.from_strings(channels, " > ", times)
+    from_lists = JourneyStore.from_lists(
+        [["A", "B", "C"], ["B"], ["C", "A"]], [[48, 24, 0], [0], [24, 0]]
+    )
+
+    assert list(from_strings.vocabulary) == ["A", "B", "C"]
+    assert from_strings.offsets.tolist() == [0, 3, 4, 6]
+    assert from_strings.codes.tolist() == from_lists.codes.tolist()
+    assert from_strings.times.tolist() == from_lists.times.tolist()
+    assert from_strings.channel_lists() == [["A", "B", "C"], ["B"], ["C", "A"]]
+
+
+def test_channel_totals():
+    """
+    Test function that will check if the values are summed by
+    channel, either per touchpoint or per journey position.
+    """
+
+    store = JourneyStore.from_lists([["A", "B"], ["B", "B", "C"]])
+    totals = store.channel_totals(np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+    assert totals.to_dict() == {"A": 1.0, "B": 9.0, "C": 5.0}
+
+    totals = store.channel_totals(np.array([10.0, 20.0]), positions=store.ends)
+    assert totals.to_dict() == {"A": 0.0, "B": 10.0, "C": 20.0}
+
+
+def test_take():
+    """
+    Test function that will check if selecting journeys keeps their
+    touchpoints and only the channels they contain.
+    """
+
+    store = JourneyStore.from_lists(
+        [["A", "B"], ["C"], ["B", "B", "A"]], [[1, 0], [0], [2, 1, 0]]
+    )
+    taken = store.take([2, 0])
+    assert taken.channel_lists() == [["B", "B", "A"], ["A", "B"]]
+    assert taken.times.tolist() == [2, 1, 0, 1, 0]
+    assert list(taken.vocabulary) == ["A", "B"]
+
+
+def test_codes():
+    """
+    Test function that will check if the channels are stored as compact integer
+    codes and can be looked up by name.
+    """
+
+    store = JourneyStore.from_lists([["A", "B"], ["C"]])
+    assert store.codes.dtype == np.uint16
+    assert store.code_of("C") == 2
+    assert store.code_of("D") == -1
@@ -1,7 +1,11 @@
-import pandas as pd
-from marketing_attribution_models import MAM
-
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import pandas as pd
+import pytest
+from marketing_attribution_models import MAM, parallel
+from marketing_attribution_models.profiling import StageProfiler
 
 #####################
 ## Setup Variables ##
@@ -179,6 +183,497 @@ def test_att_position_based():
     )
 
 
+def test_from_chunks():
+    """
+    Test function that will check if reading the sessions in chunks
+    gives the same journeys as grouping the whole DataFrame.
+    """
+
+    df = pd.DataFrame(
+        {
+            "user": [1, 1, 1, 2, 2, 3, 3, 3, 3, 4],
+            "time": pd.date_range("2020-10-01", periods=10, freq="D"),
+            "channel": ["A", "B", "A", "C", "A", "B", "B", "C", "A", "D"],
+            "converted": [0, 1, 0, 0, 1, 0, 1, 0, 1, 0],
+        }
+    )
+    kwargs = dict(
+        channels_colname="channel",
+        group_channels_by_id_list=["user"],
+        group_timestamp_colname="time",
+        journey_with_conv_colname="converted",
+        create_journey_id_based_on_conversion=True,
+    )
+    expected = MAM(df, group_channels=True, **kwargs)
+    chunked = MAM.from_chunks((df[i : i + 4] for i in range(0, 10, 4)), **kwargs)
+
+    assert chunked.channels.tolist() == expected.channels.tolist()
+    assert chunked.time_till_conv.tolist() == expected.time_till_conv.tolist()
+    assert chunked.journey_id.equals(expected.journey_id)
+    assert chunked.journey_with_conv.tolist() == expected.journey_with_conv.tolist()
+
+
+def test_journey_id_order():
+    """
+    Test function that will check if the journeys built from the
+    conversions of each id are sorted by id and journey number.
+    """
+
+    df = pd.DataFrame(
+        {
+            "user": ["b"] * 12 + ["a"],
+            "time": pd.date_range("2021-01-01", periods=13, freq="D"),
+            "channel": ["Google", "Facebook"] * 6 + ["Email"],
+            "converted": True,
+        }
+    )
+    att = MAM(
+        df,
+        group_channels=True,
+        channels_colname="channel",
+        group_channels_by_id_list=["user"],
+        group_timestamp_colname="time",
+        journey_with_conv_colname="converted",
+        create_journey_id_based_on_conversion=True,
+    )
+    journey_id = att.journey_id["journey_id"].tolist()
+    assert journey_id[0].startswith("id:a_")
+    numbers = [int(value.split("_J:")[1]) for value in journey_id[1:]]
+    assert numbers == sorted(numbers)
+    assert journey_id[1:] != sorted(journey_id[1:])
+    assert att.channels.tolist()[1:] == [["Google"], ["Facebook"]] * 6
+
+
+def test_parquet_round_trip(tmp_path):
+    """
+    Test function that will check if the journeys and the touchpoint
+    results written to parquet are read back as the same journeys.
+    """
+
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "journeys.parquet")
+    ATT.to_parquet(path, models=["attribution_linear_heuristic"])
+    att = MAM.read_parquet(
+        path,
+        time_till_conv_colname="time_till_conv",
+        conversion_value="conversion_value",
+        batch_size=4,
+    )
+
+    assert att.channels.tolist() == ATT.channels.tolist()
+    assert att.time_till_conv.tolist() == ATT.time_till_conv.tolist()
+    assert att.conversion_value.tolist() == ATT.conversion_value.tolist()
+
+    results = pd.read_parquet(path)["attribution_linear_heuristic"]
+    assert [list(x) for x in results] == ATT.attribution_linear()[0].tolist()
+
+
+def test_parquet_null_channel(tmp_path):
+    """
+    Test function that will check if a journey with a null channel is
+    rejected instead of being given another channel.
+    """
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    path = str(tmp_path / "journeys.parquet")
+    pyarrow.parquet.write_table(pa.table({"channels": [["A", "B"], ["B", None]]}), path)
+    with pytest.raises(ValueError):
+        MAM.read_parquet(path)
+
+
+def test_result_cache(tmp_path):
+    """
+    Test function that will check if a cached model is not computed
+    again and registers the same results on another object with the
+    same journeys.
+    """
+
+    first = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    cache = first.enable_cache(directory=str(tmp_path))
+    first.attribution_linear()
+    first.attribution_markov()
+    assert len(cache) == 2
+
+    second = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    second.enable_cache(directory=str(tmp_path))
+    second.attribution_markov()
+    second.attribution_linear()
+    assert len(list(tmp_path.iterdir())) == 2
+    pd.testing.assert_frame_equal(
+        first.group_by_channels_models,
+        second.group_by_channels_models[first.group_by_channels_models.columns],
+    )
+    assert (
+        second.data_frame["attribution_linear_heuristic"]
+        == first.data_frame["attribution_linear_heuristic"]
+    ).all()
+
+    second.attribution_linear(group_by_channels_models=False)
+    assert len(list(tmp_path.iterdir())) == 3
+
+    # Only the files of the cache entries are removed
+    (tmp_path / "other.pkl").write_bytes(b"")
+    cache.clear()
+    assert [path.name for path in tmp_path.iterdir()] == ["other.pkl"]
+
+
+def test_fingerprint():
+    """
+    Test function that will check if the hash of the journeys changes
+    when the conversions or the journeys are replaced or edited in
+    place.
+    """
+
+    att = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    first = att._fingerprint()
+    assert att._fingerprint() == first
+
+    att.conversion_value = att.conversion_value * 2
+    second = att._fingerprint()
+    assert second != first
+
+    att.channels = att.channels.apply(lambda channels: channels[::-1])
+    third = att._fingerprint()
+    assert third != second
+
+    att.conversion_value.iloc[0] += 1
+    fourth = att._fingerprint()
+    assert fourth != third
+
+    att.journey_with_conv.iloc[0] = not att.journey_with_conv.iloc[0]
+    assert att._fingerprint() != fourth
+
+
+def test_attribution_heuristics():
+    """
+    Test function that will check if running the heuristic models in a
+    single pass gives the same results as calling each one of them.
+    """
+
+    frame = pd.DataFrame(
+        {
+            "channels": ["A > B > C", "B > A", "C", "A > B > A > C"],
+            "time_till_conv": ["300 > 150 > 0", "20 > 0", "0", "400 > 300 > 100 > 0"],
+            "conversion_value": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    kwargs = dict(
+        channels_colname="channels",
+        time_till_conv_colname="time_till_conv",
+        conversion_value="conversion_value",
+    )
+    fused = MAM(frame, **kwargs)
+    fused.attribution_heuristics(
+        last_click_non_but_not_this_channel="A",
+        list_positions_first_middle_last=[0.3, 0.3, 0.4],
+        time_decay_decay_over_time=0.6,
+        time_decay_frequency=100,
+    )
+
+    single = MAM(frame, **kwargs)
+    single.attribution_last_click()
+    single.attribution_last_click_non("A")
+    single.attribution_first_click()
+    single.attribution_linear()
+    single.attribution_position_based([0.3, 0.3, 0.4])
+    single.attribution_time_decay(decay_over_time=0.6, frequency=100)
+
+    pd.testing.assert_frame_equal(
+        fused.group_by_channels_models, single.group_by_channels_models
+    )
+    pd.testing.assert_frame_equal(fused.as_pd_dataframe(), single.as_pd_dataframe())
+
+
+def test_markov_transition_matrix():
+    """
+    Test function that will check if the labelled transition matrix of
+    the Markov model is only built when it is accessed.
+    """
+
+    att = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    result = att.attribution_markov()
+    assert not result.results[1]._built
+
+    matrix = result[2]
+    assert list(matrix.index) == list(matrix.columns)
+    assert matrix.index[0] == "(inicio)" and matrix.index[-1] == "(conversion)"
+    assert np.allclose(matrix.sum(axis=1)[:-2], 1)
+    assert result[2] is matrix
+
+
+def test_attribution_sweep():
+    """
+    Test function that will check if each row of a sweep has the same
+    channel values as running the model with that setting.
+    """
+
+    frame = pd.DataFrame(
+        {
+            "channels": ["A > B > C", "B > A", "C", "A > B > A > C"],
+            "time_till_conv": ["300 > 150 > 0", "20 > 0", "0", "400 > 300 > 100 > 0"],
+        }
+    )
+
+    def new_mam():
+        return MAM(
+            frame, channels_colname="channels", time_till_conv_colname="time_till_conv"
+        )
+
+    att = new_mam()
+    sweep = att.attribution_sweep(
+        "time_decay", {"decay_over_time": [0.5, 0.8], "frequency": [24, 168]}
+    )
+    for (decay_over_time, frequency), row in sweep.iterrows():
+        values = new_mam().attribution_time_decay(decay_over_time, frequency)[1]
+        assert np.allclose(row[values.index], values)
+
+    distributions = [[0.4, 0.2, 0.4], [0.1, 0.3, 0.6]]
+    sweep = att.attribution_sweep(
+        "position_based", {"list_positions_first_middle_last": distributions}
+    )
+    for distribution, (_, row) in zip(distributions, sweep.iterrows()):
+        values = new_mam().attribution_position_based(distribution)[1]
+        assert np.allclose(row[values.index], values)
+
+    with pytest.raises(ValueError):
+        att.attribution_sweep("time_decay", {"decay_over_time": []})
+
+
+def test_lazy_results():
+    """
+    Test function that will check if the journey values and the
+    data_frame columns are only built when they are asked for, and
+    rebuilt after the data_frame is reset.
+    """
+
+    att = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    result = att.attribution_last_click()
+    assert result._journey_values is None
+    assert att._pending_results == ["attribution_last_click_heuristic"]
+
+    first, frame = result
+    assert first.tolist() == att.last_click_journeys().tolist()
+    assert len(result) == 2 and result[1] is frame
+
+    data_frame = att.data_frame
+    assert "attribution_last_click_heuristic" in data_frame
+    assert att._pending_results == []
+
+    att.attribution_first_click()
+    assert att._pending_results == ["attribution_first_click_heuristic"]
+    assert att.data_frame is data_frame
+    assert "attribution_first_click_heuristic" in data_frame
+    assert att._pending_results == []
+
+    att.data_frame = None
+    assert att._pending_results == []
+    rebuilt = att.data_frame
+    assert rebuilt is not data_frame
+    pd.testing.assert_frame_equal(rebuilt, data_frame)
+
+
+def test_shapley_after_conversions_change():
+    """
+    Test function that will check if the Shapley values follow new
+    conversions set on the object instead of the ones of a previous call.
+    """
+
+    frame = pd.DataFrame(
+        {
+            "channels": ["A > B", "A", "B > C", "C"],
+            "has_transaction": [True, True, False, True],
+            "conversion_value": [1.0, 1.0, 1.0, 1.0],
+        }
+    )
+    kwargs = dict(
+        channels_colname="channels",
+        journey_with_conv_colname="has_transaction",
+        conversion_value="conversion_value",
+    )
+    att = MAM(frame, **kwargs)
+    att.attribution_shapley(size=3)
+
+    frame["has_transaction"] = [True, False, True, False]
+    frame["conversion_value"] = [1.0, 0.0, 2.0, 0.0]
+    att.journey_with_conv = frame["has_transaction"]
+    att.conversion_value = frame["conversion_value"]
+    att.attribution_shapley(size=3)
+
+    expected = MAM(frame, **kwargs)
+    expected.attribution_shapley(size=3)
+    pd.testing.assert_frame_equal(
+        att.group_by_channels_models, expected.group_by_channels_models
+    )
+
+
+def test_all_models_parallel():
+    """
+    Test function that will check if running the models in a pool of
+    processes gives the same results, in the same order, as running
+    them one after the other.
+    """
+
+    serial = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    parallel = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    expected = serial.attribution_all_models(fused_heuristics=False)
+    result = parallel.attribution_all_models(fused_heuristics=False, n_jobs=2)
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(parallel.data_frame, serial.data_frame)
+
+
+def test_run_models_results():
+    """
+    Test function that will check if the workers send back only the
+    flat model results and the journey values are rebuilt on the
+    parent object.
+    """
+
+    att = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    with parallel._shared(att) as spec:
+        entry = parallel._run_model(spec, "attribution_linear", {})
+    assert entry["result"].offsets is None
+    assert entry["attributes"]["_linear"] is entry["result"]
+
+    linear, markov = parallel.run_models(
+        att, [("attribution_linear", {}), ("attribution_markov", {})], n_jobs=2
+    )
+    serial = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    assert linear[0].tolist() == serial.attribution_linear()[0].tolist()
+    assert att.linear_journeys().tolist() == linear[0].tolist()
+    assert markov[0].tolist() == serial.attribution_markov()[0].tolist()
+
+
+def test_run_models_threads():
+    """
+    Test function that will check if the models run in a thread pool
+    give the same results as running them one after the other.
+    """
+
+    att = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    with ThreadPoolExecutor(4) as executor:
+        frame = att.attribution_all_models(fused_heuristics=False, executor=executor)
+    serial = MAM(
+        DF_AGG, conversion_value="conversion_value", channels_colname="channels_agg"
+    )
+    expected = serial.attribution_all_models(fused_heuristics=False)
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_attribution_by_segment():
+    """
+    Test function that will check if the results of each segment are
+    the same as running the models on a MAM object with only the
+    journeys of that segment.
+    """
+
+    df = DF_AGG.assign(segment=["x", "y", "x", "y", "x", "y", "x", "x", "y"])
+    att = MAM(
+        df,
+        conversion_value="conversion_value",
+        channels_colname="channels_agg",
+        group_channels_by_id_list=["segment"],
+    )
+    models = ["attribution_linear", ("attribution_markov", {})]
+    result = att.attribution_by_segment("segment", models=models)
+    assert result.index.names == ["segment", "channels"]
+    assert result.equals(att.attribution_by_segment("segment", models, n_jobs=2))
+
+    for segment in ["x", "y"]:
+        expected = MAM(
+            df[df["segment"] == segment].reset_index(drop=True),
+            conversion_value="conversion_value",
+            channels_colname="channels_agg",
+        )
+        expected.attribution_linear()
+        expected.attribution_markov()
+        pd.testing.assert_frame_equal(
+            result.loc[segment],
+            expected.group_by_channels_models.set_index("channels"),
+        )
+
+    for models in [
+        ["attribution_sweep"],
+        ["attribution_all_models"],
+        [("attribution_linear", {"group_by_channels_models": False})],
+    ]:
+        with pytest.raises(ValueError):
+            att.attribution_by_segment("segment", models=models)
+
+
+def test_profiling(caplog):
+    """
+    Test function that will check if the stages of the creation of
+    the object and of the models are recorded, nested and logged.
+    """
+
+    logger = logging.getLogger("marketing_attribution_models.test")
+    profiler = StageProfiler(trace_memory=True, logger=logger)
+    att = MAM(
+        DF_AGG,
+        conversion_value="conversion_value",
+        channels_colname="channels_agg",
+        profiler=profiler,
+    )
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        att.attribution_all_models(model_type="heuristic")
+
+    profile = att.profile
+    assert profile["stage"].tolist() == [
+        "journey_building",
+        "conversions",
+        "group_by_results_function",
+        "attribution_heuristics",
+        "attribution_all_models",
+    ]
+    assert profile["parent"].tolist()[2] == "attribution_heuristics"
+    assert profile["parent"].tolist()[3] == "attribution_all_models"
+    assert (profile["rows"] == 9).all()
+    assert (profile["wall_time"] > 0).all()
+    assert (profile["peak_memory_mb"] >= 0).all()
+    # A stage includes the peak of the stages it ran
+    peaks = profile.set_index("stage")["peak_memory_mb"]
+    assert peaks["attribution_all_models"] >= peaks["attribution_heuristics"]
+    assert "attribution_heuristics" in caplog.text
+
+    # The aggregation by channel of the Markov and Shapley models is recorded
+    profiler.clear()
+    att.attribution_markov()
+    att.attribution_shapley()
+    profile = att.profile
+    assert profile["stage"].tolist()[-2:] == [
+        "group_by_results_function",
+        "attribution_shapley",
+    ]
+    stages = profile.loc[profile["stage"] == "group_by_results_function"]
+    assert stages["parent"].tolist() == ["attribution_markov", "attribution_shapley"]
+
+    att.disable_profiling()
+    att.attribution_linear()
+    assert att.profile is None
+
+
 print(DF_JOURNEY)
 # def test_att_time():
 #     colname = 'attribution_time_decay0.5_freq1_heuristic'
@@ -190,3 +685,57 @@ print(DF_JOURNEY)
 
 # def test_att_shapley():
 #     colname = 'attribution_time_decay0.5_freq1_heuristic'
+
+
+def test_journey_conversion_table():
+    """
+    Test function that will check if the channel combinations keep the
+    distinct channels of each journey, sorted or in order of appearance.
+    """
+
+    table = ATT.journey_conversion_table()
+    assert table["combinations"].tolist() == [
+        "A",
+        "A > B",
+        "A > B > C",
+        "A > C",
+        "B",
+        "C",
+    ]
+    assert table["total_sequences"].tolist() == [1, 2, 3, 1, 1, 1]
+
+    table = ATT.journey_conversion_table(order=True, size=2)
+    assert table["combinations"].tolist() == [
+        "A",
+        "A > B",
+        "B",
+        "B > A",
+        "B > C",
+        "C",
+        "C > A",
+    ]
+    assert table["total_sequences"].tolist() == [1, 1, 1, 2, 1, 1, 2]
+    assert table["conversion_value"].sum() == CONV_VALUE * 9
+
+
+def test_time_based_overwrite():
+    """
+    Test function that will check if a channel is replaced by the previous
+    one of its journey when it happens within the time window.
+    """
+
+    att = MAM(
+        pd.DataFrame(
+            {
+                "channels": ["A > Direct > Direct", "Direct > B"],
+                "time_till_conv": ["30 > 20 > 1", "5 > 0"],
+            }
+        ),
+        channels_colname="channels",
+        time_till_conv_colname="time_till_conv",
+    )
+    overwritten = att.channels_journey_time_based_overwrite(time_window=24, order=2)
+    assert overwritten.tolist() == [["A", "A", "A"], ["Direct", "B"]]
+
+    att.channels_journey_time_based_overwrite(time_window=24, inplace=True)
+    assert att.channels.tolist() == [["A", "A", "Direct"], ["Direct", "B"]]
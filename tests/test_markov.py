@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from marketing_attribution_models.models import markov
+
+
+def conversion_without(matrix, state):
+    """Conversion probability from the start after sending every
+    transition into state to (null)."""
+    matrix = matrix.copy()
+    matrix[:, -2] = matrix[:, -2] + matrix[:, state]
+    matrix[:, state] = 0
+    matrix = markov.normalize_rows(matrix)
+    return markov.conversion_probabilities(matrix)[0]
+
+
+def test_removal_effects_match_explicit_removal():
+    """
+    Test function that will check if the removal effects computed
+    from a single factorisation match removing each channel and
+    solving the chain again.
+    """
+
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 5, (12, 12)).astype(float)
+    counts[:, 0] = 0
+    counts[-2:] = 0
+    counts[-1, -1] = 1
+    counts[-2, -2] = 1
+
+    conversion = markov.conversion_probabilities(markov.normalize_rows(counts))[0]
+    expected = [
+        1 - conversion_without(counts, state) / conversion for state in range(1, 10)
+    ]
+    assert np.allclose(markov.removal_effects(counts)[1:], expected)
+
+
+def test_sparse_removal_effects_match_dense():
+    """
+    Test function that will check if the sparse solver gives the
+    same removal effects as the dense one.
+    """
+
+    pytest.importorskip("scipy")
+    rng = np.random.default_rng(1)
+    size = 40
+    orig = rng.integers(0, size - 2, 300)
+    dest = rng.integers(1, size, 300)
+    counts = rng.integers(1, 4, 300)
+
+    dense = markov.transition_matrix(orig, dest, counts, size)
+    sparse = markov.transition_matrix(orig, dest, counts, size, sparse=True)
+    assert np.allclose(dense, sparse.toarray())
+    assert np.allclose(
+        markov.removal_effects(dense),
+        markov._sparse_removal_effects(markov.normalize_rows(sparse), block_size=7),
+    )
+
+    # Small sparse matrices are solved as dense ones, unless asked not to
+    groups = [[1, 2], [3], [4, 5, 6]]
+    for dense_states in (0, size):
+        assert np.allclose(
+            markov.removal_effects(dense),
+            markov.removal_effects(sparse, dense_states=dense_states),
+        )
+        assert np.allclose(
+            markov.removal_effects(dense, groups),
+            markov.removal_effects(sparse, groups, dense_states=dense_states),
+        )
+
+
+def test_history_states():
+    """
+    Test function that will check if the channel histories of each
+    touchpoint are encoded as states without crossing journeys.
+    """
+
+    # Journeys [0, 1, 1] and [1, 0]
+    states, histories = markov.history_states([0, 1, 1, 1, 0], [0, 3, 5], order=2)
+    names = [tuple(histories[state - 1]) for state in states]
+    assert names == [(-1, 0), (0, 1), (1, 1), (-1, 1), (1, 0)]
+
+
+def test_group_removal_effects_match_single_states():
+    """
+    Test function that will check if removing groups of a single
+    state gives the same removal effects as removing each state.
+    """
+
+    rng = np.random.default_rng(2)
+    counts = rng.integers(0, 5, (9, 9)).astype(float)
+    counts[:, 0] = 0
+    counts[-2:] = 0
+    counts[-1, -1] = 1
+    counts[-2, -2] = 1
+
+    groups = [[state] for state in range(1, 7)]
+    assert np.allclose(
+        markov.removal_effects(counts, groups), markov.removal_effects(counts)[1:]
+    )
@@ -0,0 +1,141 @@
+import itertools
+
+import numpy as np
+import pytest
+from marketing_attribution_models.models import shapley
+
+
+def brute_force_shapley(values):
+    """Shapley values averaging the marginal contribution of each
+    player over every ordering of the players."""
+    n = int(np.log2(len(values)))
+    results = np.zeros(n)
+    orderings = list(itertools.permutations(range(n)))
+    for ordering in orderings:
+        mask = 0
+        for player in ordering:
+            results[player] += values[mask | (1 << player)] - values[mask]
+            mask |= 1 << player
+    return results / len(orderings)
+
+
+def test_shapley_values_match_brute_force():
+    """
+    Test function that will check if the bitmask Shapley engine gives
+    the same values as averaging over every ordering of the players.
+    """
+
+    rng = np.random.default_rng(0)
+    for n in range(1, 7):
+        values = rng.random(2**n)
+        values[0] = 0
+        assert np.allclose(shapley.shapley_values(values), brute_force_shapley(values))
+
+
+def test_shapley_values_efficiency():
+    """
+    Test function that will check if the Shapley values add up to the
+    value of the grand coalition.
+    """
+
+    values = [0, 7, 6, 15, 4, 7, 9, 19]
+    assert np.isclose(shapley.shapley_values(values).sum(), 19)
+
+
+def test_characteristic_function_coalition_values():
+    """
+    Test function that will check if the shared characteristic
+    function looks up every coalition of a journey, with and without
+    the order of the channels.
+    """
+
+    # Combinations [0], [1], [0, 1] and [1, 0] with their values
+    combinations = [[0], [1], [0, 1], [1, 0]]
+    function = shapley.CharacteristicFunction(combinations, [1, 2, 3, 4])
+    assert function.coalition_values([1, 0]).tolist() == [0, 2, 1, 4]
+    assert function.coalition_values([2, 0]).tolist() == [0, 0, 1, 0]
+
+    function = shapley.CharacteristicFunction(combinations, [1, 2, 3, 4], order=True)
+    assert function.coalition_values([1, 0]).tolist() == [0, 2, 1, 4]
+    assert function.coalition_values([0, 1]).tolist() == [0, 1, 2, 3]
+
+
+def test_permutation_shapley_converges_to_exact():
+    """
+    Test function that will check if the Shapley values estimated
+    from sampled orderings are close to the exact values, within a
+    few standard errors.
+    """
+
+    rng = np.random.default_rng(0)
+    players = [3, 0, 5, 1, 4]
+    combinations = [
+        [player for j, player in enumerate(players) if (mask >> j) & 1]
+        for mask in range(1, 2 ** len(players))
+    ]
+    function = shapley.CharacteristicFunction(
+        combinations, rng.random(len(combinations))
+    )
+
+    exact = function.shapley(players)
+    estimate, std_error = shapley.permutation_shapley(
+        function, players, n_samples=4000, rng=1
+    )
+    assert np.isclose(estimate.sum(), exact.sum())
+    assert np.all(np.abs(estimate - exact) < 5 * std_error + 1e-12)
+
+
+def test_permutation_shapley_max_players():
+    """
+    Test function that will check if journeys with more players than
+    the coalition bit masks can hold are rejected.
+    """
+
+    players = list(range(63))
+    function = shapley.CharacteristicFunction([players[:62]], [1.0])
+
+    estimate, _ = shapley.permutation_shapley(
+        function, players[:62], n_samples=10, rng=0
+    )
+    assert np.isclose(estimate.sum(), 1)
+    with pytest.raises(ValueError):
+        shapley.permutation_shapley(function, players, n_samples=10, rng=0)
+
+
+def test_permutation_shapley_single_player():
+    """
+    Test function that will check if a journey with one player gets
+    the value of the journey with no standard error.
+    """
+
+    function = shapley.CharacteristicFunction([[4]], [0.3])
+    estimate, std_error = shapley.permutation_shapley(
+        function, [4], n_samples=50, rng=0
+    )
+    assert np.allclose(estimate, [0.3])
+    assert std_error.tolist() == [0.0]
+
+
+def test_journeys_shapley_parallel_matches_serial():
+    """
+    Test function that will check if splitting the journeys across
+    processes gives the same values, in the same order, as the serial
+    loop.
+    """
+
+    rng = np.random.default_rng(0)
+    players = [list(rng.choice(6, rng.integers(1, 5), replace=False)) for _ in range(9)]
+    function = shapley.CharacteristicFunction(players, rng.random(len(players)))
+
+    for method in ["exact", "permutation"]:
+        serial, serial_errors = shapley.journeys_shapley(
+            function, players, method, n_samples=50, random_state=3
+        )
+        parallel, parallel_errors = shapley.journeys_shapley(
+            function, players, method, n_samples=50, random_state=3, n_jobs=2
+        )
+        assert all(np.allclose(a, b) for a, b in zip(serial, parallel))
+        if method == "permutation":
+            assert all(
+                np.allclose(a, b) for a, b in zip(serial_errors, parallel_errors)
+            )